@@ -0,0 +1,224 @@
+"""
+Ohio Union EMS Autofill Tool - scheduling benchmarks
+
+Times the EMS scheduling helpers, the worker sort and the report writer, on schedule.json and on synthetic days of
+100 to 10,000 shifts (see synthetic.py). EMS objects are built without a browser. Each run is appended to
+results.jsonl with the commit it ran on, so regressions show up across commits:
+
+    python3 Benchmark/benchmark.py [--quick] [--filter find_worker] [--compare] [--threshold 0.2]
+
+--compare prints the change against the latest results from another commit, and exits with status 1 if any benchmark
+got slower by more than --threshold.
+"""
+import argparse
+import datetime
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TOOL_DIRECTORY = os.path.join(ROOT, "EMS Paperwork Tool")
+sys.path.insert(0, TOOL_DIRECTORY)
+
+import assignee  # noqa: E402
+import autofill_tool  # noqa: E402
+import config  # noqa: E402
+import synthetic  # noqa: E402
+
+RESULTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results.jsonl")
+
+# input name -> number of synthetic shifts, None for schedule.json
+INPUTS = [("schedule.json", None), ("100 shifts", 100), ("1k shifts", 1000), ("10k shifts", 10000)]
+QUICK_INPUTS = INPUTS[:3]
+EVENT_COUNT = 100
+SEED = 0
+
+logger = logging.getLogger("benchmark")
+logger.setLevel(logging.WARNING)
+# generate_report() logs the day's coverage warnings through the root logger
+logging.getLogger().setLevel(logging.ERROR)
+
+
+def load_settings(report_directory):
+    """ Loads settings.json, writing reports to report_directory """
+    with open(os.path.join(TOOL_DIRECTORY, "settings.json")) as f:
+        values = json.load(f)
+    values["report_directory"] = report_directory
+    return config.Settings(config.validate_settings(values))
+
+
+def load_schedule(shift_count):
+    """ Returns schedule.json, or a synthetic schedule. Positions in "order_to_assign_general_shift" without shifts
+    get an empty list """
+    if shift_count is None:
+        with open(os.path.join(TOOL_DIRECTORY, "schedule.json")) as f:
+            schedule = json.load(f)
+    else:
+        schedule = synthetic.generate_schedule(shift_count, SEED, autofill_tool.settings.order_to_assign_general_shift)
+    for position in autofill_tool.settings.order_to_assign_general_shift:
+        schedule.setdefault(position, [])
+    return schedule
+
+
+def make_ems(schedule):
+    return autofill_tool.EMS(None, logger, schedule, "Buckeye, Brutus", 2017, 9, 5)
+
+
+def add_assignments(ems, events):
+    """ Fills ems.workers as scheduling the events would, in shuffled order """
+    for event in events:
+        start_dt, end_dt = ems.convert_times_to_datetime(event["StartTime"], event["EndTime"])
+        for assign_type, (person, assign_time, assign_dt) in [("Setup", ems.find_setup_info(start_dt)),
+                                                              ("Check-in", ems.find_checkin_info(start_dt)),
+                                                              ("Teardown", ems.find_teardown_info(end_dt))]:
+            ems.insert_assignment_to_workers(person, ems.return_assignment_dict(
+                assign_type, assign_time, assign_dt, event["Room"], event["EventName"], event["AVEquipment"]))
+    rng = random.Random(SEED)
+    for assignments in ems.workers.values():
+        rng.shuffle(assignments)
+
+
+def make_cases(schedule):
+    """ Returns (name, function) of each benchmark on the schedule. Each function does one batch of work """
+    ems = make_ems(schedule)
+    events = synthetic.generate_events(EVENT_COUNT, SEED)
+    shifts = [shift for position in schedule.values() for shift in position]
+    starts = [ems.convert_times_to_datetime(event["StartTime"], event["EndTime"])[0] for event in events]
+    ends = [ems.convert_times_to_datetime(event["StartTime"], event["EndTime"])[1] for event in events]
+
+    balancer = assignee.LoadBalancer(schedule, autofill_tool.settings.order_to_assign_general_shift)
+
+    report_ems = make_ems(schedule)
+    add_assignments(report_ems, events)
+    unsorted_workers = dict(report_ems.workers)
+
+    def sort_workers():
+        report_ems.workers = dict(unsorted_workers)
+        report_ems.sort_workers()
+
+    def generate_report():
+        report_ems.workers = dict(unsorted_workers)
+        autofill_tool.generate_report(report_ems)
+
+    return [
+        ("convert_times_to_datetime", lambda: [ems.convert_times_to_datetime(shift["start_time"], shift["end_time"])
+                                               for shift in shifts]),
+        ("convert_datetime_to_time", lambda: [ems.convert_datetime_to_time(dt) for dt in starts]),
+        ("compare_times", lambda: [ems.compare_times(start, end) for start, end in zip(starts, ends)]),
+        ("find_worker_at_time", lambda: [ems.find_worker_at_time(dt) for dt in starts]),
+        ("balanced_pick", lambda: [balancer.pick(dt) for dt in starts]),
+        ("find_setup_info", lambda: [ems.find_setup_info(dt) for dt in starts]),
+        ("find_checkin_info", lambda: [ems.find_checkin_info(dt) for dt in starts]),
+        ("find_teardown_info", lambda: [ems.find_teardown_info(dt) for dt in ends]),
+        ("sort_workers", sort_workers),
+        ("generate_report", generate_report),
+    ]
+
+
+def time_function(function, repeat=3):
+    """ Returns the best time of one call, in seconds. Each repeat runs for at least 0.2 s """
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def run(inputs, name_filter=None):
+    """ Runs the benchmarks
+
+    Returns:
+        dict: '{benchmark}[{input}]' -> seconds per batch
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as report_directory:
+        autofill_tool.settings = load_settings(report_directory)
+        for input_name, shift_count in inputs:
+            schedule = load_schedule(shift_count)
+            for name, function in make_cases(schedule):
+                if name_filter is not None and name_filter not in name:
+                    continue
+                key = "{0}[{1}]".format(name, input_name)
+                results[key] = time_function(function)
+                print("{0:<45} {1:>12.1f} us".format(key, results[key] * 1e6))
+    return results
+
+
+def current_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                       universal_newlines=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def load_results(path=RESULTS_PATH):
+    """ Returns every stored run, oldest first """
+    if not os.path.isfile(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def save_results(commit, results, path=RESULTS_PATH):
+    run_record = {"commit": commit,
+                  "date": datetime.datetime.now().isoformat(timespec="seconds"),
+                  "python": platform.python_version(),
+                  "results": results}
+    with open(path, "a") as f:
+        f.write(json.dumps(run_record, sort_keys=True) + "\n")
+
+
+def compare(results, baseline, threshold):
+    """ Prints the change of each benchmark against the baseline run
+
+    Returns:
+        list of str: benchmarks slower by more than threshold
+    """
+    print("\nAgainst {0} ({1}):".format(baseline["commit"], baseline["date"]))
+    regressions = []
+    for key, seconds in sorted(results.items()):
+        before = baseline["results"].get(key)
+        if before is None:
+            continue
+        change = (seconds - before) / before
+        flag = ""
+        if change > threshold:
+            regressions.append(key)
+            flag = "  REGRESSION"
+        print("{0:<45} {1:>+8.0%}{2}".format(key, change, flag))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the scheduling helpers and the report writer.")
+    parser.add_argument("--quick", action="store_true", help="skip the 10k shift day")
+    parser.add_argument("--filter", help="only run benchmarks whose name contains this")
+    parser.add_argument("--compare", action="store_true", help="compare against the latest run of another commit")
+    parser.add_argument("--threshold", type=float, default=0.2, help="slowdown that counts as a regression")
+    parser.add_argument("--no-save", action="store_true", help="don't append the results to results.jsonl")
+    args = parser.parse_args()
+
+    commit = current_commit()
+    results = run(QUICK_INPUTS if args.quick else INPUTS, args.filter)
+
+    regressions = []
+    if args.compare:
+        baselines = [run_record for run_record in load_results() if run_record["commit"] != commit]
+        if baselines:
+            regressions = compare(results, baselines[-1], args.threshold)
+        else:
+            print("\nNo results from another commit to compare against")
+
+    if not args.no_save:
+        save_results(commit, results)
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
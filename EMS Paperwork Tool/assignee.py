@@ -0,0 +1,103 @@
+"""
+Ohio Union EMS Autofill Tool - load balanced assignee selection
+
+With "assignment_strategy": "balanced", EMS.choose_worker() asks a LoadBalancer instead of walking
+"order_to_assign_general_shift" for the first worker on shift. Positions are still tried in that order, but within a
+position the work goes to whoever on shift at the time has the fewest assignments so far, ties going to the first in
+the schedule.
+
+The day is cut into segments at every shift start and end of a position, so everyone on shift is the same for a whole
+segment, and each segment keeps a min-heap of (load, schedule order, worker). Loads change as work is given out; a
+heap entry whose load is out of date is fixed when it reaches the top of its heap, so a lookup costs a bisect and a
+few heap operations.
+"""
+import bisect
+import collections
+import heapq
+
+import clock
+import shift_coverage
+
+# what EMS.find_worker_at_time() returns when nobody is on shift or just finished
+UNASSIGNED_PERSON = {"last_name": "{Unassigned}", "first_name": "{Unassigned}"}
+
+
+def assignment_info(person, assign_time, assign_dt):
+    """ Returns who gets an assignment and when, as EMS.find_setup_info() and the like return it
+
+    Args:
+        person (dict): from EMS.choose_worker(), keys: "last_name" and "first_name"
+        assign_time (str): time of the assignment, in format '12:00 AM'
+        assign_dt (datetime.datetime): time of the assignment
+
+    Returns:
+        tuple: worker name ('Last, First', or "(Unassigned)" if nobody could take it), time, DateTime. Unassigned
+            work keeps its real time, so the report and the coverage checks place it where it happens
+    """
+    if person == UNASSIGNED_PERSON:
+        return shift_coverage.UNASSIGNED, assign_time, assign_dt
+    return person["last_name"] + ", " + person["first_name"], assign_time, assign_dt
+
+
+class LoadBalancer:
+    """ Picks the least loaded worker on shift, by position priority """
+
+    def __init__(self, schedule, positions, loads=None):
+        """
+        Args:
+            schedule (dict): schedule, keyed by position
+            positions (tuple of str): positions in priority order, as in "order_to_assign_general_shift"
+            loads (dict): number of assignments each worker ('Last, First') already has, e.g. the previous night
+                setups
+        """
+        self.schedule = schedule
+        self.loads = collections.Counter(loads or {})
+        # worker name -> {"last_name", "first_name"}, as returned by EMS.find_worker_at_time()
+        self.people = {}
+        # per position: (segment boundaries, heap per segment). Segment i is [boundaries[i], boundaries[i + 1])
+        self.tiers = []
+
+        for position in positions:
+            shifts = []
+            for order, worker in enumerate(schedule.get(position, [])):
+                name = worker["last_name"] + ", " + worker["first_name"]
+                self.people[name] = {"last_name": worker["last_name"], "first_name": worker["first_name"]}
+                start, end = clock.span_to_datetimes(worker["start_time"], worker["end_time"])
+                shifts.append((start, end, order, name))
+
+            boundaries = sorted({start for start, _, _, _ in shifts} | {end for _, end, _, _ in shifts})
+            segments = [{} for _ in boundaries[1:]]
+            for start, end, order, name in shifts:
+                for i in range(bisect.bisect_left(boundaries, start), bisect.bisect_left(boundaries, end)):
+                    # a worker with two shifts of the position keeps their first place in the schedule
+                    segments[i].setdefault(name, order)
+            heaps = []
+            for segment in segments:
+                heap = [(self.loads[name], order, name) for name, order in segment.items()]
+                heapq.heapify(heap)
+                heaps.append(heap)
+            self.tiers.append((boundaries, heaps))
+
+    def pick(self, time_dt):
+        """ Gives one assignment at the time to the least loaded worker on shift, in the first position with anyone
+        on shift
+
+        Args:
+            time_dt (datetime.datetime): time of the assignment
+
+        Returns:
+            dict: keys: "last_name" and "first_name". None if nobody is on shift
+        """
+        for boundaries, heaps in self.tiers:
+            i = bisect.bisect_right(boundaries, time_dt) - 1
+            if i < 0 or i >= len(heaps) or not heaps[i]:
+                continue
+            heap = heaps[i]
+            while heap[0][0] != self.loads[heap[0][2]]:
+                _, order, name = heap[0]
+                heapq.heapreplace(heap, (self.loads[name], order, name))
+            _, order, name = heap[0]
+            self.loads[name] += 1
+            heapq.heapreplace(heap, (self.loads[name], order, name))
+            return self.people[name]
+        return None
@@ -10,7 +10,6 @@ INSTRUCTIONS:
  - "python3 autofill_tool.py" to run tool.
 
 """
-from selenium import webdriver
 from selenium.webdriver.support.ui import Select
 from selenium.webdriver.common.by import By
 from selenium.common.exceptions import NoSuchElementException
@@ -24,15 +23,131 @@ import os
 import json
 import datetime
 import logging as logger
+import argparse
+import collections
+import contextlib
+import report
+from history import HistoryStore, make_fingerprint
+import detail_cache
+import config
+import browser
+import clock
+import prefetch
+import shift_coverage
+import conflicts
+import assignee
+import routing
+import deadline
+import pool
+import throttle
+import leases
+import metrics
+import profiler
+from staff_assignments import StaffAssignment, diff_staff_assignments, find_staff
 
 # global variables
-settings = dict()
+settings = None
+# routing.RoomDistances from "room_distances_file", or None to keep each worker's assignments in time order
+room_distances = None
+# (driver, history, event_detail_cache, budget) of a date range worker process, see start_date_worker()
+worker_state = None
+# throttle.Throttle for the requests to EMS, see make_throttle(). None to not limit them
+ems_throttle = None
+# leases.LeaseStore shared with the other runs, see make_lease_store(). None to not take leases on events
+event_leases = None
+
+EMS_LISTING_URL = "https://ohiounion.osu.edu/ems/"
+
+# Sets 'rows' to the text of the cells of each row of the staff assignments table
+READ_STAFF_TABLE_JS = """
+var table = document.querySelector("#ctl00_ContentPlaceHolder1_dg_staff_assignments");
+var rows = [];
+if (table !== null) {
+    table.querySelectorAll("tr").forEach(function (tr) {
+        rows.push(Array.prototype.map.call(tr.querySelectorAll("td"), function (td) { return td.innerText.trim(); }));
+    });
+}
+"""
+
+# Reads the rows of the staff assignments table. Returns a JSON list with the text of each row's cells
+STAFF_TABLE_SCRIPT = READ_STAFF_TABLE_JS + "return JSON.stringify(rows);"
+
+# Reads the Daily Setup Schedule listing. Each event is a pair of rows; returns a JSON list with, for each event, the
+# text of the first nine cells of each row ("First", "Second"), the text of both rows ("Text") and the href of the
+# event name link ("Link"). Text is trimmed and non-breaking spaces are kept as spaces, like WebElement.text
+LISTING_SCRIPT = """
+function text(node) {
+    return node === null ? "" : node.innerText.replace(/^[ \\t\\r\\n]+|[ \\t\\r\\n]+$/g, "").replace(/\\u00a0/g, " ");
+}
+function cells(tr) {
+    var texts = [];
+    for (var i = 1; i <= 9; i++) {
+        texts.push(text(tr.querySelector("td:nth-of-type(" + i + ")")));
+    }
+    return texts;
+}
+var rows = document.querySelectorAll(".table-responsive > table > tbody > tr");
+var events = [];
+for (var i = 1; i + 1 < rows.length; i += 2) {
+    var link = rows[i].querySelector("td:nth-of-type(5) > a");
+    events.push({"First": cells(rows[i]), "Second": cells(rows[i + 1]),
+                 "Text": text(rows[i]) + "\\n" + text(rows[i + 1]),
+                 "Link": link === null ? "" : link.getAttribute("href")});
+}
+return JSON.stringify(events);
+"""
+
+# An event in the Daily Setup Schedule listing
+# reservation (str): reservation #
+# room (str): room, as shown in the listing
+# name (str): event name
+# js_command (str): javascript command to navigate to the Event Details page
+# key (str): detail cache key, see detail_cache.make_key()
+# start_time (str): event start time, as shown in the listing
+ListingRow = collections.namedtuple("ListingRow", ["reservation", "room", "name", "js_command", "key", "start_time"])
+
+# Reads the whole Event Details page. Returns a JSON object with "EventName", "Room" and "RunTime" (null if missing),
+# "Staff" (the text of each staff assignments row's cells) and "Sections" (each '.div_right_column > h5' header with
+# the items of the list at the same position)
+EVENT_DETAILS_SCRIPT = """
+function text(css) {
+    var element = document.querySelector(css);
+    return element === null ? null : element.innerText.trim();
+}
+var sections = [];
+document.querySelectorAll(".div_right_column > h5").forEach(function (h5, i) {
+    var items = document.querySelectorAll(".div_right_column > ul:nth-of-type(" + (i + 1) + ") > li");
+    sections.push({"Header": h5.innerText.trim(),
+                   "Items": Array.prototype.map.call(items, function (li) { return li.innerText.trim(); })});
+});
+""" + READ_STAFF_TABLE_JS + """
+return JSON.stringify({"EventName": text("h3"), "Room": text("#spRoom"), "RunTime": text("#spRunTime"),
+                       "Staff": rows, "Sections": sections});
+"""
+
+# the date times from EMS and W2W are put on, see EMS.convert_times_to_datetime()
+BASE_DATETIME = clock.BASE_DATETIME
+ONE_MINUTE = clock.ONE_MINUTE
 
 
 class EMS:
     """ Contains functions related to EMS """
 
-    def __init__(self, selenium_webdriver, logging, schedule, previous_night_worker, year, month, day):
+    def __init__(self, selenium_webdriver, logging, schedule, previous_night_worker, year, month, day, history=None,
+                 event_detail_cache=None):
+        """
+        Args:
+            selenium_webdriver (webdriver): selenium webdriver. None to only use the scheduling helpers, e.g. in
+                benchmarks, without opening EMS
+            logging (logging): logger
+            schedule (dict): schedule, keyed by position
+            previous_night_worker (str): worker for the previous evening setups, in format 'Last, First'
+            year (int): year of the date to schedule
+            month (int): month of the date to schedule
+            day (int): day of the date to schedule
+            history (HistoryStore): store to record the run in, or None
+            event_detail_cache (detail_cache.DetailCache): cache of event details, or None
+        """
         self.driver = selenium_webdriver
         self.logger = logging
         self.schedule = schedule
@@ -40,11 +155,25 @@ class EMS:
         self.year = str(year)
         self.month = str(month)
         self.day = str(day)
-        self.weekday = datetime.date(year, month, day).weekday()
+        self.date = datetime.date(year, month, day)
+        self.weekday = self.date.weekday()
+        self.history = history
+        self.detail_cache = event_detail_cache
 
         self.workers = dict()
-
-        self.setup_ems()
+        # prefetch.TabPrefetcher while scheduling with "prefetch_depth", otherwise None
+        self.prefetcher = None
+        # ListingRows of the events to be scheduled after the current one, for prefetching
+        self.upcoming = ()
+        # assignee.LoadBalancer for the current schedule with "assignment_strategy": "balanced", built on first use
+        self.balancer = None
+        # ListingRows of the events left when the time budget ran out
+        self.unscheduled = []
+        # ListingRows of the events skipped because another run held their lease
+        self.leased = []
+
+        if selenium_webdriver is not None:
+            self.setup_ems()
 
     def sort_workers(self):
         """ For each worker, sorts assignment dicts by DateTime key """
@@ -78,6 +207,7 @@ class EMS:
             )
             return element
         except TimeoutException:
+            metrics.inc("autofill_timeouts_total")
             if raise_exception:
                 raise TimeoutException("Couldn't find element with CSS selector: '{}'".format(css_selector))
             else:
@@ -104,6 +234,7 @@ class EMS:
             )
             return element
         except TimeoutException:
+            metrics.inc("autofill_timeouts_total")
             if raise_exception:
                 raise TimeoutException("Couldn't find element with CSS selector: '{}'".format(css_selector))
             else:
@@ -124,36 +255,78 @@ class EMS:
             EC.invisibility_of_element_located((By.CSS_SELECTOR, css_selector))
         )
         return element
+
+    def wait_for_staleness_of(self, element, timeout=30):
+        """ Waits for an element to be removed from the page, e.g. by the page it's on being replaced after a
+        postback. Defaults to waiting 30s
+
+        Args:
+            element (webelement): element of the page before the postback
+            timeout (int): The time in seconds to wait
+
+        Raises:
+            TimeoutException: the element is still on the page
+        """
+
+        try:
+            WebDriverWait(self.driver, timeout).until(EC.staleness_of(element))
+        except TimeoutException:
+            metrics.inc("autofill_timeouts_total")
+            raise TimeoutException("The page wasn't replaced after a postback")
     # endregion
 
+    @contextlib.contextmanager
+    def ems_request(self):
+        """ Context manager around a navigation or postback to EMS, which waits for the rate limit and times the
+        response, see throttle.Throttle.request() """
+        if ems_throttle is None:
+            yield
+        else:
+            with ems_throttle.request():
+                yield
+
+    @contextlib.contextmanager
+    def recording(self):
+        """ Context manager that commits what's recorded in the history database inside in one transaction, see
+        HistoryStore.batch() """
+        if self.history is None:
+            yield
+        else:
+            with self.history.batch():
+                yield
+
     def navigate_to_event_listing_page(self, select_position=True):
         # Navigate to EMS
-        self.driver.get('http://ohiounion.osu.edu/ems')
+        with self.ems_request():
+            self.driver.get('http://ohiounion.osu.edu/ems')
 
         # If not logged in, log in.
         if self.driver.title == "Login Required | The Ohio State University":
             input_user = self.wait_for_element_visible("#username")
-            input_user.send_keys(settings["ems_username"])
+            input_user.send_keys(settings.ems_username)
 
             input_pass = self.wait_for_element_visible("#password")
-            input_pass.send_keys(settings["ems_password"])
-            input_pass.send_keys(u'\ue007')
+            input_pass.send_keys(settings.ems_password)
+            with self.ems_request():
+                input_pass.send_keys(u'\ue007')
+                self.wait_for_staleness_of(input_pass)
 
         if self.driver.title == "Login Required | The Ohio State University":
             raise RuntimeError("Invalid EMS credentials")
 
         # If select position, log in as manager
         if select_position:
-            self.driver.get("https://ohiounion.osu.edu/secure/ems/")
+            with self.ems_request():
+                self.driver.get("https://ohiounion.osu.edu/secure/ems/")
 
         if self.driver.current_url == "https://ohiounion.osu.edu/secure/ems/":
             try:
                 select = Select(self.wait_for_element_visible("#ctl00_ContentPlaceHolder1_ddl_position"))
-                select.select_by_visible_text(settings["manager_position"])
-                self.wait_for_element_visible("#ctl00_ContentPlaceHolder1_btn_submit").click()
+                select.select_by_visible_text(settings.manager_position)
+                self.submit("#ctl00_ContentPlaceHolder1_btn_submit")
             except NoSuchElementException:
                 raise NoSuchElementException("Unable to find '{}' in EMS position list. Are you a manager?"
-                                             .format(settings["manager_position"]))
+                                             .format(settings.manager_position))
 
     def format_date(self):
         """ Formats date in MM/DD/YYYY format
@@ -187,166 +360,357 @@ class EMS:
         self.wait_for_element_visible("#ctl00_ContentPlaceHolder1_txt_date").send_keys(formatted_date)
         self.wait_for_element_visible(".container-fluid > h2").click()
         self.wait_for_invisibility_of_element("#ui-datepicker-div")
-        self.wait_for_element_visible("#ctl00_ContentPlaceHolder1_btn_submit").click()
+        self.submit("#ctl00_ContentPlaceHolder1_btn_submit")
 
-    def get_list_of_events(self):
-        """ From the Ohio Union Daily Setup Schedule page, gets each pair of
-        rows and returns them
+    def submit(self, css_selector):
+        """ Clicks a button that posts the page back, and waits for the new page to load. The click and the wait are
+        one request for the EMS throttle
 
-        Returns:
-            list_events: A list containing 2-tuples with the two rows for an event
+        Args:
+            css_selector (str): The CSS selector for the button
         """
-        self.logger.info("Getting list of events")
-
-        # Get rows
-        list_of_rows = self.wait_for_presence_of_all_elements(".table-responsive > table > tbody > tr")
-        list_of_rows.pop(0)
+        with self.ems_request():
+            button = self.wait_for_element_visible(css_selector)
+            button.click()
+            self.wait_for_staleness_of(button)
+            self.wait_for_element_visible(".container-fluid")
+
+    def iter_events(self):
+        """ From the Ohio Union Daily Setup Schedule page, reads the listing in a single script call and yields each
+        event's pair of rows. The rows are plain text, so they stay valid after the browser leaves the page
+
+        Yields:
+            dict: "First" and "Second" (list of str): text of the first nine cells of each row,
+                "Text" (str): text of both rows, "Link" (str): href of the event name link
+        """
+        self.logger.info("Reading list of events")
+        metrics.inc("autofill_listing_refreshes_total")
 
-        # split rows into events
-        list_events = []
-        for row_1, row_2 in zip(list_of_rows[0::2], list_of_rows[1::2]):
-            self.logger.info("appending event: '{}".format(row_1.text))
-            list_events.append((row_1, row_2))
+        with metrics.phase("listing"):
+            self.wait_for_presence_of_all_elements(".table-responsive > table > tbody > tr")
+            events = json.loads(self.driver.execute_script(LISTING_SCRIPT))
 
-        return list_events
+        # hand events on as they are consumed, dropping each once it's been filtered
+        events.reverse()
+        while events:
+            yield events.pop()
 
-    def get_list_of_javascript(self, event_list):
-        """ Takes a list of events (from get_list_of_events()) and pulls the
-        javascript calls to navigate to the event detail page for each event.
-        Uses "skip_already_confirmed", "skip_already_scheduled", "skip_rooms",
-        and "skip_following_rooms" in settings.json
+    def get_setup_deadline(self, listing_row):
+        """ Returns the time the event's setup is due, see get_setup_time(). Events with a start time that can't be
+        read go last
 
         Args:
-            event_list (list): List containing 2-tuples that are the first and
-            second rows of each event
+            listing_row (ListingRow): the event's row in the listing
+
+        Returns:
+            datetime.datetime: setup time
+        """
+        if clock.to_minutes(listing_row.start_time) is None:
+            return datetime.datetime.max
+        return self.get_setup_time(self.convert_time_to_datetime(listing_row.start_time))
+
+    def get_listing_fingerprint(self):
+        """ Fingerprints the event listing together with the schedule and the settings used to plan it (see
+        config.Settings.planning_values()). If the fingerprint matches the one at the end of the last successful run,
+        there's nothing to do.
 
         Returns:
-            js_list (list): List containing strings that are the js calls
+            str: fingerprint
         """
-        self.logger.info("Getting list of javascript")
+        listing = self.wait_for_element_visible(".table-responsive > table > tbody").text
+        return make_fingerprint(self.format_date(), listing, self.schedule, self.previous_night_worker,
+                                settings.planning_values())
+
+    def iter_events_to_schedule(self, events, seen=None):
+        """ Filters the events from iter_events(), yielding the ones that should be scheduled as soon as each is read.
+        Uses "skip_already_confirmed", "skip_already_scheduled", "skip_rooms", and "skip_following_rooms" in
+        settings.json
+
+        Args:
+            events (iterable): events, from iter_events()
+            seen (set): keys (see detail_cache.make_key()) of the rows already checked. Rows in it are skipped, and
+            the other rows are added to it. None to check every row
 
-        js_list = []
-        for tup in event_list:
-            first_row = tup[0]
-            second_row = tup[1]
+        Yields:
+            ListingRow: event to schedule
+        """
+        for event in events:
+            first_row = event["First"]
+            second_row = event["Second"]
+
+            room = first_row[3]
+            name = first_row[4]
+            resnum = first_row[5]
+            # the cached details depend on the listing rows and whether the A/V lists were read
+            row_key = detail_cache.make_key(self.date, resnum,
+                                            event["Text"] + "\n" + str(settings.skip_checking_for_av))
+            if seen is not None:
+                if row_key in seen:
+                    metrics.inc("autofill_events_skipped_total", reason="unchanged")
+                    continue
+                seen.add(row_key)
 
-            room = first_row.find_element_by_css_selector("td:nth-of-type(4)").text
-            name = first_row.find_element_by_css_selector("td:nth-of-type(5)").text
-            resnum = first_row.find_element_by_css_selector("td:nth-of-type(6)").text
             self.logger.info("Checking event '{0}' in room '{1}' with reservation # '{2}'".format(name, room, resnum))
+            metrics.inc("autofill_events_seen_total")
+            if self.history is not None:
+                self.history.record_listing_event(self.date, resnum, room, name)
 
-            # check if already scheduled
-            if settings["skip_already_scheduled"]:
-                setup_time = first_row.find_element_by_css_selector("td:nth-of-type(7)").text
-                checkin_time = first_row.find_element_by_css_selector("td:nth-of-type(8)").text
-                teardown_time = first_row.find_element_by_css_selector("td:nth-of-type(9)").text
+            # check if already scheduled. When diffing, partially scheduled events are checked on the details page
+            if settings.skip_already_scheduled and not settings.diff_existing_assignments:
+                setup_time, checkin_time, teardown_time = first_row[6:9]
 
                 if setup_time != " " or checkin_time != " " or teardown_time != " ":
                     self.logger.info("Event is already scheduled")
+                    metrics.inc("autofill_events_skipped_total", reason="already_scheduled")
                     continue
 
             # check if already confirmed
-            if settings["skip_already_confirmed"]:
-                setup_confirm = second_row.find_element_by_css_selector("td:nth-of-type(4)").text
-                checkin_confirm = second_row.find_element_by_css_selector("td:nth-of-type(5)").text
-                teardown_confirm = second_row.find_element_by_css_selector("td:nth-of-type(6)").text
+            if settings.skip_already_confirmed:
+                setup_confirm, checkin_confirm, teardown_confirm = second_row[3:6]
 
                 if setup_confirm != "Confirmed" or checkin_confirm != "Confirmed" or teardown_confirm != "Confirmed":
                     self.logger.info("Event is already confirmed")
+                    metrics.inc("autofill_events_skipped_total", reason="already_confirmed")
                     continue
 
             # check if skip rooms
-            if settings["skip_rooms"]:
-                room_name = first_row.find_element_by_css_selector("td:nth-of-type(4)").text
-                if room_name in settings["skip_following_rooms"]:
+            if settings.skip_rooms:
+                if settings.is_skipped_room(room):
                     self.logger.info("Room should be skipped")
+                    metrics.inc("autofill_events_skipped_total", reason="room")
                     continue
 
             # get javascript command to go to page
             self.logger.info("Event will be scheduled")
-            js_command = first_row.find_element_by_css_selector("td:nth-of-type(5) > a").get_attribute("href")
-            splitted_command_list = js_command.split(":")
-            js_list.append(splitted_command_list[1])
+            js_command = event["Link"].split(":")[1]
+            yield ListingRow(resnum, room, name, js_command, row_key, first_row[0])
 
-        return js_list
-
-    def schedule_event(self, js_command):
-        """ Takes the javascript command to navigate to the event page from the
-        Ohio Union Daily Setup Schedule page. Schedules the event based on
-        input from schedule. Also uses "skip_events_with_no_av" to skip events
-        without any AV equipment listed.
+    def open_event_details(self, js_command, event_name=None):
+        """ Navigates to the Event Details page of an event. Switches to its tab instead if it was prefetched
 
         Args:
             js_command (string): the Javascript command to navigate to the event
             page.
+            event_name (str): name of the event in the listing, to check a prefetched page against. None to not check
+
+        Raises:
+            RuntimeError: the page reached wasn't the Event Details page
         """
 
+        if self.prefetcher is not None and self.prefetcher.take(js_command):
+            try:
+                self.wait_for_element_visible("#spRunTime")
+                if self.driver.title != "EMS - Event Details Page":
+                    raise RuntimeError("title was '{}'".format(self.driver.title))
+                shown_name = self.driver.find_element_by_css_selector("h3").text
+                if event_name is not None and " ".join(shown_name.split()).lower() != \
+                        " ".join(event_name.split()).lower():
+                    raise RuntimeError("expected event '{0}', got '{1}'".format(event_name, shown_name))
+                return
+            except (RuntimeError, SeleniumExceptions.WebDriverException) as e:
+                self.stop_prefetching("The prefetched Event Details page can't be used ({})".format(e))
+
         # check page is on events page
-        if self.driver.current_url != "https://ohiounion.osu.edu/ems/":
+        if self.driver.current_url != EMS_LISTING_URL:
             self.navigate_to_event_listing_page(select_position=False)
 
         # navigate to the Event Details page
-        self.driver.execute_script(js_command)
-        self.wait_for_element_visible(".container-fluid")
+        with self.ems_request():
+            self.driver.execute_script(js_command)
+            self.wait_for_element_visible(".container-fluid")
 
         # check page is actually on Event Details page
         title = self.driver.title
         if title != "EMS - Event Details Page":
             raise RuntimeError("Page wasn't on the Event Details Page. Title was '{}'".format(title))
 
+    def prefetch_upcoming(self):
+        """ With prefetching on, starts loading the Event Details pages of the upcoming events that aren't in the
+        detail cache, while the current event's assignments are entered """
+        if self.prefetcher is None:
+            return
+        js_commands = [row.js_command for row in self.upcoming
+                       if self.detail_cache is None or row.key not in self.detail_cache]
+        if ems_throttle is not None:
+            # one request in flight is the current page
+            self.prefetcher.depth = min(settings.prefetch_depth, ems_throttle.controller.concurrency - 1)
+        try:
+            self.prefetcher.prefetch(js_commands)
+        except (RuntimeError, SeleniumExceptions.WebDriverException) as e:
+            self.stop_prefetching("Couldn't prefetch in another tab ({})".format(e))
+
+    def recycle_browser(self):
+        """ Counts the event about to be scheduled and, if the browser is due to be recycled (see
+        browser.RecyclingDriver), replaces it, logs back in to EMS and returns to the event listing for the date, so
+        scheduling carries on with the event. Prefetching starts again in the new browser
+
+        Returns:
+            bool: True if the browser was recycled
+        """
+        if not isinstance(self.driver, browser.RecyclingDriver):
+            return False
+        reason = self.driver.start_event()
+        if reason is None:
+            return False
+
+        prefetching = self.prefetcher is not None
+        if prefetching:
+            self.logger.info(self.prefetcher.summary())
+            try:
+                self.prefetcher.close()
+            except SeleniumExceptions.WebDriverException:
+                self.logger.exception("Couldn't close the prefetch tabs")
+            self.prefetcher = None
+        self.driver.recycle(reason)
+        metrics.inc("autofill_browser_recycles_total")
+        self.setup_ems()
+        if prefetching:
+            self.prefetcher = make_prefetcher(self.driver)
+        return True
+
+    def stop_prefetching(self, reason):
+        """ Turns prefetching off for the rest of the run and closes the extra tabs
+
+        Args:
+            reason (str): why, for the log
+        """
+        self.logger.warning("{}. Turning off prefetching".format(reason))
+        prefetcher = self.prefetcher
+        self.prefetcher = None
+        try:
+            prefetcher.close()
+        except SeleniumExceptions.WebDriverException:
+            self.logger.exception("Couldn't close the prefetch tabs")
+
+    def read_event_details(self):
+        """ From the Event Details page, reads everything needed to schedule the event in a single script call. Setup
+        Notes and A/V Equipment are only kept if "skip_checking_for_av" is false.
+
+        Returns:
+            dict: JSON serializable, with keys:
+                "EventName" (str), "Room" (str), "RunTime" (str, in format '12:00 AM - 1:00 PM'),
+                "SetupNotes" (list of str), "AVEquipment" (list of str),
+                "Staff" (list of [assignment, staff, time] for each row of the staff assignments table)
+            None if the Setup Notes or A/V Equipment lists are missing or empty
+
+        Raises:
+            TimeoutException: the page is missing the event name, room, or run time
+        """
+
+        self.wait_for_element_visible("#spRunTime")
+        snapshot = json.loads(self.driver.execute_script(EVENT_DETAILS_SCRIPT))
+        self.logger.debug("Event details: {}".format(snapshot))
+
+        for key, css_selector in [("EventName", "h3"), ("Room", "#spRoom"), ("RunTime", "#spRunTime")]:
+            if snapshot[key] is None:
+                raise TimeoutException("Couldn't find element with CSS selector: '{}'".format(css_selector))
+
+        details = {
+            "EventName": snapshot["EventName"],
+            "Staff": [cells[:3] for cells in snapshot["Staff"] if len(cells) >= 3],
+            "Room": snapshot["Room"],
+            "SetupNotes": [],
+            "AVEquipment": [],
+            "RunTime": snapshot["RunTime"]
+        }
+
+        if settings.skip_checking_for_av is False:
+            # an empty list used to time out waiting for its items, so the event is skipped the same way
+            if len(snapshot["Sections"]) == 0:
+                self.logger.warning("For event '{}', no notes or equipment found".format(details["EventName"]))
+                return None
+            for section in snapshot["Sections"]:
+                if section["Header"] == "Setup Notes":
+                    key = "SetupNotes"
+                elif section["Header"] == "A/V Equipment":
+                    key = "AVEquipment"
+                else:
+                    continue
+                if len(section["Items"]) == 0:
+                    self.logger.warning("For event '{0}', '{1}' is empty".format(details["EventName"],
+                                                                                section["Header"]))
+                    return None
+                details[key] += section["Items"]
+
+        return details
+
+    def schedule_event(self, js_command, listing_row=None):
+        """ Takes the javascript command to navigate to the event page from the
+        Ohio Union Daily Setup Schedule page. Schedules the event based on
+        input from schedule. Also uses "skip_events_with_no_av" to skip events
+        without any AV equipment listed.
+
+        The event details are taken from the detail cache when the event's
+        listing rows haven't changed, in which case the Event Details page is
+        only opened if there are assignments to enter.
+
+        Args:
+            js_command (string): the Javascript command to navigate to the event
+            page.
+            listing_row (ListingRow): the event's row in the listing, or None if not known
+        """
+
+        if listing_row is not None:
+            resnum, listing_room, listing_name, cache_key = listing_row.reservation, listing_row.room, \
+                listing_row.name, listing_row.key
+        else:
+            resnum, listing_room, listing_name, cache_key = "", "", None, None
+
+        if not self.acquire_lease(listing_row):
+            return
+
+        details = None
+        if cache_key is not None and self.detail_cache is not None:
+            details = self.detail_cache.get(cache_key)
+
+        on_details_page = details is None
+        if details is None:
+            self.open_event_details(js_command, listing_name)
+            details = self.read_event_details()
+            if details is None:
+                metrics.inc("autofill_events_skipped_total", reason="no_equipment_list")
+                return
+            if cache_key is not None and self.detail_cache is not None:
+                self.detail_cache.put(cache_key, details)
+        else:
+            self.logger.info("Using cached details for event '{}'".format(details["EventName"]))
+
         # get event name
-        event_name = self.wait_for_element_visible("h3").text
+        event_name = details["EventName"]
+        existing_assignments = [StaffAssignment(*row) for row in details["Staff"]]
 
         # check if event is already scheduled -> refresh js links
-        if settings["skip_already_scheduled"]:
-            table = self.wait_for_element_visible("#ctl00_ContentPlaceHolder1_dg_staff_assignments")
-            table_rows = table.find_elements_by_css_selector("tr")
-            for row in table_rows:
-                if "Setup" in row.find_element_by_css_selector("td:nth-of-type(1)").text \
-                        or "Check-In" in row.find_element_by_css_selector("td:nth-of-type(1)").text \
-                        or "Teardown" in row.find_element_by_css_selector("td:nth-of-type(1)").text:
+        if settings.skip_already_scheduled and not settings.diff_existing_assignments:
+            for row in existing_assignments:
+                if "Setup" in row.assignment or "Check-In" in row.assignment or "Teardown" in row.assignment:
                     self.logger.info("Event '{}' is already scheduled. Need to refresh links.".format(event_name))
-                    return True
+                    metrics.inc("autofill_events_skipped_total", reason="already_scheduled")
+                    return True if on_details_page else None
 
         # check if event is a room that should be skipped -> refresh js links
-        full_room_name = self.wait_for_element_visible("#spRoom").text
-        if settings["skip_rooms"]:
+        full_room_name = details["Room"]
+        if settings.skip_rooms:
             self.logger.info("For event '{0}', in room '{1}', checking if room should be skipped"
                              .format(event_name, full_room_name))
-            for name in settings["skip_following_rooms"]:
-                if name in full_room_name:
-                    self.logger.info("Event '{0}' is in room '{1}' that should be skipped. Need to refresh links"
-                                     .format(event_name, name))
-                    return True
-
-        av_equipments = []
-        notes = []
+            name = settings.find_skipped_room(full_room_name)
+            if name is not None:
+                self.logger.info("Event '{0}' is in room '{1}' that should be skipped. Need to refresh links"
+                                 .format(event_name, name))
+                metrics.inc("autofill_events_skipped_total", reason="room")
+                return True if on_details_page else None
+
+        av_equipments = list(details["AVEquipment"])
+        notes = list(details["SetupNotes"])
         # check event has AV
-        if settings["skip_checking_for_av"] is False:
-            try:
-                # get AV equipment in Notes
-                i = 1
-                for h5 in self.wait_for_presence_of_all_elements(".div_right_column > h5"):
-                    if h5.text == "Setup Notes":
-                        for note in self.wait_for_presence_of_all_elements(
-                                                ".div_right_column > ul:nth-of-type(" + str(i) + ") > li"):
-                            notes.append(note.text)
-                    elif h5.text == "A/V Equipment":
-                        for av_equipment in self.wait_for_presence_of_all_elements(
-                                                ".div_right_column > ul:nth-of-type(" + str(i) + ") > li"):
-                            av_equipments.append(av_equipment.text)
-                    i += 1
-
-                self.logger.debug("A/V Equipment: {}".format(av_equipments))
-                self.logger.debug("Setup Notes: {}".format(notes))
-                if settings["skip_events_with_no_av"] is True:
-                    if av_equipments[0] == "None Found":
-                        if len(notes) == 1 and notes[0] == "None Found" or "o be placed under" in notes[0]:
-                            self.logger.info("Event '{}' has no AV".format(event_name))
-                            return
-            except TimeoutException:
-                self.logger.warning("For event '{}', timed out".format(event_name))
-                return
+        if settings.skip_checking_for_av is False:
+            self.logger.debug("A/V Equipment: {}".format(av_equipments))
+            self.logger.debug("Setup Notes: {}".format(notes))
+            if settings.skip_events_with_no_av is True:
+                if av_equipments[0] == "None Found":
+                    if len(notes) == 1 and notes[0] == "None Found" or "o be placed under" in notes[0]:
+                        self.logger.info("Event '{}' has no AV".format(event_name))
+                        metrics.inc("autofill_events_skipped_total", reason="no_av")
+                        return
 
         # append Setup Notes to av_equipments
         if len(notes) >= 1 and notes[0] != "None Found":
@@ -355,7 +719,7 @@ class EMS:
             av_equipments += notes
 
         # get the time for the event and parse it
-        time_for_event = self.wait_for_element_visible("#spRunTime").text
+        time_for_event = details["RunTime"]
         time_for_event_split = time_for_event.split(' - ')
         event_start_time = time_for_event_split[0]
         event_end_time = time_for_event_split[1]
@@ -363,6 +727,10 @@ class EMS:
 
         event_start_dt, event_end_dt = self.convert_times_to_datetime(event_start_time, event_end_time)
 
+        if self.history is not None:
+            self.history.record_event_details(self.date, resnum, listing_room or full_room_name, full_room_name,
+                                              event_start_time, event_end_time, av_equipments)
+
         # get assignment info
         try:
             setup_person, setup_time, setup_dt = self.find_setup_info(event_start_dt)
@@ -378,13 +746,43 @@ class EMS:
                                      teardown_time))
         except TypeError:
             self.logger.warning("For event '{}', TypeError caught.'".format(event_name))
+            metrics.inc("autofill_events_skipped_total", reason="no_worker")
             return
 
         # Enter assignments
-        self.assign_setup(setup_person, setup_time)
-        self.assign_checkin(checkin_person, checkin_time)
-        self.assign_teardown(teardown_person, teardown_time)
+        if settings.diff_existing_assignments:
+            planned = [StaffAssignment("Setup", setup_person, setup_time),
+                       StaffAssignment("Check-In", checkin_person, checkin_time),
+                       StaffAssignment("Teardown", teardown_person, teardown_time)]
+            to_submit, outdated = diff_staff_assignments(existing_assignments, planned)
+            for row in outdated:
+                self.logger.warning("For event '{0}', existing {1} of '{2}' at '{3}' is outdated and should be removed"
+                                    .format(event_name, row.assignment, row.staff, row.time))
+            if len(to_submit) == 0:
+                self.logger.info("Event '{}' is already up to date".format(event_name))
+            elif not on_details_page:
+                self.open_event_details(js_command, listing_name)
+            if len(to_submit) > 0:
+                self.prefetch_upcoming()
+            for assignment in to_submit:
+                self.enter_assignment(assignment.staff, assignment.time, assignment.assignment)
+        else:
+            if not on_details_page:
+                self.open_event_details(js_command, listing_name)
+            self.prefetch_upcoming()
+            self.assign_setup(setup_person, setup_time)
+            self.assign_checkin(checkin_person, checkin_time)
+            self.assign_teardown(teardown_person, teardown_time)
         self.logger.info("Event '{}' scheduled successfully".format(event_name))
+        metrics.inc("autofill_events_scheduled_total")
+
+        if self.history is not None:
+            for assign_type, person, assign_time in [("Setup", setup_person, setup_time),
+                                                     ("Check-In", checkin_person, checkin_time),
+                                                     ("Teardown", teardown_person, teardown_time)]:
+                if person != "(Unassigned)":
+                    self.history.record_assignment(self.date, resnum, listing_room or full_room_name, assign_type,
+                                                   person, assign_time, event_name)
 
         # populate self.workers for report
         setup_dict = self.return_assignment_dict("Setup",
@@ -409,6 +807,33 @@ class EMS:
         self.insert_assignment_to_workers(checkin_person, checkin_dict)
         self.insert_assignment_to_workers(teardown_person, teardown_dict)
 
+    def acquire_lease(self, listing_row):
+        """ With "event_lease_minutes", takes the lease on an event before it's opened, so that another run
+        scheduling the same date at once skips it. See leases.py
+
+        Args:
+            listing_row (ListingRow): the event's row in the listing, or None if not known
+
+        Returns:
+            bool: False if another run holds the lease, in which case the event is skipped
+        """
+        if event_leases is None or listing_row is None:
+            return True
+        holder = event_leases.acquire(leases.make_key(self.date, listing_row.reservation, listing_row.room))
+        if holder is None:
+            return True
+        owner, expires = holder
+        self.logger.info("Event '{0}' is being scheduled by '{1}' until {2}. Skipping it"
+                         .format(listing_row.name, owner, time.strftime("%I:%M %p", time.localtime(expires))))
+        metrics.inc("autofill_events_skipped_total", reason="leased")
+        self.leased.append(listing_row)
+        return False
+
+    def release_lease(self, listing_row):
+        """ Gives back the lease on an event that couldn't be scheduled, so another run can schedule it """
+        if event_leases is not None and listing_row is not None:
+            event_leases.release(leases.make_key(self.date, listing_row.reservation, listing_row.room))
+
     def insert_assignment_to_workers(self, person, assignment):
         """ Inserts assignment to person in self.workers
 
@@ -450,6 +875,19 @@ class EMS:
         self.logger.debug("returning assignment dict: {}".format(return_dict))
         return return_dict
 
+    def get_existing_assignments(self):
+        """ From the event details page, reads the rows of the staff assignments table in a single script call
+
+        Returns:
+            list of StaffAssignment: one per row with at least three cells
+        """
+        self.wait_for_element_visible("#ctl00_ContentPlaceHolder1_dg_staff_assignments")
+        rows = json.loads(self.driver.execute_script(STAFF_TABLE_SCRIPT))
+        existing = [StaffAssignment(*cells[:3]) for cells in rows if len(cells) >= 3]
+
+        self.logger.debug("Existing assignments: {}".format(existing))
+        return existing
+
     def enter_assignment(self, person, time_to_enter, assignment):
         """ From the event details page, enters the staff assignments, submit,
         check for errors, and check it was entered.
@@ -466,25 +904,20 @@ class EMS:
         self.select_staff(person)
         self.select_assignment(assignment)
         self.enter_time(time_to_enter)
-        self.wait_for_element_visible("#ctl00_ContentPlaceHolder1_btn_add_staff_assignments").click()
+        with self.ems_request():
+            self.wait_for_element_visible("#ctl00_ContentPlaceHolder1_btn_add_staff_assignments").click()
+            existing_assignments = self.get_existing_assignments()
 
         # check assigned correctly
-        table = self.wait_for_element_visible("#ctl00_ContentPlaceHolder1_dg_staff_assignments")
-        table_rows = table.find_elements_by_css_selector("tr")
         found = False
-        for row in table_rows:
-            assign_type = row.find_element_by_css_selector("td:nth-of-type(1)").text
-            if assignment in assign_type:
-                staff_name = row.find_element_by_css_selector("td:nth-of-type(2)").text
-                if person in staff_name:
-                    assign_time = row.find_element_by_css_selector("td:nth-of-type(3)").text
-                    if time_to_enter in assign_time:
-                        found = True
-                        break
+        for row in existing_assignments:
+            if assignment in row.assignment and person in row.staff and time_to_enter in row.time:
+                found = True
+                break
 
         if not found:
             self.logger.warning("After assigning '{0}' to '{1}' at '{2}', assignment wasn't found in the table.".format
-                                (person, assignment, time))
+                                (person, assignment, time_to_enter))
 
     def assign_setup(self, person, setup_time):
         """ Assigns the setup to the given person at the given time.
@@ -515,7 +948,7 @@ class EMS:
 
     def find_worker_at_time(self, time_dt):
         """ Given a time, finds a worker who works during that time. Follows order
-        in settings["order_to_assign_general_shift"]
+        in settings.order_to_assign_general_shift
 
         Args:
             time_dt (datetime.py): time of event
@@ -526,9 +959,9 @@ class EMS:
 
         self.logger.debug("Finding worker for time: {}".format(time_dt.strftime("%H:%M")))
         ending_shift = {}
-        for shift_position in settings["order_to_assign_general_shift"]:
+        for shift_position in settings.order_to_assign_general_shift:
             self.logger.debug("For position: {}".format(shift_position))
-            for worker in schedule[shift_position]:
+            for worker in self.schedule[shift_position]:
                 self.logger.debug("    Checking worker: {}".format(worker["last_name"] + " , " + worker["first_name"]))
                 start_time, end_time = self.convert_times_to_datetime(worker["start_time"], worker["end_time"])
                 if self.compare_times(start_time, time_dt) <= 0 and self.compare_times(end_time, time_dt) == 1:
@@ -559,7 +992,7 @@ class EMS:
 
         if ending_shift == {}:
             self.logger.info("Time '{}' has no workers".format(time_dt.strftime("%H:%M")))
-            return {"last_name": "{Unassigned}", "first_name": "{Unassigned}"}
+            return dict(assignee.UNASSIGNED_PERSON)
         else:
             self.logger.info("Time '{0}' has worker '{1}, '{2}'".format(time_dt.strftime("%H:%M"),
                                                                         ending_shift["last_name"],
@@ -567,6 +1000,29 @@ class EMS:
             return {"last_name": ending_shift["last_name"], "first_name": ending_shift["first_name"]}
             # Managers only?
 
+    def choose_worker(self, time_dt):
+        """ Finds the worker for an assignment at a time with settings.assignment_strategy: the first worker on shift
+        by settings.order_to_assign_general_shift ("first_match"), or the one on shift with the fewest assignments in
+        the first position with anyone on shift ("balanced"). If nobody is on shift, both fall back to
+        find_worker_at_time()
+
+        Args:
+            time_dt (datetime.datetime): time of the assignment
+
+        Returns:
+            dict: keys: "last_name" and "first_name"
+        """
+        if settings.assignment_strategy == "balanced":
+            if self.balancer is None or self.balancer.schedule is not self.schedule:
+                loads = {name: len(assignments) for name, assignments in self.workers.items()}
+                self.balancer = assignee.LoadBalancer(self.schedule, settings.order_to_assign_general_shift, loads)
+            person = self.balancer.pick(time_dt)
+            if person is not None:
+                self.logger.info("Time '{0}' has least loaded worker '{1}, {2}'".format(
+                    time_dt.strftime("%H:%M"), person["last_name"], person["first_name"]))
+                return person
+        return self.find_worker_at_time(time_dt)
+
     def find_setup_info(self, event_start_time):
         """ Given an event start time, find the correct person to setup the event
         and when to setup the event.
@@ -585,22 +1041,16 @@ class EMS:
             setup_info (3-tuple): First element is the name of person (in the
                 format 'Last, First') and second element is the time to assign (in the
                 format '12:00 AM'). Third element is dt, for use in report.
-                If nobody can be assigned to the setup, return "(Unassigned)", "12:00 AM"
+                If nobody can be assigned to the setup, the name is "(Unassigned)"
         """
 
         setup_dt = self.get_setup_time(event_start_time)
         setup_time = self.convert_datetime_to_time(setup_dt)
-        if setup_time == settings["setup_time_night_before"]:
+        if setup_time == settings.setup_time_night_before:
             staff = self.previous_night_worker
             return staff, setup_time, setup_dt
 
-        person = self.find_worker_at_time(setup_dt)
-
-        if person["last_name"] == "{Unassigned}":
-            return "(Unassigned)", "12:00 AM", datetime.datetime.strptime("2016/1/1 12:00 AM", "%Y/%m/%d %I:%M %p")
-        else:
-            name = person["last_name"] + ", " + person["first_name"]
-            return name, setup_time, setup_dt
+        return assignee.assignment_info(self.choose_worker(setup_dt), setup_time, setup_dt)
 
     def find_checkin_info(self, event_start_time):
         """ Given an event start time, find the correct person to check-in the
@@ -620,19 +1070,13 @@ class EMS:
             checkin_info (3-tuple): First element is the name of person (in the
                 format 'Last, First') and second element is the time to assign (in the
                 format '12:00 AM'). Third element is dt, for use in report.
-                If nobody can be assigned to the setup, return "(Unassigned)", "12:00 AM"
+                If nobody can be assigned to the setup, the name is "(Unassigned)"
         """
 
         checkin_dt = self.get_checkin_time(event_start_time)
         checkin_time = self.convert_datetime_to_time(checkin_dt)
 
-        person = self.find_worker_at_time(checkin_dt)
-
-        if person["last_name"] == "{Unassigned}":
-            return "(Unassigned)", "12:00 AM", datetime.datetime.strptime("2016/1/1 12:00 AM", "%Y/%m/%d %I:%M %p")
-        else:
-            name = person["last_name"] + ", " + person["first_name"]
-            return name, checkin_time, checkin_dt
+        return assignee.assignment_info(self.choose_worker(checkin_dt), checkin_time, checkin_dt)
 
     def find_teardown_info(self, event_end_time):
         """ Given an event end time, find the correct person to teardown the
@@ -652,19 +1096,13 @@ class EMS:
             teardown_info (3-tuple): First element is the name of person (in the
                 format 'Last, First') and second element is the time to assign (in the
                 format '12:00 AM'). Third element is dt, for use in report.
-                If nobody can be assigned to the setup, return "(Unassigned)", "12:00 AM"
+                If nobody can be assigned to the setup, the name is "(Unassigned)"
         """
 
         teardown_dt = self.get_teardown_time(event_end_time)
         teardown_time = self.convert_datetime_to_time(teardown_dt)
 
-        person = self.find_worker_at_time(teardown_dt)
-
-        if person["last_name"] == "{Unassigned}":
-            return "(Unassigned)", "12:00 AM", datetime.datetime.strptime("2016/1/1 12:00 AM", "%Y/%m/%d %I:%M %p")
-        else:
-            name = person["last_name"] + ", " + person["first_name"]
-            return name, teardown_time, teardown_dt
+        return assignee.assignment_info(self.choose_worker(teardown_dt), teardown_time, teardown_dt)
 
     def parse_time(self, time_to_parse):
         """ Parse a time in the format '12:00 AM' into three parts: hour, minute,
@@ -678,20 +1116,15 @@ class EMS:
                 element is the minute as an int, and third element is the AM/PM as a str
         """
 
-        time_split = time_to_parse.split(' ')
-        time_number_part_split = time_split[0].split(':')
-        time_first_number = int(time_number_part_split[0])
-        time_second_number = int(time_number_part_split[1])
-        time_ampm_part = time_split[1]
-        self.logger.debug("Parsed '{0}' into '{1}', '{2}', '{3}'".format(time_to_parse,
-                                                                         time_first_number,
-                                                                         time_second_number,
-                                                                         time_ampm_part))
-
-        return time_first_number, time_second_number, time_ampm_part
+        minutes = clock.to_minutes(time_to_parse)
+        if minutes is None:
+            raise RuntimeError("Unable to parse time - '{}'".format(time_to_parse))
+        hour, minute = divmod(minutes, 60)
+        return hour % 12 or 12, minute, "AM" if hour < 12 else "PM"
 
     def convert_times_to_datetime(self, start_time, end_time):
-        """ Given a start and end time, converts the two times to DateTime objects.
+        """ Given a start and end time, converts the two times to DateTime objects. An end time in the morning after
+        an evening start, or at 12:xx AM, is on the next day.
 
         Args:
             start_time (str): Start time. In the form '12:00 AM'
@@ -702,41 +1135,7 @@ class EMS:
             end_time_dt (datetime.datetime): End time as a datetime.
         """
 
-        start_time_first_part, start_time_second_part, start_time_ampm_part = self.parse_time(start_time)
-        end_time_first_part, end_time_second_part, end_time_ampm_part = self.parse_time(end_time)
-
-        if start_time_ampm_part == "AM":
-            if start_time_first_part == 12:  # eg 12:30 AM
-                start_time_dt = datetime.datetime(2016, 1, 1, 0, start_time_second_part)
-            else:  # eg 8:30 AM
-                start_time_dt = datetime.datetime(2016, 1, 1, start_time_first_part, start_time_second_part)
-        else:
-            if start_time_first_part == 12:  # eg 12:30 PM
-                start_time_dt = datetime.datetime(2016, 1, 1, 12, start_time_second_part)
-            else:  # eg 4:30 PM
-                start_time_dt = datetime.datetime(2016, 1, 1, start_time_first_part + 12, start_time_second_part)
-
-        if end_time_ampm_part == "AM" and start_time_ampm_part == "AM":
-            if end_time_first_part == 12:  # eg 8:30 AM start, 12:30 AM end
-                end_time_dt = datetime.datetime(2016, 1, 2, 0, end_time_second_part)
-            else:  # eg 8:30 AM start, 9:30 AM end
-                end_time_dt = datetime.datetime(2016, 1, 1, end_time_first_part, end_time_second_part)
-        elif end_time_ampm_part == "AM" and start_time_ampm_part == "PM":
-            if end_time_first_part == 12:  # eg 8:00 PM start, 12:00 AM end
-                end_time_dt = datetime.datetime(2016, 1, 2, 0, end_time_second_part)
-            else:  # eg 8:00 PM start, 1:00 AM end
-                end_time_dt = datetime.datetime(2016, 1, 2, end_time_first_part, end_time_second_part)
-        else:
-            if end_time_first_part == 12:  # eg 12:00 PM end
-                end_time_dt = datetime.datetime(2016, 1, 1, 12, end_time_second_part)
-            else:  # eg 7:00 PM end
-                end_time_dt = datetime.datetime(2016, 1, 1, end_time_first_part + 12, end_time_second_part)
-
-        self.logger.debug("Converted '{0}' to datetime '{1}'".format(start_time,
-                                                                     start_time_dt.strftime("%H:%M")))
-        self.logger.debug("Converted '{0}' to datetime '{1}'".format(end_time,
-                                                                     end_time_dt.strftime("%H:%M")))
-        return start_time_dt, end_time_dt
+        return clock.span_to_datetimes(start_time, end_time)
 
     def convert_time_to_datetime(self, t1):
         """ Given a time, converts it to DateTime object.
@@ -748,24 +1147,7 @@ class EMS:
             t1_dt (datetime.datetime): Start time as a datetime.
         """
 
-        time_first_part, time_second_part, time_ampm_part = self.parse_time(t1)
-
-        if time_ampm_part == "AM":
-            if time_first_part == 12:
-                t1_dt = datetime.datetime(2016, 1, 1, 0, time_second_part)
-            else:
-                t1_dt = datetime.datetime(2016, 1, 1, time_first_part, time_second_part)
-
-        else:
-            if time_first_part == 12:
-                t1_dt = datetime.datetime(2016, 1, 1, 12, time_second_part)
-            else:
-                t1_dt = datetime.datetime(2016, 1, 1, time_first_part + 12, time_second_part)
-
-        self.logger.debug("Converted '{0}' to datetime '{1}'".format(t1,
-                                                                     t1_dt.strftime("%H:%M")))
-
-        return t1_dt
+        return clock.to_datetime(t1)
 
     def convert_datetime_to_time(self, t1):
         """ Given a datetime, converts it to time.
@@ -777,29 +1159,7 @@ class EMS:
             t1_time (str): time. In the form '12:00 AM'
         """
 
-        hour = t1.time().hour
-        minute = t1.time().minute
-
-        if hour == 0:
-            hour = 12
-            ampm = "AM"
-        elif hour == 12:
-            ampm = "PM"
-        elif hour > 12:
-            hour -= 12
-            ampm = "PM"
-        else:
-            ampm = "AM"
-
-        if minute < 10:
-            converted_time = str(hour) + ":0" + str(minute) + " " + ampm
-        else:
-            converted_time = str(hour) + ":" + str(minute) + " " + ampm
-
-        self.logger.debug("Converted '{0}' from datetime, '{1}'".format(t1.strftime("%H:%M"),
-                                                                        converted_time))
-
-        return converted_time
+        return clock.from_minutes(t1.hour * 60 + t1.minute)
 
     def compare_times(self, time_1, time_2):
         """ Given two times, compares them. Times must have come from convert_times_to_datetime
@@ -837,16 +1197,16 @@ class EMS:
             setup_time (datetime.datetime): time to setup for event
         """
         if self.weekday == 5 or self.weekday == 6:  # date.weekday() 0: Mon, 6: Sun
-            cutoff_time = settings["late_open_previous_day_setup_cutoff"]
+            cutoff_minutes = settings.late_open_previous_day_setup_cutoff_minutes
         else:
-            cutoff_time = settings["previous_day_setup_cutoff"]
+            cutoff_minutes = settings.previous_day_setup_cutoff_minutes
 
-        self.logger.debug("Cutoff time is {}".format(cutoff_time))
+        self.logger.debug("Cutoff time is {} minutes after midnight".format(cutoff_minutes))
 
-        if self.compare_times(self.convert_time_to_datetime(cutoff_time), event_start_time) == 1:
-            return datetime.datetime.strptime("2016/1/1 " + settings["setup_time_night_before"], "%Y/%m/%d %I:%M %p")
+        if cutoff_minutes > (event_start_time - BASE_DATETIME) // ONE_MINUTE:
+            return BASE_DATETIME + datetime.timedelta(minutes=settings.setup_time_night_before_minutes)
 
-        time_delta = datetime.timedelta(minutes=settings["minutes_to_advance_setup"])
+        time_delta = datetime.timedelta(minutes=settings.minutes_to_advance_setup)
 
         return_time = event_start_time - time_delta
 
@@ -864,7 +1224,7 @@ class EMS:
             checkin_time (datetime.datetime): time to check-in event
         """
 
-        time_delta = datetime.timedelta(minutes=settings["minutes_to_advance_checkin"])
+        time_delta = datetime.timedelta(minutes=settings.minutes_to_advance_checkin)
 
         return_time = event_start_time - time_delta
 
@@ -882,7 +1242,7 @@ class EMS:
             teardown_time (datetime.datetime): time to teardown event
         """
 
-        time_delta = datetime.timedelta(minutes=settings["minutes_to_delay_teardown"])
+        time_delta = datetime.timedelta(minutes=settings.minutes_to_delay_teardown)
 
         return_time = event_end_time + time_delta
 
@@ -902,20 +1262,13 @@ class EMS:
 
         select = Select(self.wait_for_element_visible("#ctl00_ContentPlaceHolder1_ddl_staff"))
         list_of_options = [i.text for i in select.options]
-        for option in list_of_options:
-            if staff in option:
-                select.select_by_index(list_of_options.index(option))
-                break
-        else:
-            staff_list = staff.split(", ")
-            truncated_staff = staff_list[0] + ", " + staff_list[1][0:3]
-            self.logger.info("Unable to find '{0}' in list of staff, trying '{1}'".format(staff, truncated_staff))
-            for option in list_of_options:
-                if staff in option:
-                    select.select_by_index(list_of_options.index(option))
-                    break
-            else:
-                raise NoSuchElementException("'{}' wasn't found in the list of staff".format(staff))
+        index = find_staff(list_of_options, staff)
+        if index is None:
+            raise NoSuchElementException("'{}' wasn't found in the list of staff".format(staff))
+        if staff not in list_of_options[index]:
+            self.logger.info("Unable to find '{0}' in list of staff, selected '{1}'"
+                             .format(staff, list_of_options[index]))
+        select.select_by_index(index)
 
     def select_assignment(self, assignment):
         """ Selects the assignment 'assignment' in the Staff Assignment form
@@ -995,10 +1348,10 @@ class W2W:
         # if not logged in, log in.
         if self.driver.title == "W2W Sign In - WhenToWork Online Employee Scheduling Program":
             input_user = self.driver.find_element_by_name("UserId1")
-            input_user.send_keys(settings["w2w_username"])
+            input_user.send_keys(settings.w2w_username)
 
             input_pass = self.driver.find_element_by_name("Password1")
-            input_pass.send_keys(settings["w2w_password"])
+            input_pass.send_keys(settings.w2w_password)
             input_pass.submit()
 
         if self.driver.title == "Sign In - WhenToWork Online Employee Scheduling Program":
@@ -1060,20 +1413,12 @@ class W2W:
             RuntimeError: Unable to parse time
         """
 
-        if len(time_to_parse.split(":")) == 2:
-            dt = datetime.datetime.strptime(time_to_parse, '%I:%M%p')
-            returning_str = dt.strftime("%I:%M %p")
-            self.logger.debug("Parsed '{0}' to '{1}'".format(time_to_parse, returning_str))
-            return returning_str
-        elif len(time_to_parse.split(":")) == 1:
-            if time_to_parse == " " or "":
-                raise RuntimeError("Fatal error: Unable to parse time: is empty")
-            dt = datetime.datetime.strptime(time_to_parse, '%I%p')
-            returning_str = dt.strftime("%I:%M %p")
-            self.logger.debug("Parsed '{0}' to '{1}'".format(time_to_parse, returning_str))
-            return returning_str
-        else:
+        if time_to_parse.strip() == "":
+            raise RuntimeError("Fatal error: Unable to parse time: is empty")
+        minutes = clock.to_minutes(time_to_parse)
+        if minutes is None:
             raise RuntimeError("Fatal error: Unable to parse time - '{}'".format(time_to_parse))
+        return clock.from_minutes(minutes, zero_pad=True)
 
     def get_list_of_schedule(self, column_number):
         """ Gets the data from the cell containing the schedule for the given day. Requires that W2W is already filtered to
@@ -1143,6 +1488,27 @@ def setup():
          - Validates json file
     """
 
+    configure_logging()
+
+    logger.info("******************* Running Autofill Tool *******************")
+
+    # check platform, clear screen
+    platform = sys.platform
+
+    if platform == "win32":
+        os.system('cls')
+    elif platform in ["darwin", "linux", "darwin"]:
+        os.system('clear')
+    else:
+        raise RuntimeError("Platform '{}' not supported".format(platform))
+
+    # read and validate settings file
+    logger.info("Reading settings file")
+    read_settings()
+
+
+def configure_logging():
+    """ Logs everything to debug_log.log, and INFO messages or higher to the console """
     logger.basicConfig(format='%(asctime)s %(levelname)s:%(message)s',
                        filename='debug_log.log',
                        level=logger.DEBUG,
@@ -1156,32 +1522,28 @@ def setup():
     console.setLevel(logger.INFO)
     logger.getLogger('').addHandler(console)
 
-    logger.info("******************* Running Autofill Tool *******************")
 
-    # check platform, clear screen
-    platform = sys.platform
+def read_settings():
+    """ Reads and validates settings.json, and the room distances file it names. Neither is changed if either can't
+    be read """
+    global settings, room_distances
+    new_settings = config.load_settings('settings.json')
+    new_distances = routing.load_distances(new_settings.room_distances_file) if new_settings.room_distances_file \
+        else None
+    settings, room_distances = new_settings, new_distances
 
-    if platform == "win32":
-        os.system('cls')
-    elif platform in ["darwin", "linux", "darwin"]:
-        os.system('clear')
-    else:
-        raise RuntimeError("Platform '{}' not supported".format(platform))
 
-    # check settings files exist
-    if not os.path.isfile('settings.json'):
-        raise RuntimeError("settings.json doesn't exist in path '{}'".format(os.getcwd()))
-
-    # open settings file
-    logger.info("Reading settings file")
-    try:
-        with open('settings.json', 'r') as settings_file:
-            settings_json = settings_file.read()
-            global settings
-            settings = json.loads(settings_json)
-            settings_file.close()
-    except RuntimeError:
-        raise RuntimeError("Error reading settings.json.")
+def reload_settings():
+    """ Reads settings.json again in daemon mode, and rebuilds the EMS throttle and the lease store from it """
+    read_settings()
+    if ems_throttle is not None:
+        logger.info(ems_throttle.summary())
+    make_throttle()
+    global event_leases
+    if event_leases is not None:
+        event_leases.close()
+        event_leases = None
+    make_lease_store()
 
 
 def parse_date(dt):
@@ -1306,7 +1668,7 @@ def read_and_validate_date():
 
 
 def parse_schedule_file(log):
-    """ Parses schedule.json file. Only runs if settings["use_w2w"] is False
+    """ Parses schedule.json file. Only runs if settings.use_w2w is False
 
     Args:
         log (logging): logger object
@@ -1333,100 +1695,105 @@ def parse_schedule_file(log):
     return schedule_dict
 
 
-def datetime_handler(x):
-    if isinstance(x, datetime.datetime):
-        return x.isoformat()
-    raise TypeError("Unknown type")
+def generate_report(ems, combined=None):
+    """ Generates report. Takes EMS object which contains scheduled workers and equipment, sorts the workers, and
+    writes the report for the date in each format in settings.report_formats. See prepare_report()
+
+    Args:
+        ems (EMS): EMS object
+        combined (report.CombinedReport): combined report for a date range run, or None
+
+    Outputs:
+        {report_directory}/AV Assignments {date}.txt/.csv/.json/.html
+    """
+    write_report(*prepare_report(ems), combined=combined)
 
 
-def generate_report(ems):
-    """ Generates report. Takes EMS object which contains scheduled workers and equipment, sorts the workers, saves
-    a JSON file with the workers, and generates a report.
+def prepare_report(ems):
+    """ Sorts the workers of the EMS object and finds the warnings for the top of the report. Gaps in shift coverage,
+    assignments made with nobody on shift, shifts without work, workers sent to several rooms at once and events left
+    when the time budget ran out are logged. With "room_distances_file" set, each worker's assignments are then put in
+    walking order within each "route_window_minutes".
 
     Args:
         ems (EMS): EMS object
 
-    Outputs:
-        file_sorted.json
-        AV Assignments {date}.txt
+    Returns:
+        tuple: date label (str, e.g. '2017-9-5'), workers (dict, see EMS.workers), warnings (list of str)
     """
 
     ems.sort_workers()
 
-    with open("file_sorted.json", "w+") as fp:
-        json.dump(ems.workers, fp, default=datetime_handler)
-
-    # generate assignment report
-    if settings["generate_report"] is True:
-        headers = [("Time", 10),
-                   ("AssignmentType", 10),
-                   ("Room", 35),
-                   ("EventName", 35)]
-        outFile = open("AV Assignments {}.txt".format(str(year)+"-"+str(month)+"-"+str(day)), "w")
-        for worker_name, assignments in ems.workers.items():
-            outFile.write(worker_name + '\n    ')
-            for assignment in assignments:
-                pad = 4
-                for header in headers:
-                    outFile.write(assignment[header[0]].ljust(header[1])[:header[1]] + ' | ')
-                    pad += header[1] + 3
-                num_equip = len(assignment["Equipment"])
-                equipment_iteration = 0
-                for equipment in assignment["Equipment"]:
-                    split_iteration = 1
-                    splits = equipment.split('\n')
-                    for split in splits:
-                        outFile.write('\n')
-                        if split_iteration == 1:
-                            outFile.write(''.ljust(11))
-                            split_iteration += 1
-                        else:
-                            outFile.write(''.ljust(15))
-                            split_iteration += 1
-                        outFile.write(split)
-                    equipment_iteration += 1
-                outFile.write("\n\n    ")
-            outFile.write("\n")
+    shifts = shift_coverage.shifts_from_schedule(ems.schedule, settings.order_to_assign_general_shift)
+    coverage = shift_coverage.analyse(shifts, ems.workers, settings.setup_time_night_before).lines()
+    for conflict in conflicts.find_conflicts(ems.workers, conflicts.service_minutes(settings),
+                                             settings.back_to_back_minutes, settings.setup_time_night_before):
+        metrics.inc("autofill_worker_conflicts_total", kind=conflict.kind)
+        coverage.append(conflicts.conflict_line(conflict))
+    for row in ems.unscheduled:
+        coverage.append("Not scheduled, the time budget ran out: '{0}' in {1} at {2} (reservation # {3})".format(
+            row.name, row.room, row.start_time, row.reservation))
+    for line in coverage:
+        logger.warning(line)
 
+    if room_distances is not None:
+        routing.route_workers(ems.workers, room_distances, settings.route_window_minutes)
 
-# Get the web driver
-driver = webdriver.Chrome()
+    return ems.year + "-" + ems.month + "-" + ems.day, ems.workers, coverage
 
-try:
-    # Setup environment
-    setup()
 
-    # get date information
-    if settings["custom_date"] is False:
-        dt = datetime.datetime.now() + datetime.timedelta(days=1)
-        year, month, day = parse_date(dt)
-    else:
-        year, month, day, dt = read_and_validate_date()
+def write_report(date_label, workers, coverage, combined=None):
+    """ Writes the report for the date in each format in settings.report_formats. If "generate_report" is false, only
+    the JSON report is written, as file_sorted.json always was
+
+    Args:
+        date_label (str): date, e.g. '2017-9-5'
+        workers (dict): sorted workers, see prepare_report()
+        coverage (list of str): warnings for the top of the report
+        combined (report.CombinedReport): combined report for a date range run, or None
+    """
+    formats = settings.report_formats if settings.generate_report is True else ["json"]
+    with metrics.phase("report"):
+        report.write_reports(date_label, workers, settings.report_directory, formats, combined, coverage)
+
+
+def load_schedule(driver, dt):
+    """ Loads the schedule for the date, from WhenToWork or schedule.json depending on settings.use_w2w
+
+    Args:
+        driver (webdriver): selenium webdriver
+        dt (datetime.datetime): date to schedule
 
+    Returns:
+        dict: schedule, keyed by position
+        str: worker for the previous evening setups, in format 'Last, First'
+    """
+
+    year, month, day = parse_date(dt)
     name_date = get_string_date(month, day)
 
     schedule = {}
-    previous_evening_worker = settings["current_manager_last_name"] + ", " + settings["current_manager_first_name"]
+    previous_evening_worker = settings.current_manager_last_name + ", " + settings.current_manager_first_name
 
-    if settings["use_w2w"] is True:
+    if settings.use_w2w is True:
         # create W2W object
         w2w = W2W(driver, logger)
 
         # go to w2w and load schedule
         col_num = w2w.go_to_w2w_with_date(day, month, year, name_date)
-        for position in settings["order_to_assign_general_shift"]:
+        for position in settings.order_to_assign_general_shift:
             w2w.go_to_position_type(position)
             parsed_list = w2w.get_list_of_schedule(col_num)
             schedule[position] = parsed_list
 
         # parse current manager if use_w2w_manager_for_previous_day_setup is true
-        if settings["use_w2w_manager_for_previous_day_setup"] is True:
+        if settings.use_w2w_manager_for_previous_day_setup is True:
             previous_evening_schedule = []
             previous_dt = dt - datetime.timedelta(days=1)
             prev_yr, prev_mo, prev_day = parse_date(previous_dt)
             prev_date_str = get_string_date(prev_mo, prev_day)
             prev_col_num = w2w.go_to_w2w_with_date(prev_day, prev_mo, prev_yr, prev_date_str)
-            for position in settings["order_to_assign_previous_evening_general_shift"]:
+            for position in settings.order_to_assign_previous_evening_general_shift:
                 if "Manager" in position:
                     w2w.go_to_position_type(position)
                     previous_evening_schedule = w2w.get_list_of_schedule(prev_col_num)
@@ -1439,42 +1806,531 @@ try:
     else:
         schedule = parse_schedule_file(logger)
 
-    ems = EMS(driver, logger, schedule, previous_evening_worker, year, month, day)
+    return schedule, previous_evening_worker
 
-    # get list of events
-    list_of_events = ems.get_list_of_events()
 
-    # get list of javascript commands
-    list_of_javascript = ems.get_list_of_javascript(list_of_events)
+def schedule_date(driver, dt, history, event_detail_cache, force=False, budget=None):
+    """ Schedules every event on the date. Skips the date if the listing, schedule and settings are the same as at
+    the end of the last successful run. A run cut short by the time budget, or that skipped events leased to another
+    run, isn't fingerprinted, so the next run carries on with the events left
 
-    # go to event and schedule
-    redo = False
-    for command in list_of_javascript:
-        redo = ems.schedule_event(command)
-        if redo is None:
-            redo = False
-        else:
-            ems.navigate_to_event_listing_page(select_position=False)
-            redo = True
-            break
-
-    # if need to redo, refresh JS list and continue.
-    while redo is True:
-        list_of_events = ems.get_list_of_events()
-        list_of_javascript = ems.get_list_of_javascript(list_of_events)
-        for command in list_of_javascript:
-            redo = ems.schedule_event(command)
-            if redo is None:
-                redo = False
+    Args:
+        driver (webdriver): selenium webdriver
+        dt (datetime.datetime): date to schedule
+        history (HistoryStore): store to record the run in
+        event_detail_cache (detail_cache.DetailCache): cache of event details
+        force (bool): schedule the date even if nothing changed since the last run
+        budget (deadline.TimeBudget): time budget of the run, or None for no limit
+
+    Returns:
+        EMS: EMS object, with the scheduled workers. None if there was nothing to do
+    """
+
+    year, month, day = parse_date(dt)
+    history.start_run(dt.date())
+    with metrics.phase("w2w_scrape"):
+        schedule, previous_evening_worker = load_schedule(driver, dt)
+    history.record_shifts(dt.date(), schedule)
+
+    with metrics.phase("ems_setup"):
+        ems = EMS(driver, logger, schedule, previous_evening_worker, year, month, day, history, event_detail_cache)
+
+    with metrics.phase("listing"):
+        fingerprint = ems.get_listing_fingerprint()
+    if not force and fingerprint == history.last_fingerprint(ems.date):
+        logger.info("Nothing to do for {}: the events, schedule and settings haven't changed since the last run"
+                    .format(ems.format_date()))
+        history.finish_run(fingerprint)
+        return None
+
+    with metrics.phase("schedule_events"):
+        schedule_listing(ems, budget=budget)
+
+    if ems.unscheduled or ems.leased:
+        # the other run may not get to its leased events, e.g. if it crashes
+        history.finish_run()
+        return ems
+
+    # fingerprint the listing as left by this run, so an unchanged rerun has nothing to do
+    ems.navigate_to_event_listing_page(select_position=False)
+    history.finish_run(ems.get_listing_fingerprint())
+    return ems
+
+
+def schedule_listing(ems, seen=None, budget=None):
+    """ Schedules the events in the event listing EMS is on. The listing is read, filtered and scheduled as a stream:
+    each event is scheduled as soon as its row passes the filters. With "schedule_order": "deadline", the whole
+    listing is filtered first and the events are scheduled earliest setup first. If an event's details page shows it
+    shouldn't have been opened, the listing is read again, carrying on with the rows not yet checked. With
+    "prefetch_depth", the Event Details pages of the next events are loaded in other tabs while each event's
+    assignments are entered. If the time budget runs out, the events not yet opened are left in ems.unscheduled
+
+    Args:
+        ems (EMS): EMS object, on the event listing page
+        seen (set): keys of the listing rows already checked, see EMS.iter_events_to_schedule(). None to check every
+            row of this listing
+        budget (deadline.TimeBudget): time budget of the run, or None for no limit
+
+    Returns:
+        int: number of events scheduled or checked on their details page
+
+    Raises:
+        RuntimeError: the browser couldn't be recycled. The lease on the event about to be scheduled is given back
+    """
+
+    if seen is None:
+        seen = set()
+    count = 0
+    if settings.prefetch_depth > 0:
+        ems.prefetcher = make_prefetcher(ems.driver)
+
+    try:
+        while True:
+            rows = ems.iter_events_to_schedule(ems.iter_events(), seen)
+            queue = None
+            if settings.schedule_order == "deadline":
+                rows = queue = deadline.DeadlineQueue(rows, ems.get_setup_deadline)
+            for row, upcoming in prefetch.lookahead(rows, settings.prefetch_depth):
+                if budget is not None and budget.expired():
+                    ems.unscheduled = [row] + list(upcoming) + list(rows)
+                    forget_rows(seen, ems.unscheduled)
+                    logger.warning("Time budget ran out with {} events left to schedule".format(len(ems.unscheduled)))
+                    return count
+                try:
+                    ems.recycle_browser()
+                except Exception as e:
+                    # the old browser is gone, so the run can't carry on. Leave the event to another run
+                    logger.exception("Couldn't recycle the browser")
+                    ems.release_lease(row)
+                    forget_rows(seen, [row] + list(upcoming), queue)
+                    if ems.prefetcher is not None:
+                        ems.stop_prefetching("The browser couldn't be recycled")
+                    raise RuntimeError("Couldn't recycle the browser before event '{0}' with reservation # '{1}' ({2})"
+                                       .format(row.name, row.reservation, e)) from e
+                ems.upcoming = upcoming
+                with metrics.phase("schedule_event"), metrics.timed("autofill_event_duration_seconds"), \
+                        ems.recording():
+                    try:
+                        redo = ems.schedule_event(row.js_command, row)
+                    except Exception:
+                        # checked again at the next read of the listing, e.g. the daemon's next poll
+                        ems.release_lease(row)
+                        # nor have the rows read ahead for prefetching or waiting in the deadline queue
+                        forget_rows(seen, [row] + list(ems.upcoming), queue)
+                        raise
+                count += 1
+                if ems.leased and ems.leased[-1] is row:
+                    # checked again at the next read of the listing, in case the other run doesn't schedule it
+                    seen.discard(row.key)
+                if redo is not None:
+                    # the listing has to be read again after visiting a details page that wasn't scheduled. The rows
+                    # read ahead for prefetching or waiting in the deadline queue haven't been checked yet
+                    forget_rows(seen, ems.upcoming, queue)
+                    ems.navigate_to_event_listing_page(select_position=False)
+                    break
             else:
-                ems.navigate_to_event_listing_page(select_position=False)
-                redo = True
-                break
+                return count
+    finally:
+        ems.upcoming = ()
+        if ems.prefetcher is not None:
+            logger.info(ems.prefetcher.summary())
+            ems.prefetcher.close()
+            ems.prefetcher = None
 
-    generate_report(ems)
 
-finally:
+def forget_rows(seen, rows, queue=None):
+    """ Removes the keys of listing rows that weren't scheduled from the keys already checked, so they're checked
+    again at the next read of the listing
+
+    Args:
+        seen (set): keys of the listing rows already checked, see EMS.iter_events_to_schedule()
+        rows (iterable of ListingRow): rows to check again
+        queue (deadline.DeadlineQueue): with "schedule_order": "deadline", the queue whose rows not yet handed out
+            are checked again too. None if not used
+    """
+    for row in list(rows) + (queue.pending() if queue is not None else []):
+        seen.discard(row.key)
+
+
+def parse_arguments():
+    """ Parses the command line arguments
+
+    Returns:
+        argparse.Namespace: parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Auto-fill the EMS paperwork for the Ohio Union AV managers.")
+    parser.add_argument("--date", help="date to schedule, in 'M/D/YYYY' format. Overrides \"custom_date\"")
+    parser.add_argument("--end-date", help="schedule every date from --date through this date, in 'M/D/YYYY' format")
+    parser.add_argument("--force", action="store_true",
+                        help="schedule the date even if nothing changed since the last successful run")
+    parser.add_argument("--daemon", action="store_true",
+                        help="keep running, scheduling new and changed events every \"daemon_poll_interval_minutes\". "
+                             "Schedules --date, or tomorrow's date if not given. Stop with Ctrl+C")
+    parser.add_argument("--profile", nargs="?", const="profiles", metavar="DIRECTORY",
+                        help="profile CPU time and memory allocations by phase, and write them to DIRECTORY "
+                             "(default 'profiles')")
+    return parser.parse_args()
+
+
+def get_dates(args):
+    """ Returns the dates to schedule, from the command line arguments or settings.custom_date
+
+    Args:
+        args (argparse.Namespace): parsed arguments
+
+    Returns:
+        list of datetime.datetime: dates to schedule, in order
+    """
+    if args.date is not None:
+        dt = datetime.datetime.strptime(args.date, "%m/%d/%Y")
+    elif settings.custom_date is False:
+        dt = datetime.datetime.now() + datetime.timedelta(days=1)
+    else:
+        year, month, day, dt = read_and_validate_date()
+
+    if args.end_date is None:
+        return [dt]
+
+    end_dt = datetime.datetime.strptime(args.end_date, "%m/%d/%Y")
+    if end_dt < dt:
+        raise RuntimeError("--end-date '{0}' is before the start date '{1}'".format(args.end_date,
+                                                                                  dt.strftime("%m/%d/%Y")))
+    return [dt + datetime.timedelta(days=i) for i in range((end_dt - dt).days + 1)]
+
+
+def schedule_and_report(driver, dt, history, event_detail_cache, force, combined=None, budget=None):
+    """ Schedules the date and generates its report, unless there was nothing to do """
+    ems = schedule_date(driver, dt, history, event_detail_cache, force, budget)
+    if ems is not None:
+        generate_report(ems, combined)
+
+
+def schedule_dates(driver, dates, history, event_detail_cache, force, budget, combined=None):
+    """ Schedules and reports the dates in order. With "date_range_processes" over 1, a range is split across
+    worker processes, see schedule_dates_in_pool()
+
+    Args:
+        driver (webdriver): selenium webdriver. None if the dates are scheduled in worker processes
+        dates (list of datetime.datetime): dates
+        history (HistoryStore): store to record the runs in
+        event_detail_cache (detail_cache.DetailCache): cache of event details
+        force (bool): schedule the dates even if nothing changed since the last run
+        budget (deadline.TimeBudget): time budget of the run
+        combined (report.CombinedReport): combined report for a date range run, or None
+    """
+    if uses_pool(dates):
+        schedule_dates_in_pool(dates, force, combined)
+        return
+    for dt in dates_within_budget(dates, budget):
+        schedule_and_report(driver, dt, history, event_detail_cache, force, combined, budget)
+
+
+def uses_pool(dates):
+    return settings.date_range_processes > 1 and len(dates) > 1
+
+
+def schedule_dates_in_pool(dates, force, combined=None):
+    """ Splits the dates across "date_range_processes" worker processes, each with its own browser and EMS and W2W
+    sessions, and writes each date's report as its results come back, in date order. The workers record their runs
+    in the same history database. A worker over "process_memory_limit_mb" after a date is replaced
+
+    Args:
+        dates (list of datetime.datetime): dates
+        force (bool): schedule the dates even if nothing changed since the last run
+        combined (report.CombinedReport): combined report for the range, or None
+    """
+    processes = min(settings.date_range_processes, len(dates))
+    logger.info("Scheduling {0} dates in {1} processes".format(len(dates), processes))
+    date_pool = pool.ProcessPool(processes, schedule_date_in_worker, start_date_worker, stop_date_worker,
+                                 settings.process_memory_limit_mb * 1024 * 1024, logger)
+    for (dt, _), (prepared, worker_metrics) in date_pool.imap([(dt, force) for dt in dates]):
+        metrics.REGISTRY.merge(worker_metrics)
+        if prepared is not None:
+            write_report(*prepared, combined=combined)
+
+
+def launch_browser():
+    """ Launches the browser described by settings.json, recycled after "browser_recycle_events" events or above
+    "browser_recycle_memory_mb"
+
+    Returns:
+        browser.RecyclingDriver: driver for the run
+    """
+    return browser.RecyclingDriver(lambda: metrics.instrument_driver(browser.launch_from_settings(settings, logger)),
+                                   settings.browser_recycle_events, settings.browser_recycle_memory_mb, logger)
+
+
+def make_prefetcher(driver):
+    """ Returns a prefetch.TabPrefetcher for up to "prefetch_depth" tabs, whose prefetches take from the EMS rate limit
+
+    Args:
+        driver (webdriver): selenium webdriver, on the event listing
+    """
+    gate = ems_throttle.bucket.try_acquire if ems_throttle is not None else None
+    return prefetch.TabPrefetcher(driver, settings.prefetch_depth, EMS_LISTING_URL, logger, gate)
+
+
+def make_throttle(processes=1):
+    """ Sets up the throttle for the requests to EMS, from "ems_requests_per_minute", "ems_request_burst" and
+    "ems_slow_response_seconds"
+
+    Args:
+        processes (int): number of processes scheduling at once, which share the rate equally
+    """
+    global ems_throttle
+    ems_throttle = throttle.from_settings(settings, processes)
+
+
+def make_lease_store():
+    """ With "event_lease_minutes", opens the lease store in the history database, owned by this process """
+    global event_leases
+    if settings.event_lease_minutes > 0:
+        event_leases = leases.LeaseStore(settings.history_database, leases.make_owner(settings.ems_username),
+                                         settings.event_lease_minutes * 60)
+
+
+def start_date_worker():
+    """ Starts a date range worker process: launches its browser and opens the history database """
+    global worker_state
+    if settings is None:
+        # started with 'spawn', so the parent's globals weren't inherited
+        configure_logging()
+        read_settings()
+    # with 'fork', the parent's metrics were copied and are counted there
+    metrics.REGISTRY.reset()
+    driver = launch_browser()
+    make_throttle(settings.date_range_processes)
+    make_lease_store()
+    history = HistoryStore(settings.history_database)
+    worker_state = (driver, history, detail_cache.DetailCache(settings.detail_cache_size, history),
+                    deadline.TimeBudget(settings.time_budget_minutes))
+
+
+def schedule_date_in_worker(task):
+    """ Schedules a date in a worker process
+
+    Args:
+        task (tuple): date (datetime.datetime), force (bool)
+
+    Returns:
+        tuple: see prepare_report(), or None if there was nothing to do, and the metrics recorded since the last date
+            (see metrics.Registry.drain())
+    """
+    dt, force = task
+    driver, history, event_detail_cache, budget = worker_state
+    ems = schedule_date(driver, dt, history, event_detail_cache, force, budget)
+    return prepare_report(ems) if ems is not None else None, metrics.REGISTRY.drain()
+
+
+def stop_date_worker():
+    """ Stops a date range worker process: closes its browser and the history database """
+    driver, history, event_detail_cache, _ = worker_state
+    logger.info(event_detail_cache.summary())
+    logger.info(ems_throttle.summary())
+    if event_leases is not None:
+        event_leases.close()
+    history.close()
     driver.quit()
 
 
+def dates_within_budget(dates, budget):
+    """ Yields the dates in order until the time budget runs out, then logs the dates left """
+    for i, dt in enumerate(dates):
+        if budget.expired():
+            logger.warning("Time budget ran out. Dates not scheduled: {}".format(
+                ", ".join(left.strftime("%m/%d/%Y") for left in dates[i:])))
+            return
+        yield dt
+
+
+def load_daemon_schedule(driver, dt, ems, history):
+    """ Loads the schedule for the daemon. If it changed, updates the EMS object and records the shifts
+
+    Args:
+        driver (webdriver): selenium webdriver
+        dt (datetime.datetime): date being scheduled
+        ems (EMS): EMS object for the date
+        history (HistoryStore): store to record the shifts in
+
+    Returns:
+        bool: True if the schedule changed
+    """
+    with metrics.phase("w2w_scrape"):
+        schedule, previous_evening_worker = load_schedule(driver, dt)
+    if schedule == ems.schedule and previous_evening_worker == ems.previous_night_worker:
+        return False
+
+    ems.schedule = schedule
+    ems.previous_night_worker = previous_evening_worker
+    history.record_shifts(dt.date(), schedule)
+    return True
+
+
+def finish_daemon_date(ems, history):
+    """ Finishes the run for the date the daemon was scheduling """
+    history.finish_run()
+    generate_report(ems)
+
+
+def write_metrics(success):
+    """ Records how the run ended and writes the metrics to "metrics_textfile", if set
+
+    Args:
+        success (bool): True if the run finished without an error
+    """
+    metrics.set_gauge("autofill_last_run_success", 1 if success else 0)
+    metrics.set_gauge("autofill_last_run_timestamp_seconds", time.time())
+    if settings.metrics_textfile:
+        try:
+            metrics.write_textfile(settings.metrics_textfile)
+        except OSError as e:
+            logger.error("Couldn't write metrics to '{0}': {1}".format(settings.metrics_textfile, e))
 
+
+def run_daemon(driver, args, history, event_detail_cache):
+    """ Keeps the browser logged in and polls the event listing, scheduling only the events whose listing rows are
+    new or changed since the last poll. settings.json is reloaded when it changes. The schedule is reloaded when
+    schedule.json changes, or every "daemon_schedule_refresh_minutes" when using W2W. Without --date, moves on to the
+    next date at midnight. Runs until interrupted with Ctrl+C.
+
+    Args:
+        driver (webdriver): selenium webdriver
+        args (argparse.Namespace): parsed arguments
+        history (HistoryStore): store to record the runs in
+        event_detail_cache (detail_cache.DetailCache): cache of event details
+    """
+    settings_watcher = config.FileWatcher('settings.json')
+    schedule_watcher = config.FileWatcher('schedule.json')
+    ems = None
+    seen = set()
+    schedule_loaded = 0
+
+    try:
+        while True:
+            if settings_watcher.changed():
+                try:
+                    reload_settings()
+                    logger.info("Reloaded settings.json")
+                except RuntimeError as e:
+                    logger.error("Keeping the previous settings. {}".format(e))
+
+            if args.date is not None:
+                dt = datetime.datetime.strptime(args.date, "%m/%d/%Y")
+            else:
+                dt = datetime.datetime.combine(datetime.date.today() + datetime.timedelta(days=1), datetime.time())
+
+            try:
+                if ems is None or ems.date != dt.date():
+                    if ems is not None:
+                        finish_daemon_date(ems, history)
+                        ems = None
+                    logger.info("Scheduling {}".format(dt.strftime("%m/%d/%Y")))
+                    year, month, day = parse_date(dt)
+                    with metrics.phase("w2w_scrape"):
+                        schedule, previous_evening_worker = load_schedule(driver, dt)
+                    schedule_loaded = time.monotonic()
+                    with metrics.phase("ems_setup"):
+                        new_ems = EMS(driver, logger, schedule, previous_evening_worker, year, month, day, history,
+                                      event_detail_cache)
+                    # only once logged in, so a failing first poll doesn't leave a run that never finishes
+                    history.start_run(dt.date())
+                    history.record_shifts(dt.date(), schedule)
+                    ems = new_ems
+                    seen = set()
+                else:
+                    if settings.use_w2w:
+                        stale = time.monotonic() - schedule_loaded >= settings.daemon_schedule_refresh_minutes * 60
+                    else:
+                        stale = schedule_watcher.changed()
+                    if stale:
+                        schedule_loaded = time.monotonic()
+                        if load_daemon_schedule(driver, dt, ems, history):
+                            logger.info("Schedule changed")
+                            # with diffing, already scheduled events are updated to the new schedule
+                            if settings.diff_existing_assignments:
+                                seen.clear()
+
+                    # refresh the event listing
+                    ems.setup_ems()
+
+                with metrics.phase("schedule_events"):
+                    count = schedule_listing(ems, seen)
+                logger.info("{} new or changed events checked".format(count))
+                if count > 0:
+                    generate_report(ems)
+                write_metrics(True)
+            except (SeleniumExceptions.WebDriverException, RuntimeError):
+                logger.exception("Poll failed, retrying at the next poll")
+                write_metrics(False)
+
+            time.sleep(settings.daemon_poll_interval_minutes * 60)
+    except KeyboardInterrupt:
+        logger.info("Stopping daemon")
+
+    if ems is not None:
+        finish_daemon_date(ems, history)
+
+
+def main():
+    args = parse_arguments()
+
+    # Setup environment
+    setup()
+
+    dates = get_dates(args) if not args.daemon else []
+    if args.profile is not None and uses_pool(dates):
+        raise RuntimeError("--profile only profiles this process. Set \"date_range_processes\" to 1 to profile a "
+                           "date range")
+
+    # Get the web driver. Date range worker processes launch their own
+    driver = None
+    if args.daemon or not uses_pool(dates):
+        driver = launch_browser()
+        make_throttle()
+        make_lease_store()
+    success = False
+
+    run_profiler = None
+    if args.profile is not None:
+        run_profiler = profiler.Profiler(args.profile)
+        metrics.add_phase_listener(run_profiler.phase)
+        run_profiler.start()
+
+    try:
+        # the budget covers the whole run, from here
+        budget = deadline.TimeBudget(settings.time_budget_minutes)
+        history = HistoryStore(settings.history_database)
+        event_detail_cache = detail_cache.DetailCache(settings.detail_cache_size, history)
+
+        try:
+            if args.daemon:
+                run_daemon(driver, args, history, event_detail_cache)
+            elif len(dates) == 1 or settings.generate_report is False:
+                schedule_dates(driver, dates, history, event_detail_cache, args.force, budget)
+            else:
+                first_label = "{0}-{1}-{2}".format(*parse_date(dates[0]))
+                last_label = "{0}-{1}-{2}".format(*parse_date(dates[-1]))
+                with report.CombinedReport(settings.report_directory, first_label, last_label,
+                                           settings.report_formats) as combined:
+                    schedule_dates(driver, dates, history, event_detail_cache, args.force, budget, combined)
+            success = True
+        finally:
+            logger.info(event_detail_cache.summary())
+            if ems_throttle is not None:
+                logger.info(ems_throttle.summary())
+            if event_leases is not None:
+                event_leases.close()
+            history.close()
+
+    finally:
+        if driver is not None:
+            driver.quit()
+        write_metrics(success)
+        if run_profiler is not None:
+            run_profiler.stop()
+            run_profiler.write()
+            logger.info("Wrote profiles to '{}'".format(args.profile))
+
+
+if __name__ == "__main__":
+    main()
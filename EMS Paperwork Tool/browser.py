@@ -0,0 +1,235 @@
+"""
+Ohio Union EMS Autofill Tool - browser launcher
+
+Launches Google Chrome with a profile tuned for the tool: optionally headless, without the images, fonts and
+stylesheets the tool never looks at, with the 'eager' page load strategy (don't wait for subresources), and with
+extensions, sync and the GPU disabled. Each option is a setting in settings.json.
+
+Chrome's memory grows over a long run, so the tool drives it through a RecyclingDriver, which replaces the browser with
+a fresh one after "browser_recycle_events" events, or once it uses more than "browser_recycle_memory_mb".
+
+Compare page load times of the tuned profile against Chrome's default profile with:
+    python3 browser.py --benchmark [--runs 5] [url ...]
+"""
+import argparse
+import collections
+import statistics
+import time
+
+import memory
+
+BLOCKED_FONT_URLS = ["*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot"]
+BLOCKED_STYLESHEET_URLS = ["*.css"]
+
+DISABLE_EXTRAS_ARGUMENTS = ["--disable-extensions",
+                            "--disable-sync",
+                            "--disable-gpu",
+                            "--disable-background-networking",
+                            "--disable-default-apps",
+                            "--no-first-run"]
+
+BENCHMARK_URLS = ["https://whentowork.com/logins.htm",
+                  "http://ohiounion.osu.edu/ems"]
+
+# arguments (list of str): Chrome command line arguments
+# prefs (dict): Chrome preferences
+# blocked_urls (list of str): URL patterns blocked through the DevTools protocol
+# page_load_strategy (str): 'normal', 'eager' or 'none'
+BrowserProfile = collections.namedtuple("BrowserProfile", ["arguments", "prefs", "blocked_urls", "page_load_strategy"])
+
+DEFAULT_PROFILE = BrowserProfile([], {}, [], "normal")
+
+
+def profile_from_settings(settings):
+    """ Builds the browser profile described by settings.json
+
+    Args:
+        settings (config.Settings): settings
+
+    Returns:
+        BrowserProfile: profile
+    """
+    arguments = []
+    prefs = {}
+    blocked_urls = []
+
+    if settings.browser_headless:
+        arguments += ["--headless", "--window-size=1920,1080"]
+    if settings.browser_disable_extras:
+        arguments += DISABLE_EXTRAS_ARGUMENTS
+    if settings.browser_block_images:
+        prefs["profile.managed_default_content_settings.images"] = 2
+        arguments.append("--blink-settings=imagesEnabled=false")
+    if settings.browser_block_fonts:
+        blocked_urls += BLOCKED_FONT_URLS
+    if settings.browser_block_stylesheets:
+        blocked_urls += BLOCKED_STYLESHEET_URLS
+
+    return BrowserProfile(arguments, prefs, blocked_urls, settings.browser_page_load_strategy)
+
+
+def launch(profile, logging=None):
+    """ Launches Chrome with the profile
+
+    Args:
+        profile (BrowserProfile): profile
+        logging (logging): logger, or None
+
+    Returns:
+        webdriver.Chrome: the driver
+    """
+    from selenium import webdriver
+
+    options = webdriver.ChromeOptions()
+    for argument in profile.arguments:
+        options.add_argument(argument)
+    if profile.prefs:
+        options.add_experimental_option("prefs", profile.prefs)
+
+    capabilities = options.to_capabilities()
+    capabilities["pageLoadStrategy"] = profile.page_load_strategy
+    driver = webdriver.Chrome(desired_capabilities=capabilities)
+
+    if profile.blocked_urls:
+        if hasattr(driver, "execute_cdp_cmd"):
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": profile.blocked_urls})
+        elif logging is not None:
+            logging.warning("This version of Selenium can't block fonts or stylesheets. Upgrade Selenium, or turn "
+                            "off \"browser_block_fonts\" and \"browser_block_stylesheets\"")
+
+    if logging is not None:
+        logging.debug("Launched Chrome with {}".format(profile))
+    return driver
+
+
+def launch_from_settings(settings, logging=None):
+    """ Launches Chrome with the profile described by settings.json """
+    return launch(profile_from_settings(settings), logging)
+
+
+class RecyclingDriver:
+    """ Stands in for the webdriver for the whole run. Attributes and methods not defined here are those of the
+    current browser, so code holding the RecyclingDriver carries on with the new browser after a recycle. The caller
+    decides when to recycle, between events, and logs back in """
+
+    def __init__(self, launcher, recycle_events=0, recycle_memory_mb=0, logging=None):
+        """
+        Args:
+            launcher (callable): launches a browser and returns its webdriver
+            recycle_events (int): events after which to recycle the browser. 0 for no limit
+            recycle_memory_mb (int): memory of the browser processes over which to recycle it. 0 for no limit
+            logging (logging): logger, or None
+        """
+        self.launcher = launcher
+        self.recycle_events = recycle_events
+        self.recycle_memory_bytes = recycle_memory_mb * 1024 * 1024
+        self.logger = logging
+        self.current_driver = launcher()
+        self.events_since_launch = 0
+        self.recycles = 0
+
+    def __getattr__(self, name):
+        if name == "current_driver":
+            # not launched yet
+            raise AttributeError(name)
+        return getattr(self.current_driver, name)
+
+    def browser_rss_bytes(self):
+        """ Returns the resident memory of chromedriver and the browser processes it started, or None if unknown """
+        process = getattr(getattr(self.current_driver, "service", None), "process", None)
+        if process is None:
+            return None
+        return memory.tree_rss_bytes(process.pid)
+
+    def start_event(self):
+        """ Counts an event about to be scheduled, and returns why the browser should be recycled first
+
+        Returns:
+            str: reason, for the log. None if the browser can be kept
+        """
+        self.events_since_launch += 1
+        if 0 < self.recycle_events < self.events_since_launch:
+            return "after {} events".format(self.recycle_events)
+        if self.recycle_memory_bytes > 0:
+            rss = self.browser_rss_bytes()
+            if rss is not None and rss > self.recycle_memory_bytes:
+                return "browser uses {} MiB".format(rss // (1024 * 1024))
+        return None
+
+    def recycle(self, reason):
+        """ Quits the browser and launches a new one. Its sessions have to be set up again
+
+        Args:
+            reason (str): why, for the log
+        """
+        before = self.browser_rss_bytes()
+        try:
+            self.current_driver.quit()
+        except Exception:
+            if self.logger is not None:
+                self.logger.exception("Couldn't quit the old browser")
+        self.current_driver = self.launcher()
+        self.events_since_launch = 1
+        self.recycles += 1
+        if self.logger is not None:
+            self.logger.info("Recycled the browser ({0}). Memory before: {1}, after: {2}".format(
+                reason, format_mib(before), format_mib(self.browser_rss_bytes())))
+
+
+def format_mib(size):
+    return "unknown" if size is None else "{} MiB".format(size // (1024 * 1024))
+
+
+def time_page_loads(profile, urls, runs):
+    """ Loads each URL 'runs' times in a fresh browser with the profile
+
+    Args:
+        profile (BrowserProfile): profile
+        urls (list of str): URLs to load
+        runs (int): times to load each URL
+
+    Returns:
+        dict: url -> list of load times in seconds
+    """
+    driver = launch(profile)
+    try:
+        times = {url: [] for url in urls}
+        for _ in range(runs):
+            for url in urls:
+                driver.delete_all_cookies()
+                start = time.perf_counter()
+                driver.get(url)
+                times[url].append(time.perf_counter() - start)
+        return times
+    finally:
+        driver.quit()
+
+
+def benchmark(settings, urls, runs):
+    """ Prints the page load times of Chrome's default profile and the tuned profile """
+    profiles = [("default", DEFAULT_PROFILE), ("tuned", profile_from_settings(settings))]
+    results = {name: time_page_loads(profile, urls, runs) for name, profile in profiles}
+
+    print("{0:<45} {1:>12} {2:>12} {3:>8}".format("URL", "default (s)", "tuned (s)", "change"))
+    for url in urls:
+        default_median = statistics.median(results["default"][url])
+        tuned_median = statistics.median(results["tuned"][url])
+        print("{0:<45} {1:>12.3f} {2:>12.3f} {3:>7.0%}".format(url[:45], default_median, tuned_median,
+                                                                (tuned_median - default_median) / default_median))
+
+
+def main():
+    import config
+
+    parser = argparse.ArgumentParser(description="Benchmark page loads of the tuned browser profile.")
+    parser.add_argument("--benchmark", action="store_true", required=True)
+    parser.add_argument("--runs", type=int, default=5, help="loads of each URL per profile")
+    parser.add_argument("urls", nargs="*", default=BENCHMARK_URLS)
+    args = parser.parse_args()
+
+    benchmark(config.load_settings("settings.json"), args.urls, args.runs)
+
+
+if __name__ == "__main__":
+    main()
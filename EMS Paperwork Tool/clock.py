@@ -0,0 +1,159 @@
+"""
+Ohio Union EMS Autofill Tool - time of day parsing
+
+One parser for the times of day in EMS ('6:30 PM'), WhenToWork ('6pm', '6:30pm') and settings.json. A day only uses a
+handful of distinct times, and each is parsed many times over (every worker's shift is re-parsed for every event), so
+parsing and formatting are memoised in a small LRU cache.
+
+Compare against strptime with:
+    python3 clock.py --benchmark [--number 100000]
+"""
+import argparse
+import datetime
+import functools
+import timeit
+
+# the date times from EMS and W2W are put on, so they can be compared and shifted
+BASE_DATETIME = datetime.datetime(2016, 1, 1)
+ONE_MINUTE = datetime.timedelta(minutes=1)
+ONE_DAY = datetime.timedelta(days=1)
+MINUTES_PER_DAY = 24 * 60
+NOON = 12 * 60
+
+CACHE_SIZE = 256
+
+BENCHMARK_TIMES = ("6pm", "6:30pm", "12am", "11:45am", "06:30 PM", "7:00 PM", "12:00 AM", "9:15 AM")
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def to_minutes(text):
+    """ Converts a time of day to minutes after midnight. Accepts an hour from 1 to 12, optionally followed by ':' and
+    two digits of minutes, then AM or PM in either case, optionally after a space: '6pm', '6:30pm', '06:30 PM',
+    '12:00 AM'
+
+    Args:
+        text (str): time of day
+
+    Returns:
+        int: minutes after midnight. None if the time isn't in one of the formats
+    """
+    text = text.strip()
+    suffix = text[-2:].upper()
+    if suffix == "AM":
+        offset = 0
+    elif suffix == "PM":
+        offset = NOON
+    else:
+        return None
+
+    hour_text, _, minute_text = text[:-2].rstrip().partition(":")
+    if not hour_text.isdigit() or len(hour_text) > 2:
+        return None
+    if minute_text and (not minute_text.isdigit() or len(minute_text) != 2):
+        return None
+
+    hour = int(hour_text)
+    minute = int(minute_text) if minute_text else 0
+    if not 1 <= hour <= 12 or minute > 59:
+        return None
+    return (hour % 12) * 60 + minute + offset
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def from_minutes(minutes, zero_pad=False):
+    """ Formats minutes after midnight as a time of day in EMS format, '6:30 PM'. Wraps past midnight
+
+    Args:
+        minutes (int): minutes after midnight
+        zero_pad (bool): pad the hour to two digits, '06:30 PM', as the WhenToWork schedule is stored
+
+    Returns:
+        str: time of day
+    """
+    hour, minute = divmod(minutes % MINUTES_PER_DAY, 60)
+    ampm = "AM" if hour < 12 else "PM"
+    hour = hour % 12 or 12
+    return "{0:0{1}}:{2:02} {3}".format(hour, 2 if zero_pad else 1, minute, ampm)
+
+
+def normalize(text, zero_pad=False):
+    """ Rewrites a time of day in any format to_minutes() accepts in EMS format
+
+    Args:
+        text (str): time of day
+        zero_pad (bool): pad the hour to two digits
+
+    Returns:
+        str: time of day, '6:30 PM'
+
+    Raises:
+        RuntimeError: the time can't be parsed
+    """
+    minutes = to_minutes(text)
+    if minutes is None:
+        raise RuntimeError("Unable to parse time - '{}'".format(text))
+    return from_minutes(minutes, zero_pad)
+
+
+def to_datetime(text):
+    """ Converts a time of day to a datetime on BASE_DATETIME
+
+    Raises:
+        RuntimeError: the time can't be parsed
+    """
+    minutes = to_minutes(text)
+    if minutes is None:
+        raise RuntimeError("Unable to parse time - '{}'".format(text))
+    return BASE_DATETIME + minutes * ONE_MINUTE
+
+
+def span_to_datetimes(start_time, end_time):
+    """ Converts the start and end of an event or shift to datetimes on BASE_DATETIME. An end in the morning after a
+    start in the evening, or an end of 12:xx AM, is on the next day
+
+    Args:
+        start_time (str): start time of day
+        end_time (str): end time of day
+
+    Returns:
+        datetime.datetime: start
+        datetime.datetime: end
+
+    Raises:
+        RuntimeError: a time can't be parsed
+    """
+    start_dt = to_datetime(start_time)
+    end_dt = to_datetime(end_time)
+    end_minutes = end_dt.hour * 60 + end_dt.minute
+    if end_minutes < NOON and (start_dt.hour >= 12 or end_minutes < 60):
+        end_dt += ONE_DAY
+    return start_dt, end_dt
+
+
+def strptime_normalize(text):
+    """ The strptime and strftime round trip to_minutes() replaced, for the benchmark """
+    time_format = "%I:%M%p" if ":" in text else "%I%p"
+    return datetime.datetime.strptime(text.replace(" ", ""), time_format).strftime("%I:%M %p")
+
+
+def benchmark(number):
+    """ Prints the time per call of normalize() and of strptime, over BENCHMARK_TIMES """
+    candidates = [("strptime + strftime", strptime_normalize),
+                  ("clock.normalize", normalize)]
+    print("{0:<22} {1:>12}".format("parser", "ns per time"))
+    for name, parse in candidates:
+        seconds = timeit.timeit(lambda: [parse(text) for text in BENCHMARK_TIMES], number=number)
+        print("{0:<22} {1:>12.0f}".format(name, seconds / (number * len(BENCHMARK_TIMES)) * 1e9))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the time of day parser.")
+    parser.add_argument("--benchmark", action="store_true", required=True)
+    parser.add_argument("--number", type=int, default=100000, help="passes over the sample times")
+    args = parser.parse_args()
+
+    benchmark(args.number)
+
+
+if __name__ == "__main__":
+    main()
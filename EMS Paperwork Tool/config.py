@@ -0,0 +1,324 @@
+"""
+Ohio Union EMS Autofill Tool - settings
+
+Loads settings.json once into an immutable Settings object. Every setting is checked at startup, so a typo in
+settings.json is reported before the browser is driven rather than part way through a run. Values that the hot paths
+would otherwise recompute for every event (the setup cutoffs, the rooms to skip) are precomputed.
+"""
+import json
+import os
+import re
+
+import clock
+import report
+
+# setting name -> expected type. list settings must contain only strings.
+SCHEMA = {
+    "current_manager_first_name": str,
+    "current_manager_last_name": str,
+    "ems_username": str,
+    "ems_password": str,
+    "w2w_username": str,
+    "w2w_password": str,
+    "use_w2w_manager_for_previous_day_setup": bool,
+    "minutes_to_advance_setup": int,
+    "minutes_to_advance_checkin": int,
+    "minutes_to_delay_teardown": int,
+    "previous_day_setup_cutoff": str,
+    "late_open_previous_day_setup_cutoff": str,
+    "setup_time_night_before": str,
+    "use_w2w": bool,
+    "custom_date": bool,
+    "skip_already_scheduled": bool,
+    "diff_existing_assignments": bool,
+    "skip_already_confirmed": bool,
+    "skip_checking_for_av": bool,
+    "skip_events_with_no_av": bool,
+    "skip_rooms": bool,
+    "generate_report": bool,
+    "report_directory": str,
+    "report_formats": list,
+    "history_database": str,
+    "detail_cache_size": int,
+    "daemon_poll_interval_minutes": int,
+    "daemon_schedule_refresh_minutes": int,
+    "browser_headless": bool,
+    "browser_block_images": bool,
+    "browser_block_fonts": bool,
+    "browser_block_stylesheets": bool,
+    "browser_page_load_strategy": str,
+    "browser_disable_extras": bool,
+    "browser_recycle_events": int,
+    "browser_recycle_memory_mb": int,
+    "metrics_textfile": str,
+    "prefetch_depth": int,
+    "setup_duration_minutes": int,
+    "checkin_duration_minutes": int,
+    "teardown_duration_minutes": int,
+    "back_to_back_minutes": int,
+    "assignment_strategy": str,
+    "room_distances_file": str,
+    "route_window_minutes": int,
+    "schedule_order": str,
+    "time_budget_minutes": int,
+    "date_range_processes": int,
+    "process_memory_limit_mb": int,
+    "ems_requests_per_minute": int,
+    "ems_request_burst": int,
+    "ems_slow_response_seconds": int,
+    "event_lease_minutes": int,
+    "manager_position": str,
+    "order_to_assign_general_shift": list,
+    "order_to_assign_previous_evening_general_shift": list,
+    "skip_following_rooms": list,
+}
+
+# Settings added after the first release, so older settings.json files still load
+DEFAULTS = {
+    "diff_existing_assignments": False,
+    "report_directory": "reports",
+    "report_formats": ["txt", "json"],
+    "history_database": "history.sqlite3",
+    "detail_cache_size": 2000,
+    "daemon_poll_interval_minutes": 10,
+    "daemon_schedule_refresh_minutes": 60,
+    "browser_headless": False,
+    "browser_block_images": False,
+    "browser_block_fonts": False,
+    "browser_block_stylesheets": False,
+    "browser_page_load_strategy": "normal",
+    "browser_disable_extras": False,
+    "browser_recycle_events": 0,
+    "browser_recycle_memory_mb": 0,
+    "metrics_textfile": "",
+    "prefetch_depth": 0,
+    "setup_duration_minutes": 15,
+    "checkin_duration_minutes": 5,
+    "teardown_duration_minutes": 15,
+    "back_to_back_minutes": 0,
+    "assignment_strategy": "first_match",
+    "room_distances_file": "",
+    "route_window_minutes": 30,
+    "schedule_order": "listing",
+    "time_budget_minutes": 0,
+    "date_range_processes": 1,
+    "process_memory_limit_mb": 0,
+    "ems_requests_per_minute": 0,
+    "ems_request_burst": 5,
+    "ems_slow_response_seconds": 10,
+    "event_lease_minutes": 15,
+}
+
+# settings that change which events are scheduled or who is assigned to them, see Settings.planning_values()
+PLANNING_SETTINGS = ("use_w2w_manager_for_previous_day_setup", "minutes_to_advance_setup", "minutes_to_advance_checkin",
+                     "minutes_to_delay_teardown", "previous_day_setup_cutoff", "late_open_previous_day_setup_cutoff",
+                     "setup_time_night_before", "skip_already_scheduled", "diff_existing_assignments",
+                     "skip_already_confirmed", "skip_checking_for_av", "skip_events_with_no_av", "skip_rooms",
+                     "skip_following_rooms", "assignment_strategy", "schedule_order", "manager_position",
+                     "order_to_assign_general_shift", "order_to_assign_previous_evening_general_shift")
+
+TIME_SETTINGS = ("previous_day_setup_cutoff", "late_open_previous_day_setup_cutoff", "setup_time_night_before")
+
+
+class Settings:
+    """ Read-only settings. Each setting in settings.json is an attribute; lists are stored as tuples.
+
+    Precomputed attributes:
+        previous_day_setup_cutoff_minutes (int): "previous_day_setup_cutoff" in minutes after midnight
+        late_open_previous_day_setup_cutoff_minutes (int): "late_open_previous_day_setup_cutoff" in minutes after
+            midnight
+        setup_time_night_before_minutes (int): "setup_time_night_before" in minutes after midnight
+        skip_room_set (frozenset): "skip_following_rooms", for exact lookups
+        skip_room_pattern (re.Pattern): matches any of "skip_following_rooms" inside a room name
+    """
+
+    __slots__ = tuple(SCHEMA) + ("previous_day_setup_cutoff_minutes",
+                                 "late_open_previous_day_setup_cutoff_minutes",
+                                 "setup_time_night_before_minutes",
+                                 "skip_room_set",
+                                 "skip_room_pattern")
+
+    def __init__(self, values):
+        """
+        Args:
+            values (dict): validated settings, see validate_settings()
+        """
+        for name in SCHEMA:
+            value = values[name]
+            object.__setattr__(self, name, tuple(value) if isinstance(value, list) else value)
+
+        for name in TIME_SETTINGS:
+            # in EMS format, so they compare equal to the times shown in EMS
+            object.__setattr__(self, name, clock.normalize(values[name]))
+            object.__setattr__(self, name + "_minutes", clock.to_minutes(values[name]))
+
+        object.__setattr__(self, "skip_room_set", frozenset(values["skip_following_rooms"]))
+        # longest first, so the reported match is the most specific room
+        rooms = sorted(values["skip_following_rooms"], key=len, reverse=True)
+        pattern = "|".join(re.escape(room) for room in rooms) if rooms else r"(?!)"
+        object.__setattr__(self, "skip_room_pattern", re.compile(pattern))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Settings are read-only. Edit settings.json instead")
+
+    def __delattr__(self, name):
+        raise AttributeError("Settings are read-only. Edit settings.json instead")
+
+    def to_dict(self):
+        """ Returns the settings as in settings.json, with lists as tuples """
+        return {name: getattr(self, name) for name in SCHEMA}
+
+    def planning_values(self):
+        """ Returns the settings that change which events are scheduled or who is assigned to them. Settings that
+        only change the reports, the browser or how fast EMS is asked aren't included """
+        return {name: getattr(self, name) for name in PLANNING_SETTINGS}
+
+    def is_skipped_room(self, room_name):
+        """ Checks if the room, as shown in the event listing, is one of "skip_following_rooms"
+
+        Args:
+            room_name (str): room name
+
+        Returns:
+            bool: True if the room should be skipped
+        """
+        return room_name in self.skip_room_set
+
+    def find_skipped_room(self, full_room_name):
+        """ Finds a room of "skip_following_rooms" contained in the room name from the Event Details page, in a
+        single pass over the name
+
+        Args:
+            full_room_name (str): room name
+
+        Returns:
+            str: the room from "skip_following_rooms" that was found. None if there's none
+        """
+        match = self.skip_room_pattern.search(full_room_name)
+        return match.group(0) if match is not None else None
+
+
+class FileWatcher:
+    """ Detects when a file has been modified, by its modification time """
+
+    def __init__(self, path):
+        self.path = path
+        self.mtime = self.current_mtime()
+
+    def current_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def changed(self):
+        """ Returns True if the file was modified, created or deleted since the last call (or since creation) """
+        mtime = self.current_mtime()
+        if mtime == self.mtime:
+            return False
+        self.mtime = mtime
+        return True
+
+
+def validate_settings(values):
+    """ Fills in DEFAULTS and checks every setting has the right type and format
+
+    Args:
+        values (dict): settings as read from settings.json
+
+    Returns:
+        dict: settings with defaults filled in
+
+    Raises:
+        RuntimeError: one or more settings are missing or invalid. The message lists all of them
+    """
+    if not isinstance(values, dict):
+        raise RuntimeError("settings.json must contain a JSON object")
+
+    values = dict(DEFAULTS, **values)
+    errors = []
+
+    for name, expected_type in SCHEMA.items():
+        if name not in values:
+            errors.append("'{}' is missing".format(name))
+            continue
+        value = values[name]
+        # bool is a subclass of int, so check it explicitly
+        if not isinstance(value, expected_type) or (expected_type is int and isinstance(value, bool)):
+            errors.append("'{0}' should be {1}, got {2}".format(name, expected_type.__name__, json.dumps(value)))
+        elif expected_type is list and not all(isinstance(item, str) for item in value):
+            errors.append("'{}' should only contain strings".format(name))
+
+    for name in TIME_SETTINGS:
+        if isinstance(values.get(name), str) and clock.to_minutes(values[name]) is None:
+            errors.append("'{0}' should be a time like '10:00 AM', got '{1}'".format(name, values[name]))
+
+    for name in ("minutes_to_advance_setup", "minutes_to_advance_checkin", "minutes_to_delay_teardown",
+                 "detail_cache_size", "daemon_schedule_refresh_minutes", "prefetch_depth",
+                 "setup_duration_minutes", "checkin_duration_minutes", "teardown_duration_minutes",
+                 "back_to_back_minutes", "route_window_minutes",
+                 "time_budget_minutes", "process_memory_limit_mb",
+                 "browser_recycle_events", "browser_recycle_memory_mb",
+                 "ems_requests_per_minute", "ems_slow_response_seconds", "event_lease_minutes"):
+        if isinstance(values.get(name), int) and values[name] < 0:
+            errors.append("'{}' should not be negative".format(name))
+
+    for name in ("daemon_poll_interval_minutes", "date_range_processes", "ems_request_burst"):
+        if isinstance(values.get(name), int) and values[name] < 1:
+            errors.append("'{}' should be at least 1".format(name))
+
+    if isinstance(values.get("browser_page_load_strategy"), str) and \
+            values["browser_page_load_strategy"] not in ("normal", "eager", "none"):
+        errors.append("'browser_page_load_strategy' should be 'normal', 'eager' or 'none', got '{}'"
+                      .format(values["browser_page_load_strategy"]))
+
+    if isinstance(values.get("assignment_strategy"), str) and \
+            values["assignment_strategy"] not in ("first_match", "balanced"):
+        errors.append("'assignment_strategy' should be 'first_match' or 'balanced', got '{}'"
+                      .format(values["assignment_strategy"]))
+
+    if isinstance(values.get("schedule_order"), str) and values["schedule_order"] not in ("listing", "deadline"):
+        errors.append("'schedule_order' should be 'listing' or 'deadline', got '{}'".format(values["schedule_order"]))
+
+    if isinstance(values.get("order_to_assign_general_shift"), list) and \
+            len(values["order_to_assign_general_shift"]) == 0:
+        errors.append("'order_to_assign_general_shift' should list at least one position")
+
+    if isinstance(values.get("report_formats"), list):
+        for report_format in values["report_formats"]:
+            if report_format not in report.REPORT_FORMATS:
+                errors.append("'report_formats' should only contain {0}, got '{1}'"
+                              .format(", ".join(report.REPORT_FORMATS), report_format))
+
+    unknown = sorted(set(values) - set(SCHEMA))
+    if unknown:
+        errors.append("unknown settings: {}".format(", ".join(unknown)))
+
+    if errors:
+        raise RuntimeError("Invalid settings.json:\n - " + "\n - ".join(errors))
+
+    return values
+
+
+def load_settings(path="settings.json"):
+    """ Reads, validates and compiles settings.json
+
+    Args:
+        path (str): path to settings.json
+
+    Returns:
+        Settings: the settings
+
+    Raises:
+        RuntimeError: settings.json doesn't exist, isn't valid JSON, or has invalid settings
+    """
+    if not os.path.isfile(path):
+        raise RuntimeError("settings.json doesn't exist in path '{}'".format(os.getcwd()))
+
+    try:
+        with open(path, 'r') as settings_file:
+            values = json.load(settings_file)
+    except ValueError as e:
+        raise RuntimeError("Error reading settings.json: {}".format(e))
+
+    return Settings(validate_settings(values))
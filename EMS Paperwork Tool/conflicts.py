@@ -0,0 +1,96 @@
+"""
+Ohio Union EMS Autofill Tool - worker conflicts
+
+EMS.find_worker_at_time() gives every assignment at a time to the first worker on shift, so one worker can be sent to
+several rooms at once. Each assignment takes a service time by type ("setup_duration_minutes",
+"checkin_duration_minutes", "teardown_duration_minutes"); find_conflicts() sorts each worker's assignments by time and
+sweeps them once, grouping assignments that overlap or follow each other within "back_to_back_minutes". A group with
+assignments in more than one room is a conflict. Assignments in the same room are one trip, so they never conflict
+with each other.
+"""
+import collections
+import datetime
+
+import shift_coverage
+
+OVERLAP = "overlapping"
+BACK_TO_BACK = "back-to-back"
+
+# worker (str), kind (OVERLAP or BACK_TO_BACK), start and end (datetime.datetime): from the first assignment's start
+# to the latest end, assignments (list of dict): see EMS.return_assignment_dict(), in time order
+Conflict = collections.namedtuple("Conflict", ["worker", "kind", "start", "end", "assignments"])
+
+
+def service_minutes(settings):
+    """ Returns the service time of each assignment type, keyed by the lower case type ('check-in') """
+    return {"setup": settings.setup_duration_minutes,
+            "check-in": settings.checkin_duration_minutes,
+            "teardown": settings.teardown_duration_minutes}
+
+
+def find_conflicts(workers, durations, back_to_back_minutes=0, night_before_time=None):
+    """ Finds the workers sent to more than one room at once, or with no time between rooms
+
+    Args:
+        workers (dict): EMS.workers, {worker name: [assignment dict, ...]}
+        durations (dict): minutes per lower case assignment type, see service_minutes(). Other types take 0 minutes
+        back_to_back_minutes (int): assignments starting within this many minutes of the end of the previous ones are
+            back-to-back
+        night_before_time (str): "setup_time_night_before". Setups at that time are all given to the previous
+            night's worker at the same time, to be done the night before, so they don't conflict
+
+    Returns:
+        list of Conflict: by worker, then time
+    """
+    slack = datetime.timedelta(minutes=back_to_back_minutes)
+    conflicts = []
+    for worker, assignments in workers.items():
+        if worker == shift_coverage.UNASSIGNED:
+            continue
+        intervals = sorted(((assignment["DateTime"],
+                             assignment["DateTime"] + datetime.timedelta(
+                                 minutes=durations.get(assignment["AssignmentType"].lower(), 0)),
+                             index, assignment)
+                            for index, assignment in enumerate(assignments)
+                            if not shift_coverage.is_night_before_setup(assignment, night_before_time)))
+        group = []
+        # the two latest ends in the group from different rooms, as (end, room), so the latest end of another room
+        # is known in constant time
+        latest = second = None
+        overlapping = False
+        for start, end, _, assignment in intervals:
+            room = assignment["Room"]
+            if group and start > latest[0] + slack:
+                add_conflict(conflicts, worker, group, latest[0], overlapping)
+                group = []
+                latest = second = None
+                overlapping = False
+
+            if group:
+                other_end = latest[0] if latest[1] != room else (second[0] if second is not None else None)
+                if other_end is not None and start < other_end:
+                    overlapping = True
+
+            group.append(assignment)
+            if latest is None or end > latest[0]:
+                if latest is not None and latest[1] != room:
+                    second = latest
+                latest = (end, room)
+            elif room != latest[1] and (second is None or end > second[0]):
+                second = (end, room)
+        if group:
+            add_conflict(conflicts, worker, group, latest[0], overlapping)
+    return conflicts
+
+
+def add_conflict(conflicts, worker, group, end, overlapping):
+    if len({assignment["Room"] for assignment in group}) > 1:
+        conflicts.append(Conflict(worker, OVERLAP if overlapping else BACK_TO_BACK, group[0]["DateTime"], end, group))
+
+
+def conflict_line(conflict):
+    """ Returns a line describing the conflict, for the top of the report and the log """
+    rooms = list(collections.OrderedDict.fromkeys(assignment["Room"] for assignment in conflict.assignments))
+    return "{0} has {1} {2} assignments in {3} rooms from {4} to {5}: {6}".format(
+        conflict.worker, len(conflict.assignments), conflict.kind, len(rooms),
+        shift_coverage.format_time(conflict.start), shift_coverage.format_time(conflict.end), ", ".join(rooms))
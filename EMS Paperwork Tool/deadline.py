@@ -0,0 +1,57 @@
+"""
+Ohio Union EMS Autofill Tool - deadline order and time budget
+
+The listing is in the order EMS shows it, so a slow or interrupted run can leave tomorrow morning's setups unentered
+while evening events were done. With "schedule_order": "deadline", the filtered listing rows are put in a heap keyed
+by setup time and handed out earliest first. With "time_budget_minutes", the run stops before opening the next event
+once the budget is spent, and the events left are logged and listed at the top of the report.
+"""
+import heapq
+import time
+
+
+class TimeBudget:
+    """ Time allowed for the whole run, counted from creation """
+
+    def __init__(self, minutes, clock=time.monotonic):
+        """
+        Args:
+            minutes (int): minutes allowed. 0 for no limit
+            clock (callable): returns the current time in seconds
+        """
+        self.clock = clock
+        self.deadline = clock() + minutes * 60 if minutes > 0 else None
+
+    def expired(self):
+        return self.deadline is not None and self.clock() >= self.deadline
+
+
+class DeadlineQueue:
+    """ Iterates over listing rows earliest deadline first. The rows are all read before the first is handed out """
+
+    def __init__(self, rows, deadline_of):
+        """
+        Args:
+            rows (iterable): rows, e.g. from EMS.iter_events_to_schedule()
+            deadline_of (callable): returns a row's deadline. Rows with equal deadlines keep their order
+        """
+        self.rows = rows
+        self.deadline_of = deadline_of
+        self.heap = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.heap is None:
+            self.heap = [(self.deadline_of(row), index, row) for index, row in enumerate(self.rows)]
+            heapq.heapify(self.heap)
+        if not self.heap:
+            raise StopIteration
+        return heapq.heappop(self.heap)[2]
+
+    def pending(self):
+        """ Returns the rows read but not yet handed out, earliest deadline first """
+        if self.heap is None:
+            return []
+        return [row for _, _, row in sorted(self.heap)]
@@ -0,0 +1,89 @@
+"""
+Ohio Union EMS Autofill Tool - event details cache
+
+Caches what was read from each event's Event Details page. Entries are keyed by the date, the reservation number and a
+hash of the event's rows in the Daily Setup Schedule listing, so an event whose listing rows haven't changed doesn't
+need its details page opened again, while a changed event gets a new key and is re-read. A recurring reservation
+gets an entry per date, as its staff assignments differ from one date to the next. The cache is bounded and evicts
+the least recently used entry. If given a HistoryStore, entries are kept across runs.
+"""
+import collections
+import hashlib
+
+
+def make_key(date, reservation, row_text):
+    """ Returns the cache key for an event
+
+    Args:
+        date (datetime.date): date of the listing
+        reservation (str): reservation number
+        row_text (str): text of the event's rows in the listing, plus anything else the details depend on
+
+    Returns:
+        str: '{reservation}:{date}:{sha1 of row_text}'
+    """
+    return "{0}:{1}:{2}".format(reservation, date.isoformat(), hashlib.sha1(row_text.encode("utf-8")).hexdigest())
+
+
+class DetailCache:
+    """ LRU cache of event details, keyed by make_key() """
+
+    def __init__(self, max_entries, store=None):
+        """
+        Args:
+            max_entries (int): most entries to keep. 0 disables the cache
+            store (HistoryStore): store to load entries from and save them to, or None to only cache for this run
+        """
+        self.max_entries = max_entries
+        self.store = store
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if store is not None and max_entries > 0:
+            for key, details in store.load_cached_details(max_entries):
+                self.entries[key] = details
+
+    def __contains__(self, key):
+        """ Checks if the key is cached, without counting a hit or miss """
+        return key in self.entries
+
+    def get(self, key):
+        """ Returns the cached details for the key, or None """
+        details = self.entries.get(key)
+        if details is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.entries.move_to_end(key)
+        if self.store is not None:
+            self.store.touch_cached_details(key)
+        return details
+
+    def put(self, key, details):
+        """ Caches the details, evicting the least recently used entries if over max_entries
+
+        Args:
+            key (str): from make_key()
+            details (dict): JSON serializable details
+        """
+        if self.max_entries <= 0:
+            return
+
+        self.entries[key] = details
+        self.entries.move_to_end(key)
+        if self.store is not None:
+            self.store.save_cached_details(key, details)
+
+        while len(self.entries) > self.max_entries:
+            evicted_key, _ = self.entries.popitem(last=False)
+            self.evictions += 1
+            if self.store is not None:
+                self.store.delete_cached_details(evicted_key)
+
+    def summary(self):
+        """ Returns the hit/miss counters as a line for the run summary """
+        return "Event details cache: {0} hits, {1} misses, {2} evictions, {3}/{4} entries".format(
+            self.hits, self.misses, self.evictions, len(self.entries), self.max_entries)
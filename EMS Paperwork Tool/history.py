@@ -0,0 +1,429 @@
+"""
+Ohio Union EMS Autofill Tool - history store
+
+Keeps everything the tool learns during a run (the event listing, event details and A/V equipment, the W2W shifts and
+the assignments entered) in a local SQLite database, so that past days can be queried without scraping EMS again.
+
+Query the history from the command line, e.g.:
+    python3 history.py assignments --worker Hempel --type Teardown --period this-month
+    python3 history.py events --room "Performance Hall" --period last-week
+"""
+import argparse
+import contextlib
+import datetime
+import hashlib
+import json
+import sqlite3
+
+import clock
+
+DEFAULT_DATABASE = "history.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    date TEXT NOT NULL,
+    started TEXT NOT NULL,
+    finished TEXT,
+    fingerprint TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_date ON runs (date);
+CREATE TABLE IF NOT EXISTS events (
+    date TEXT NOT NULL,
+    reservation TEXT NOT NULL,
+    room TEXT NOT NULL,
+    name TEXT,
+    full_room TEXT,
+    start_time TEXT,
+    start_minutes INTEGER,
+    end_time TEXT,
+    equipment TEXT,
+    run_id INTEGER REFERENCES runs(id),
+    PRIMARY KEY (date, reservation, room)
+);
+CREATE INDEX IF NOT EXISTS events_reservation ON events (reservation);
+CREATE INDEX IF NOT EXISTS events_room ON events (room, date);
+CREATE TABLE IF NOT EXISTS shifts (
+    date TEXT NOT NULL,
+    position TEXT NOT NULL,
+    worker TEXT NOT NULL COLLATE NOCASE,
+    start_time TEXT NOT NULL,
+    end_time TEXT NOT NULL,
+    run_id INTEGER REFERENCES runs(id)
+);
+CREATE INDEX IF NOT EXISTS shifts_date ON shifts (date);
+CREATE INDEX IF NOT EXISTS shifts_worker ON shifts (worker, date);
+CREATE TABLE IF NOT EXISTS assignments (
+    date TEXT NOT NULL,
+    reservation TEXT NOT NULL,
+    room TEXT NOT NULL,
+    assignment_type TEXT NOT NULL,
+    worker TEXT NOT NULL COLLATE NOCASE,
+    time TEXT NOT NULL,
+    minutes INTEGER NOT NULL,
+    event_name TEXT,
+    run_id INTEGER REFERENCES runs(id),
+    PRIMARY KEY (date, reservation, room, assignment_type)
+);
+CREATE INDEX IF NOT EXISTS assignments_reservation ON assignments (reservation);
+CREATE INDEX IF NOT EXISTS assignments_room ON assignments (room, date);
+CREATE INDEX IF NOT EXISTS assignments_worker ON assignments (worker, date);
+CREATE TABLE IF NOT EXISTS detail_cache (
+    key TEXT PRIMARY KEY,
+    details TEXT NOT NULL,
+    last_used TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS detail_cache_last_used ON detail_cache (last_used);
+"""
+
+
+def make_fingerprint(*parts):
+    """ Hashes JSON serializable parts into a fingerprint
+
+    Returns:
+        str: sha1 hex digest
+    """
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class HistoryStore:
+    """ SQLite store of events, shifts and assignments. Dates are stored as 'YYYY-MM-DD' """
+
+    def __init__(self, path=DEFAULT_DATABASE):
+        # date range worker processes write to the same database, so wait for each other's transactions
+        self.connection = sqlite3.connect(path, timeout=30)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.executescript(SCHEMA)
+        self.upgrade()
+        self.run_id = None
+        # writes held back by batch(), or None to commit each write at once
+        self.pending = None
+
+    def upgrade(self):
+        """ Adds the columns missing from databases created by older versions """
+        columns = [row["name"] for row in self.connection.execute("PRAGMA table_info(runs)")]
+        if "fingerprint" not in columns:
+            with self.connection:
+                self.connection.execute("ALTER TABLE runs ADD COLUMN fingerprint TEXT")
+
+    def close(self):
+        self.connection.close()
+
+    def write(self, *statements):
+        """ Runs the statements in one transaction, or holds them back until the end of batch()
+
+        Args:
+            statements (tuple): SQL and parameters of each statement
+        """
+        if self.pending is not None:
+            self.pending.extend(statements)
+            return
+        with self.connection:
+            for sql, parameters in statements:
+                self.connection.execute(sql, parameters)
+
+    @contextlib.contextmanager
+    def batch(self):
+        """ Context manager that commits the writes inside in one transaction at the end, e.g. everything recorded
+        for an event. The writes are held in memory until then, so the database isn't locked for other runs while
+        the event is scheduled. They're committed even if the block raises, as they record what was already entered
+        in EMS """
+        if self.pending is not None:
+            yield
+            return
+        self.pending = []
+        try:
+            yield
+        finally:
+            statements, self.pending = self.pending, None
+            self.write(*statements)
+
+    def start_run(self, date):
+        """ Records the start of a run for the date. Later writes are tagged with this run
+
+        Args:
+            date (datetime.date): date being scheduled
+        """
+        with self.connection:
+            cursor = self.connection.execute("INSERT INTO runs (date, started) VALUES (?, ?)",
+                                             (date.isoformat(), datetime.datetime.now().isoformat()))
+        self.run_id = cursor.lastrowid
+
+    def finish_run(self, fingerprint=None):
+        """ Marks the current run as finished successfully
+
+        Args:
+            fingerprint (str): fingerprint of the listing and schedule at the end of the run, see make_fingerprint()
+        """
+        with self.connection:
+            self.connection.execute("UPDATE runs SET finished = ?, fingerprint = ? WHERE id = ?",
+                                    (datetime.datetime.now().isoformat(), fingerprint, self.run_id))
+
+    def last_fingerprint(self, date):
+        """ Returns the fingerprint of the last successful run for the date
+
+        Args:
+            date (datetime.date): date scheduled
+
+        Returns:
+            str: fingerprint. None if there's no successful run with a fingerprint
+        """
+        row = self.connection.execute("SELECT fingerprint FROM runs WHERE date = ? AND finished IS NOT NULL "
+                                      "ORDER BY id DESC LIMIT 1", (date.isoformat(),)).fetchone()
+        return row["fingerprint"] if row is not None else None
+
+    def record_listing_event(self, date, reservation, room, name):
+        """ Records an event from the Daily Setup Schedule listing
+
+        Args:
+            date (datetime.date): date of the event
+            reservation (str): reservation number
+            room (str): room, as shown in the listing
+            name (str): event name
+        """
+        # INSERT OR IGNORE then UPDATE rather than an upsert, which needs SQLite 3.24
+        self.write(("INSERT OR IGNORE INTO events (date, reservation, room) VALUES (?, ?, ?)",
+                    (date.isoformat(), reservation, room)),
+                   ("UPDATE events SET name = ?, run_id = ? WHERE date = ? AND reservation = ? AND room = ?",
+                    (name, self.run_id, date.isoformat(), reservation, room)))
+
+    def record_event_details(self, date, reservation, room, full_room, start_time, end_time, equipment):
+        """ Records what was read from an event's details page
+
+        Args:
+            date (datetime.date): date of the event
+            reservation (str): reservation number
+            room (str): room, as shown in the listing
+            full_room (str): room, as shown on the details page
+            start_time (str): event start time, in format '12:00 AM'
+            end_time (str): event end time, in format '12:00 AM'
+            equipment (list of str): A/V equipment and setup notes
+        """
+        self.write(("INSERT OR IGNORE INTO events (date, reservation, room) VALUES (?, ?, ?)",
+                    (date.isoformat(), reservation, room)),
+                   ("UPDATE events SET full_room = ?, start_time = ?, start_minutes = ?, end_time = ?, equipment = ?, "
+                    "run_id = ? WHERE date = ? AND reservation = ? AND room = ?",
+                    (full_room, start_time, clock.to_minutes(start_time), end_time, json.dumps(equipment),
+                     self.run_id, date.isoformat(), reservation, room)))
+
+    def record_shifts(self, date, schedule):
+        """ Replaces the shifts stored for the date
+
+        Args:
+            date (datetime.date): date of the shifts
+            schedule (dict): schedule, {position: [{"last_name", "first_name", "start_time", "end_time"}, ...]}
+        """
+        rows = [(date.isoformat(), position, shift["last_name"] + ", " + shift["first_name"],
+                 shift["start_time"], shift["end_time"], self.run_id)
+                for position, shifts in schedule.items() for shift in shifts]
+        with self.connection:
+            self.connection.execute("DELETE FROM shifts WHERE date = ?", (date.isoformat(),))
+            self.connection.executemany("INSERT INTO shifts VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+    def record_assignment(self, date, reservation, room, assignment_type, worker, time, event_name):
+        """ Records an assignment entered for an event, replacing any earlier one of the same type
+
+        Args:
+            date (datetime.date): date of the event
+            reservation (str): reservation number
+            room (str): room, as shown in the listing
+            assignment_type (str): 'Setup', 'Check-In' or 'Teardown'
+            worker (str): in format 'Last, First'
+            time (str): in format '12:00 AM'
+            event_name (str): event name
+        """
+        self.write(("INSERT OR REPLACE INTO assignments VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (date.isoformat(), reservation, room, assignment_type, worker, time, clock.to_minutes(time),
+                     event_name, self.run_id)))
+
+    def load_cached_details(self, limit):
+        """ Returns the most recently used cached event details, least recently used first
+
+        Args:
+            limit (int): most entries to return
+
+        Returns:
+            list of (str, dict): key and details
+        """
+        rows = self.connection.execute("SELECT key, details FROM detail_cache ORDER BY last_used DESC LIMIT ?",
+                                       (limit,)).fetchall()
+        return [(row["key"], json.loads(row["details"])) for row in reversed(rows)]
+
+    def save_cached_details(self, key, details):
+        self.write(("INSERT OR REPLACE INTO detail_cache VALUES (?, ?, ?)",
+                    (key, json.dumps(details), datetime.datetime.now().isoformat())))
+
+    def touch_cached_details(self, key):
+        self.write(("UPDATE detail_cache SET last_used = ? WHERE key = ?", (datetime.datetime.now().isoformat(), key)))
+
+    def delete_cached_details(self, key):
+        self.write(("DELETE FROM detail_cache WHERE key = ?", (key,)))
+
+    def query_assignments(self, start_date, end_date, worker=None, assignment_type=None, room=None):
+        """ Returns the assignments between two dates, inclusive
+
+        Args:
+            start_date (datetime.date): first date
+            end_date (datetime.date): last date
+            worker (str): only assignments for workers whose 'Last, First' name starts with this. Case-insensitive
+            assignment_type (str): only assignments of this type
+            room (str): only assignments in this room
+
+        Returns:
+            list of sqlite3.Row
+        """
+        sql = "SELECT * FROM assignments WHERE date BETWEEN ? AND ?"
+        params = [start_date.isoformat(), end_date.isoformat()]
+        if worker is not None:
+            sql += " AND worker LIKE ?"
+            params.append(worker + "%")
+        if assignment_type is not None:
+            sql += " AND assignment_type = ?"
+            params.append(assignment_type)
+        if room is not None:
+            sql += " AND room = ?"
+            params.append(room)
+        return self.connection.execute(sql + " ORDER BY date, minutes", params).fetchall()
+
+    def query_events(self, start_date, end_date, room=None, reservation=None):
+        """ Returns the events between two dates, inclusive
+
+        Args:
+            start_date (datetime.date): first date
+            end_date (datetime.date): last date
+            room (str): only events in this room
+            reservation (str): only events with this reservation number
+
+        Returns:
+            list of sqlite3.Row
+        """
+        sql = "SELECT * FROM events WHERE date BETWEEN ? AND ?"
+        params = [start_date.isoformat(), end_date.isoformat()]
+        if room is not None:
+            sql += " AND room = ?"
+            params.append(room)
+        if reservation is not None:
+            sql += " AND reservation = ?"
+            params.append(reservation)
+        return self.connection.execute(sql + " ORDER BY date, start_minutes", params).fetchall()
+
+    def query_shifts(self, start_date, end_date, worker=None, position=None):
+        """ Returns the shifts between two dates, inclusive
+
+        Args:
+            start_date (datetime.date): first date
+            end_date (datetime.date): last date
+            worker (str): only shifts for workers whose 'Last, First' name starts with this. Case-insensitive
+            position (str): only shifts for this position
+
+        Returns:
+            list of sqlite3.Row
+        """
+        sql = "SELECT * FROM shifts WHERE date BETWEEN ? AND ?"
+        params = [start_date.isoformat(), end_date.isoformat()]
+        if worker is not None:
+            sql += " AND worker LIKE ?"
+            params.append(worker + "%")
+        if position is not None:
+            sql += " AND position = ?"
+            params.append(position)
+        return self.connection.execute(sql + " ORDER BY date, position", params).fetchall()
+
+
+def period_to_dates(period, today=None):
+    """ Converts a named period to a date range
+
+    Args:
+        period (str): 'today', 'tomorrow', 'this-week', 'last-week', 'this-month' or 'last-month'. Weeks start Monday
+        today (datetime.date): the current date. Defaults to today
+
+    Returns:
+        datetime.date: first date
+        datetime.date: last date
+    """
+    if today is None:
+        today = datetime.date.today()
+
+    if period == "today":
+        return today, today
+    elif period == "tomorrow":
+        tomorrow = today + datetime.timedelta(days=1)
+        return tomorrow, tomorrow
+    elif period == "this-week":
+        start = today - datetime.timedelta(days=today.weekday())
+        return start, start + datetime.timedelta(days=6)
+    elif period == "last-week":
+        start = today - datetime.timedelta(days=today.weekday() + 7)
+        return start, start + datetime.timedelta(days=6)
+    elif period == "this-month":
+        start = today.replace(day=1)
+        next_month = (start + datetime.timedelta(days=32)).replace(day=1)
+        return start, next_month - datetime.timedelta(days=1)
+    elif period == "last-month":
+        end = today.replace(day=1) - datetime.timedelta(days=1)
+        return end.replace(day=1), end
+    else:
+        raise RuntimeError("Unknown period '{}'".format(period))
+
+
+PERIODS = ["today", "tomorrow", "this-week", "last-week", "this-month", "last-month"]
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Query the history of the EMS Autofill Tool.")
+    parser.add_argument("--database", default=DEFAULT_DATABASE, help="history database")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+
+    assignments = subparsers.add_parser("assignments", help="list assignments")
+    assignments.add_argument("--worker", help="worker last name, or 'Last, First'")
+    assignments.add_argument("--type", choices=["Setup", "Check-In", "Teardown"])
+    assignments.add_argument("--room")
+
+    events = subparsers.add_parser("events", help="list events")
+    events.add_argument("--room")
+    events.add_argument("--reservation")
+
+    shifts = subparsers.add_parser("shifts", help="list W2W shifts")
+    shifts.add_argument("--worker", help="worker last name, or 'Last, First'")
+    shifts.add_argument("--position")
+
+    for subparser in (assignments, events, shifts):
+        subparser.add_argument("--period", choices=PERIODS, default="today")
+        subparser.add_argument("--from", dest="start", help="first date, in 'M/D/YYYY' format. Overrides --period")
+        subparser.add_argument("--to", dest="end", help="last date, in 'M/D/YYYY' format. Defaults to --from")
+
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_arguments(argv)
+
+    if args.start is not None:
+        start_date = datetime.datetime.strptime(args.start, "%m/%d/%Y").date()
+        end_date = datetime.datetime.strptime(args.end, "%m/%d/%Y").date() if args.end is not None else start_date
+    else:
+        start_date, end_date = period_to_dates(args.period)
+
+    store = HistoryStore(args.database)
+    try:
+        if args.command == "assignments":
+            for row in store.query_assignments(start_date, end_date, args.worker, args.type, args.room):
+                print("{0}  {1:<8}  {2:<9}  {3:<20}  {4:<35}  {5}".format(row["date"], row["time"],
+                                                                          row["assignment_type"], row["worker"],
+                                                                          row["room"], row["event_name"]))
+        elif args.command == "events":
+            for row in store.query_events(start_date, end_date, args.room, args.reservation):
+                print("{0}  {1:<8}  {2:<8}  {3:<10}  {4:<35}  {5}".format(row["date"], row["start_time"] or "",
+                                                                          row["end_time"] or "", row["reservation"],
+                                                                          row["room"], row["name"]))
+        else:
+            for row in store.query_shifts(start_date, end_date, args.worker, args.position):
+                print("{0}  {1:<8} - {2:<8}  {3:<20}  {4}".format(row["date"], row["start_time"], row["end_time"],
+                                                                  row["position"], row["worker"]))
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
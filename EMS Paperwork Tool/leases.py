@@ -0,0 +1,120 @@
+"""
+Ohio Union EMS Autofill Tool - event leases
+
+Two managers running the tool for the same date at once would both find an event unscheduled before either enters its
+assignments, and assign it twice. Before an event is opened, the run takes a lease on it in a SQLite database shared
+by the runs on this computer (the "history_database"). The lease maps the date, reservation number and room to the
+run holding it and when it expires; an event leased by another run is skipped. A lease is kept until it expires, so a
+run that read the listing before the assignments were entered doesn't schedule the event again, but is given back if
+scheduling the event fails.
+
+A lease held by a process on this computer that isn't running any more, e.g. after a crash, is taken over without
+waiting for it to expire.
+"""
+import os
+import socket
+import sqlite3
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS leases (
+    key TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires REAL NOT NULL
+);
+"""
+
+
+def make_key(date, reservation, room):
+    """ Returns the lease key of an event
+
+    Args:
+        date (datetime.date): date scheduled
+        reservation (str): reservation number
+        room (str): room in the listing, as a reservation can have events in several rooms
+
+    Returns:
+        str: '{date}|{reservation}|{room}'
+    """
+    return "{0}|{1}|{2}".format(date.isoformat(), reservation, room)
+
+
+def make_owner(name=""):
+    """ Returns the owner name of this process, '{name}@{host}:{pid}' """
+    return "{0}@{1}:{2}".format(name, socket.gethostname(), os.getpid())
+
+
+def process_running(pid):
+    """ Returns False if no process has the id. Always True on Windows, where it can't be checked safely """
+    if os.name == "nt":
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # e.g. it's another user's process
+        return True
+    return True
+
+
+def owner_gone(owner):
+    """ Returns True if the owner is a process on this computer that isn't running any more """
+    _, _, place = owner.rpartition("@")
+    host, _, pid = place.rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit():
+        return False
+    return int(pid) != os.getpid() and not process_running(int(pid))
+
+
+class LeaseStore:
+    """ Leases on events, shared by every run using the same database """
+
+    def __init__(self, path, owner, lease_seconds, clock=time.time):
+        """
+        Args:
+            path (str): path of the SQLite database
+            owner (str): name of this run, see make_owner()
+            lease_seconds (float): how long a lease lasts
+            clock (callable): returns the current time in seconds since the epoch
+        """
+        # transactions are started explicitly, so the check and the insert are atomic between processes
+        self.connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.connection.executescript(SCHEMA)
+        self.owner = owner
+        self.lease_seconds = lease_seconds
+        self.clock = clock
+
+    def close(self):
+        self.connection.close()
+
+    def acquire(self, key):
+        """ Takes the lease on an event, or renews it if this run already holds it
+
+        Args:
+            key (str): event, see make_key()
+
+        Returns:
+            tuple: owner (str) and expiry time (float) of the lease held by another run. None if the lease was taken
+        """
+        now = self.clock()
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            self.connection.execute("DELETE FROM leases WHERE expires <= ?", (now,))
+            row = self.connection.execute("SELECT owner, expires FROM leases WHERE key = ?", (key,)).fetchone()
+            if row is not None and row[0] != self.owner and not owner_gone(row[0]):
+                self.connection.execute("ROLLBACK")
+                return row[0], row[1]
+            self.connection.execute("INSERT OR REPLACE INTO leases (key, owner, expires) VALUES (?, ?, ?)",
+                                    (key, self.owner, now + self.lease_seconds))
+            self.connection.execute("COMMIT")
+        except sqlite3.Error:
+            # some errors, e.g. SQLITE_FULL, already rolled the transaction back
+            if self.connection.in_transaction:
+                self.connection.execute("ROLLBACK")
+            raise
+        return None
+
+    def release(self, key):
+        """ Gives back the lease on an event, if this run holds it """
+        self.connection.execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, self.owner))
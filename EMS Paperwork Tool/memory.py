@@ -0,0 +1,50 @@
+"""
+Ohio Union EMS Autofill Tool - process memory
+
+Measures the resident memory of a process together with its child processes (e.g. chromedriver and the Chrome
+processes it starts), from one 'ps' listing. Works on Linux and macOS; on other platforms the memory is unknown.
+"""
+import collections
+import subprocess
+
+
+def list_processes():
+    """ Returns {pid: (parent pid, resident memory in bytes)} for every process, or None if 'ps' isn't available """
+    try:
+        output = subprocess.check_output(["ps", "-A", "-o", "pid=,ppid=,rss="], universal_newlines=True,
+                                         stderr=subprocess.DEVNULL)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    processes = {}
+    for line in output.splitlines():
+        fields = line.split()
+        if len(fields) == 3 and all(field.isdigit() for field in fields):
+            # ps reports the resident set size in KiB
+            processes[int(fields[0])] = (int(fields[1]), int(fields[2]) * 1024)
+    return processes
+
+
+def tree_rss_bytes(pid, processes=None):
+    """ Returns the resident memory of a process and all its descendants
+
+    Args:
+        pid (int): process id
+        processes (dict): from list_processes(), or None to list them now
+
+    Returns:
+        int: bytes. None if the memory can't be measured or the process doesn't exist
+    """
+    if processes is None:
+        processes = list_processes()
+    if processes is None or pid not in processes:
+        return None
+    children = collections.defaultdict(list)
+    for child, (parent, _) in processes.items():
+        children[parent].append(child)
+    total = 0
+    stack = [pid]
+    while stack:
+        current = stack.pop()
+        total += processes[current][1]
+        stack.extend(children[current])
+    return total
@@ -0,0 +1,218 @@
+"""
+Ohio Union EMS Autofill Tool - run metrics
+
+Counters, gauges and histograms collected while the tool runs, written at the end of every run in the Prometheus
+text format, for node exporter's textfile collector. Like logging, the metrics live in a module-level registry so
+any part of the tool can record them:
+
+    metrics.inc("autofill_events_skipped_total", reason="room")
+    with metrics.phase("listing"):
+        ...
+    metrics.write_textfile("/var/lib/node_exporter/textfile_collector/ems_autofill.prom")
+"""
+import bisect
+import collections
+import contextlib
+import os
+import time
+
+DURATION_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+# name -> (type, help)
+METRICS = collections.OrderedDict([
+    ("autofill_events_seen_total", ("counter", "Event listing rows checked")),
+    ("autofill_events_scheduled_total", ("counter", "Events whose assignments were entered")),
+    ("autofill_events_skipped_total", ("counter", "Events skipped, by reason")),
+    ("autofill_timeouts_total", ("counter", "Waits for a page element that timed out")),
+    ("autofill_listing_refreshes_total", ("counter", "Times the Daily Setup Schedule listing was read")),
+    ("autofill_worker_conflicts_total", ("counter", "Workers sent to several rooms at once, by kind")),
+    ("autofill_browser_recycles_total", ("counter", "Times the browser was replaced with a fresh one")),
+    ("autofill_webdriver_commands_total", ("counter", "WebDriver commands sent to the browser, by command")),
+    ("autofill_event_duration_seconds", ("histogram", "Time to schedule one event")),
+    ("autofill_phase_duration_seconds", ("histogram", "Time spent in each phase of a run")),
+    ("autofill_last_run_timestamp_seconds", ("gauge", "Unix time the last run finished")),
+    ("autofill_last_run_success", ("gauge", "1 if the last run finished without an error, 0 otherwise")),
+])
+
+
+class Histogram:
+    """ Cumulative histogram with fixed buckets """
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+
+class Registry:
+    """ Holds the value of every metric, by name and label set """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        # name -> {tuple of (label, value) pairs: number or Histogram}
+        self.values = {name: {} for name in METRICS}
+
+    def key(self, name, labels):
+        if name not in METRICS:
+            raise KeyError("Unknown metric '{}'".format(name))
+        return tuple(sorted(labels.items()))
+
+    def inc(self, name, amount=1, **labels):
+        key = self.key(name, labels)
+        self.values[name][key] = self.values[name].get(key, 0) + amount
+
+    def set(self, name, value, **labels):
+        self.values[name][self.key(name, labels)] = value
+
+    def observe(self, name, value, **labels):
+        key = self.key(name, labels)
+        if key not in self.values[name]:
+            self.values[name][key] = Histogram()
+        self.values[name][key].observe(value)
+
+    def drain(self):
+        """ Returns the values recorded since the last drain() or reset(), and resets them. For a worker process to
+        send its metrics to the parent, see merge() """
+        values = self.values
+        self.reset()
+        return values
+
+    def merge(self, values):
+        """ Adds the values drained from another registry: counters and histograms add up, gauges are replaced """
+        for name, series in values.items():
+            metric_type = METRICS[name][0]
+            for key, value in series.items():
+                if metric_type == "gauge":
+                    self.values[name][key] = value
+                elif metric_type == "counter":
+                    self.values[name][key] = self.values[name].get(key, 0) + value
+                else:
+                    histogram = self.values[name].setdefault(key, Histogram(value.buckets))
+                    histogram.counts = [a + b for a, b in zip(histogram.counts, value.counts)]
+                    histogram.count += value.count
+                    histogram.sum += value.sum
+
+    def get(self, name, **labels):
+        """ Returns the value of a counter or gauge, 0 if it was never set """
+        return self.values[name].get(self.key(name, labels), 0)
+
+    def render(self):
+        """ Returns the metrics in the Prometheus text exposition format """
+        lines = []
+        for name, (metric_type, help_text) in METRICS.items():
+            if not self.values[name]:
+                continue
+            lines.append("# HELP {0} {1}".format(name, help_text))
+            lines.append("# TYPE {0} {1}".format(name, metric_type))
+            for key, value in sorted(self.values[name].items()):
+                if metric_type == "histogram":
+                    cumulative = 0
+                    for bound, count in zip(value.buckets, value.counts):
+                        cumulative += count
+                        lines.append("{0}_bucket{1} {2}".format(name, format_labels(key + (("le", repr(float(bound))),)),
+                                                                cumulative))
+                    lines.append("{0}_bucket{1} {2}".format(name, format_labels(key + (("le", "+Inf"),)), value.count))
+                    lines.append("{0}_sum{1} {2}".format(name, format_labels(key), repr(value.sum)))
+                    lines.append("{0}_count{1} {2}".format(name, format_labels(key), value.count))
+                else:
+                    lines.append("{0}{1} {2}".format(name, format_labels(key), value))
+        return "\n".join(lines) + "\n"
+
+
+def format_labels(key):
+    if not key:
+        return ""
+    escaped = ('{0}="{1}"'.format(label, str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+               for label, value in key)
+    return "{" + ",".join(escaped) + "}"
+
+
+REGISTRY = Registry()
+
+
+def inc(name, amount=1, **labels):
+    REGISTRY.inc(name, amount, **labels)
+
+
+def set_gauge(name, value, **labels):
+    REGISTRY.set(name, value, **labels)
+
+
+def observe(name, value, **labels):
+    REGISTRY.observe(name, value, **labels)
+
+
+@contextlib.contextmanager
+def timed(name, **labels):
+    """ Observes the time spent in the block in the histogram 'name' """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+PHASE_LISTENERS = []
+
+
+def add_phase_listener(listener):
+    """ Calls listener(name) for every phase, and runs the phase inside the context manager it returns. Used by
+    profiler.Profiler """
+    PHASE_LISTENERS.append(listener)
+
+
+@contextlib.contextmanager
+def phase(name):
+    """ Times a phase of the run: 'w2w_scrape', 'ems_setup', 'schedule_events' or 'report'. 'listing' and
+    'schedule_event' are timed within 'schedule_events' as well as on their own """
+    with contextlib.ExitStack() as stack:
+        for listener in PHASE_LISTENERS:
+            stack.enter_context(listener(name))
+        with timed("autofill_phase_duration_seconds", phase=name):
+            yield
+
+
+def instrument_driver(driver):
+    """ Counts every WebDriver command sent through the driver, by command name
+
+    Args:
+        driver (webdriver): selenium webdriver
+
+    Returns:
+        webdriver: the same driver
+    """
+    execute = driver.execute
+
+    def counting_execute(driver_command, params=None):
+        inc("autofill_webdriver_commands_total", command=driver_command)
+        return execute(driver_command, params)
+
+    driver.execute = counting_execute
+    return driver
+
+
+def write_textfile(path, registry=REGISTRY):
+    """ Writes the metrics for node exporter's textfile collector. The file is written under a temporary name and
+    renamed into place, so the collector never reads a partial file
+
+    Args:
+        path (str): path of the .prom file
+        registry (Registry): metrics to write
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(registry.render())
+    os.replace(tmp_path, path)
@@ -0,0 +1,178 @@
+"""
+Ohio Union EMS Autofill Tool - process pool
+
+Runs a handler over a list of items (the dates of a range) in several worker processes. Each worker runs the
+initializer once (e.g. to launch and log in its own browser), then takes one item at a time off a shared queue, and
+runs the finalizer when it stops. Results stream back to the parent, which gets them in item order as soon as each is
+available, so the reports can be written while later dates are still being scheduled.
+
+A worker whose memory, counting its child processes, is over the limit after an item stops and is replaced by a new
+one. An exception in the handler, or a worker dying mid item, stops the pool: the items not yet started are dropped,
+the other workers finish their current item, and RuntimeError is raised in the parent.
+"""
+import multiprocessing
+import os
+import queue
+import traceback
+
+import memory
+
+# messages from the workers: (kind, item index, worker pid, value)
+STARTED, DONE, FAILED, RETIRED = "started", "done", "failed", "retired"
+
+# seconds between checks on the workers while waiting for a result
+POLL_INTERVAL = 1.0
+
+
+def worker_main(tasks, results, initializer, handler, finalizer, memory_limit_bytes):
+    """ Body of a worker process. Takes (index, item) off tasks until it gets None """
+    pid = os.getpid()
+    if initializer is not None:
+        try:
+            initializer()
+        except Exception:
+            results.put((FAILED, None, pid, traceback.format_exc()))
+            return
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                return
+            index, item = task
+            results.put((STARTED, index, pid, None))
+            try:
+                result = handler(item)
+            except Exception:
+                results.put((FAILED, index, pid, traceback.format_exc()))
+                return
+            results.put((DONE, index, pid, result))
+
+            if memory_limit_bytes > 0:
+                rss = memory.tree_rss_bytes(pid)
+                if rss is not None and rss > memory_limit_bytes:
+                    results.put((RETIRED, index, pid, rss))
+                    return
+    finally:
+        if finalizer is not None:
+            finalizer()
+
+
+class ProcessPool:
+    """ Pool of worker processes, see the module docstring. The initializer, handler and finalizer must be module
+    level functions, and the items and results picklable """
+
+    def __init__(self, processes, handler, initializer=None, finalizer=None, memory_limit_bytes=0, logging=None):
+        """
+        Args:
+            processes (int): number of worker processes
+            handler (callable): handler(item) -> result, run in a worker
+            initializer (callable): run once in each worker before its first item, or None
+            finalizer (callable): run in each worker when it stops, or None
+            memory_limit_bytes (int): memory a worker may use, with its child processes. 0 for no limit
+            logging (logging): logger, or None
+        """
+        self.processes = processes
+        self.handler = handler
+        self.initializer = initializer
+        self.finalizer = finalizer
+        self.memory_limit_bytes = memory_limit_bytes
+        self.logger = logging
+        self.context = multiprocessing.get_context()
+        self.workers = {}
+
+    def log(self, message):
+        if self.logger is not None:
+            self.logger.info(message)
+
+    def start_worker(self, tasks, results):
+        process = self.context.Process(target=worker_main,
+                                       args=(tasks, results, self.initializer, self.handler, self.finalizer,
+                                             self.memory_limit_bytes))
+        process.start()
+        self.workers[process.pid] = process
+
+    def imap(self, items):
+        """ Runs the handler over the items
+
+        Args:
+            items (list): items
+
+        Yields:
+            tuple: item, result, in item order
+
+        Raises:
+            RuntimeError: the handler raised an exception, or a worker died
+        """
+        items = list(items)
+        tasks = self.context.Queue()
+        results = self.context.Queue()
+        for index, item in enumerate(items):
+            tasks.put((index, item))
+
+        finished = {}
+        # worker pid -> index of the item it's on
+        running = {}
+        started = 0
+        next_index = 0
+        try:
+            for _ in range(min(self.processes, len(items))):
+                self.start_worker(tasks, results)
+
+            while next_index < len(items):
+                try:
+                    kind, index, pid, value = results.get(timeout=POLL_INTERVAL)
+                except queue.Empty:
+                    self.check_workers(running, items)
+                    continue
+
+                if kind == STARTED:
+                    running[pid] = index
+                    started += 1
+                elif kind == DONE:
+                    running.pop(pid, None)
+                    finished[index] = value
+                elif kind == FAILED:
+                    task = "to start" if index is None else "on '{}'".format(items[index])
+                    raise RuntimeError("Worker process {0} failed {1}:\n{2}".format(pid, task, value))
+                elif kind == RETIRED:
+                    self.log("Worker process {0} uses {1} MiB, over the memory limit. Replacing it"
+                             .format(pid, value // (1024 * 1024)))
+                    self.workers.pop(pid).join()
+                    if started < len(items):
+                        self.start_worker(tasks, results)
+
+                while next_index in finished:
+                    yield items[next_index], finished.pop(next_index)
+                    next_index += 1
+        finally:
+            self.stop(tasks, results)
+
+    def check_workers(self, running, items):
+        """ Raises RuntimeError if a worker died, e.g. killed by the system """
+        for pid, process in list(self.workers.items()):
+            if process.is_alive():
+                continue
+            if pid in running:
+                raise RuntimeError("Worker process {0} exited with code {1} on '{2}'"
+                                   .format(pid, process.exitcode, items[running[pid]]))
+            if process.exitcode != 0:
+                raise RuntimeError("Worker process {0} exited with code {1}".format(pid, process.exitcode))
+
+    def stop(self, tasks, results):
+        """ Drops the items not yet started, and waits for the workers to finish their current item and stop """
+        try:
+            while True:
+                tasks.get_nowait()
+        except queue.Empty:
+            pass
+        for _ in self.workers:
+            tasks.put(None)
+        for process in self.workers.values():
+            while process.is_alive():
+                # keep reading, so a worker is never stuck sending a result
+                try:
+                    results.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            process.join()
+        self.workers = {}
@@ -0,0 +1,158 @@
+"""
+Ohio Union EMS Autofill Tool - Event Details prefetching
+
+While the tool enters one event's assignments and waits for each postback, the next events' Event Details pages can
+load in other browser tabs. Each extra tab sits on the event listing; to prefetch an event, its javascript command is
+run in a free tab, which starts the page loading without waiting for it. When the tool moves on to that event, it
+switches to the tab and the page is usually already there, and the tab it leaves is sent back to the event listing for
+reuse.
+
+Nothing here waits on a page load, so a tab that isn't ready, or a prefetch the rate limit holds back, is simply
+skipped. Anything unexpected is left to the
+caller, which turns prefetching off and carries on in a single tab.
+"""
+import collections
+import itertools
+
+# Starts loading the page in the current tab without waiting for it
+NAVIGATE_SCRIPT = "window.location.href = arguments[0];"
+OPEN_TAB_SCRIPT = "window.open(arguments[0], '_blank');"
+READY_SCRIPT = "return document.readyState === 'complete' && window.location.href.indexOf(arguments[0]) === 0;"
+
+
+def lookahead(iterable, depth):
+    """ Yields each item with the next 'depth' items, reading ahead of the item being yielded
+
+    Args:
+        iterable (iterable): items
+        depth (int): number of items to read ahead
+
+    Yields:
+        tuple: item, tuple of up to 'depth' next items
+    """
+    iterator = iter(iterable)
+    buffer = collections.deque(itertools.islice(iterator, depth))
+    while True:
+        buffer.extend(itertools.islice(iterator, 1))
+        if not buffer:
+            return
+        item = buffer.popleft()
+        yield item, tuple(buffer)
+
+
+class TabPrefetcher:
+    """ Loads upcoming Event Details pages in background tabs """
+
+    def __init__(self, driver, depth, listing_url, logging=None, gate=None):
+        """
+        Args:
+            driver (webdriver): selenium webdriver
+            depth (int): most pages to prefetch at once, each in its own tab
+            listing_url (str): URL of the event listing, where the javascript commands work
+            logging (logging): logger, or None
+            gate (callable): called before each prefetch, returns False to hold it back, e.g.
+                throttle.TokenBucket.try_acquire. None to prefetch whenever a tab is ready
+        """
+        self.driver = driver
+        self.depth = depth
+        self.listing_url = listing_url
+        self.logger = logging
+        self.gate = gate
+        self.current = driver.current_window_handle
+        # handles of the extra tabs on, or loading, the event listing
+        self.free = []
+        # javascript command -> handle of the tab loading its Event Details page
+        self.loading = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def tab_count(self):
+        return len(self.free) + len(self.loading)
+
+    def open_tab(self):
+        """ Opens a tab on the event listing, without waiting for it to load """
+        before = set(self.driver.window_handles)
+        self.driver.execute_script(OPEN_TAB_SCRIPT, self.listing_url)
+        opened = [handle for handle in self.driver.window_handles if handle not in before]
+        if len(opened) != 1:
+            raise RuntimeError("Couldn't open a tab to prefetch in")
+        self.free.append(opened[0])
+
+    def prefetch(self, js_commands):
+        """ Starts loading the Event Details page of each command in a free tab, up to 'depth' at once. Commands that
+        are already loading and tabs still loading the event listing are skipped. Returns to the current tab
+
+        Args:
+            js_commands (list of str): javascript commands of the next events, in the order they'll be scheduled
+        """
+        wanted = list(js_commands)[:self.depth]
+        # tabs prefetching events that aren't coming up any more are freed
+        for js_command in [js_command for js_command in self.loading if js_command not in wanted]:
+            self.free_tab(self.loading.pop(js_command))
+
+        for js_command in wanted:
+            if js_command in self.loading:
+                continue
+            if not self.free and self.tab_count() < self.depth:
+                self.open_tab()
+            handle = self.ready_tab()
+            if handle is None:
+                break
+            if self.gate is not None and not self.gate():
+                self.free.append(handle)
+                break
+            self.driver.execute_script(js_command)
+            self.loading[js_command] = handle
+            if self.logger is not None:
+                self.logger.debug("Prefetching '{}'".format(js_command))
+
+        self.driver.switch_to.window(self.current)
+
+    def ready_tab(self):
+        """ Switches to a free tab that has loaded the event listing, and returns its handle. None if there's none """
+        for handle in self.free:
+            self.driver.switch_to.window(handle)
+            if self.driver.execute_script(READY_SCRIPT, self.listing_url):
+                self.free.remove(handle)
+                return handle
+        return None
+
+    def free_tab(self, handle):
+        """ Sends the tab back to the event listing, without waiting for it to load """
+        self.driver.switch_to.window(handle)
+        self.driver.execute_script(NAVIGATE_SCRIPT, self.listing_url)
+        self.free.append(handle)
+
+    def take(self, js_command):
+        """ Switches to the tab prefetching the command's Event Details page, if there is one. The tab left is sent
+        back to the event listing to prefetch in
+
+        Args:
+            js_command (str): javascript command of the event
+
+        Returns:
+            bool: True if switched to the prefetched tab. The page may still be loading
+        """
+        handle = self.loading.pop(js_command, None)
+        if handle is None:
+            self.misses += 1
+            return False
+
+        self.hits += 1
+        self.free_tab(self.current)
+        self.driver.switch_to.window(handle)
+        self.current = handle
+        return True
+
+    def close(self):
+        """ Closes every tab but the current one """
+        for handle in self.free + list(self.loading.values()):
+            self.driver.switch_to.window(handle)
+            self.driver.close()
+        self.free = []
+        self.loading.clear()
+        self.driver.switch_to.window(self.current)
+
+    def summary(self):
+        """ Returns the hit/miss counters as a line for the run summary """
+        return "Prefetched Event Details pages: {0} used, {1} not prefetched".format(self.hits, self.misses)
@@ -0,0 +1,168 @@
+"""
+Ohio Union EMS Autofill Tool - CPU and memory profiler
+
+Profiles the run with cProfile and tracemalloc, split by the phases timed in metrics.py ('w2w_scrape', 'ems_setup',
+'listing', 'schedule_event', 'schedule_events', 'report'). Time is charged to the innermost phase running, and
+anything outside a phase to 'run'. Allocations are measured with a tracemalloc snapshot as each top level phase and
+each 'schedule_event' starts and ends, and charged to that phase but not to the measured phase around it: each event's
+allocations are under 'schedule_event', what reading the listing allocated under 'schedule_events', and 'run' gets
+what was allocated outside them. Other nested phases are measured as part of the measured phase around them, so their
+allocation files only give the most traced memory. Phases that repeat, like 'schedule_event' or a daemon's polls,
+are added up. For each phase the profiler writes:
+
+    {directory}/{phase}.prof               cProfile stats, for 'python3 -m pstats' or snakeviz
+    {directory}/{phase}.allocations.txt    most traced memory at its start or end, and the lines that allocated the
+                                           most
+
+Only Python-side work shows up: time the browser spends loading pages is spent waiting in the WebDriver's HTTP calls.
+"""
+import collections
+import contextlib
+import cProfile
+import os
+import tracemalloc
+
+TOP_ALLOCATIONS = 25
+
+# depth of the phases whose allocations are measured: 'run' is at 0. A snapshot costs time in proportion to the live
+# objects, so phases nested deeper are measured as part of the measured phase around them
+TOP_LEVEL = 1
+
+# nested phases measured anyway: an event takes seconds of browser work, next to which its snapshots are cheap
+MEASURED_PHASES = frozenset(["schedule_event"])
+
+# tracemalloc's own bookkeeping would otherwise top every list
+SNAPSHOT_FILTERS = (tracemalloc.Filter(False, tracemalloc.__file__),
+                    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"))
+
+
+class PhaseProfile:
+    """ What was measured for one phase, over every time it ran """
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+        self.calls = 0
+        # most memory traced when the phase started or ended
+        self.peak = 0
+        # 'file:line' -> [bytes allocated and not freed, allocations]
+        self.allocations = collections.defaultdict(lambda: [0, 0])
+
+
+def allocation_diff(before, after):
+    """ Returns {'file:line': [bytes allocated and not freed, allocations]} between two snapshots """
+    diff = {}
+    for stat in after.compare_to(before, "lineno"):
+        frame = stat.traceback[0]
+        diff["{0}:{1}".format(frame.filename, frame.lineno)] = [stat.size_diff, stat.count_diff]
+    return diff
+
+
+def add_allocations(totals, diff, sign=1):
+    for line, (size, count) in diff.items():
+        total = totals[line]
+        total[0] += sign * size
+        total[1] += sign * count
+
+
+class Profiler:
+    """ Profiles CPU time and memory allocations by phase. Only one cProfile profiler can be enabled at a time, so
+    entering a phase pauses the phase around it """
+
+    def __init__(self, directory):
+        """
+        Args:
+            directory (str): directory to write the profiles to
+        """
+        self.directory = directory
+        self.phases = collections.OrderedDict()
+        # (name, snapshot at start, allocations of the measured phases inside) of the running phases, innermost
+        # last. Only the measured phases have a snapshot, see TOP_LEVEL and MEASURED_PHASES
+        self.stack = []
+
+    def start(self):
+        """ Starts profiling; until stop(), anything outside a phase is charged to 'run' """
+        tracemalloc.start()
+        self.enter("run")
+
+    def stop(self):
+        """ Stops profiling. Phases still running are ended """
+        while self.stack:
+            self.exit()
+        tracemalloc.stop()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """ Charges the time and allocations in the block to the phase 'name'. Pass to metrics.add_phase_listener() """
+        self.enter(name)
+        try:
+            yield
+        finally:
+            self.exit()
+
+    def enter(self, name):
+        if self.stack:
+            self.phases[self.stack[-1][0]].profile.disable()
+
+        phase = self.phases.setdefault(name, PhaseProfile())
+        phase.calls += 1
+        self.record_peak(phase)
+        if len(self.stack) <= TOP_LEVEL or name in MEASURED_PHASES:
+            self.stack.append((name, self.take_snapshot(), collections.defaultdict(lambda: [0, 0])))
+        else:
+            self.stack.append((name, None, None))
+        phase.profile.enable()
+
+    def exit(self):
+        name, before, nested = self.stack.pop()
+        phase = self.phases[name]
+        phase.profile.disable()
+        self.record_peak(phase)
+        if before is not None:
+            diff = allocation_diff(before, self.take_snapshot())
+            add_allocations(phase.allocations, diff)
+            # what the measured phases inside allocated was charged to them
+            add_allocations(phase.allocations, nested, -1)
+            outer = next((entry for entry in reversed(self.stack) if entry[1] is not None), None)
+            if outer is not None:
+                add_allocations(outer[2], diff)
+
+        if self.stack:
+            self.phases[self.stack[-1][0]].profile.enable()
+
+    @staticmethod
+    def record_peak(phase):
+        phase.peak = max(phase.peak, tracemalloc.get_traced_memory()[0])
+
+    @staticmethod
+    def take_snapshot():
+        return tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+
+    def write(self):
+        """ Writes the .prof and .allocations.txt file of each phase
+
+        Returns:
+            list of str: paths written
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        paths = []
+        for name, phase in self.phases.items():
+            prof_path = os.path.join(self.directory, name + ".prof")
+            phase.profile.dump_stats(prof_path)
+
+            allocations_path = os.path.join(self.directory, name + ".allocations.txt")
+            with open(allocations_path, "w") as f:
+                f.write(self.format_allocations(name, phase))
+            paths += [prof_path, allocations_path]
+        return paths
+
+    @staticmethod
+    def format_allocations(name, phase):
+        lines = ["Phase '{0}', run {1} time(s), traced memory up to {2:.1f} KiB at its start or end"
+                 .format(name, phase.calls, phase.peak / 1024),
+                 "",
+                 "{0:>12} {1:>10}  {2}".format("KiB", "blocks", "line")]
+        top = sorted(phase.allocations.items(), key=lambda item: abs(item[1][0]), reverse=True)[:TOP_ALLOCATIONS]
+        for line, (size, count) in top:
+            lines.append("{0:>12.1f} {1:>10}  {2}".format(size / 1024, count, line))
+        return "\n".join(lines) + "\n"
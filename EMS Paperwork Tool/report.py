@@ -0,0 +1,336 @@
+"""
+Ohio Union EMS Autofill Tool - assignment reports
+
+Writes the assignment report for a day in several formats at once. The workers are walked a single time and every
+assignment is streamed to each enabled format through a buffered file. Files are written under a temporary name and
+renamed into place once complete, so a report is never left half written. Coverage warnings (see shift_coverage.py)
+are written at the top of the text and HTML reports; the CSV and JSON reports keep their layout for other tools.
+When assignments are reordered into walking routes (see routing.py), the text and HTML reports show each
+assignment's stop number.
+"""
+import csv
+import datetime
+import html
+import json
+import os
+
+REPORT_FORMATS = ("txt", "csv", "json", "html")
+
+# (key in assignment dict, column width in the text report)
+TEXT_HEADERS = [("Time", 10),
+                ("AssignmentType", 10),
+                ("Room", 35),
+                ("EventName", 35)]
+
+CSV_HEADERS = ["Date", "Worker", "Time", "AssignmentType", "Room", "EventName", "Equipment"]
+
+BUFFER_SIZE = 64 * 1024
+
+
+def datetime_handler(x):
+    if isinstance(x, datetime.datetime):
+        return x.isoformat()
+    raise TypeError("Unknown type")
+
+
+class AtomicFile:
+    """ Buffered file that is written to '{path}.tmp' and renamed to 'path' when committed """
+
+    def __init__(self, path):
+        self.path = path
+        self.tmp_path = path + ".tmp"
+        self.file = open(self.tmp_path, "w", buffering=BUFFER_SIZE, newline="", encoding="utf-8")
+
+    def write(self, text):
+        self.file.write(text)
+
+    def commit(self):
+        """ Flushes and closes the file, then renames it into place """
+        self.file.close()
+        os.replace(self.tmp_path, self.path)
+
+    def discard(self):
+        """ Closes and removes the temporary file """
+        self.file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+class TextSink:
+    """ Fixed-width text report, one block per worker """
+
+    def __init__(self, out):
+        self.out = out
+
+    def begin_day(self, date_label):
+        pass
+
+    def coverage(self, lines):
+        self.out.write("Coverage warnings:\n" + "".join("  - " + line + "\n" for line in lines) + "\n")
+
+    def begin_worker(self, worker_name):
+        self.out.write(worker_name + '\n    ')
+
+    def assignment(self, date_label, worker_name, assignment):
+        pieces = []
+        for key, width in TEXT_HEADERS:
+            pieces.append(assignment[key].ljust(width)[:width] + ' | ')
+        if "RouteStop" in assignment:
+            pieces.append("Stop {} | ".format(assignment["RouteStop"]))
+        for equipment in assignment["Equipment"]:
+            for i, split in enumerate(equipment.split('\n')):
+                pieces.append('\n' + ''.ljust(11 if i == 0 else 15) + split)
+        pieces.append("\n\n    ")
+        self.out.write("".join(pieces))
+
+    def end_worker(self):
+        self.out.write("\n")
+
+    def end_day(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class CombinedTextSink(TextSink):
+    """ Text report for several days, with a heading before each day """
+
+    def begin_day(self, date_label):
+        self.out.write("==== {} ====\n".format(date_label))
+
+    def end_day(self):
+        self.out.write("\n")
+
+
+class CsvSink:
+    """ One CSV row per assignment. Equipment is joined with '; ' """
+
+    def __init__(self, out):
+        self.writer = csv.writer(out)
+        self.writer.writerow(CSV_HEADERS)
+
+    def begin_day(self, date_label):
+        pass
+
+    def coverage(self, lines):
+        pass
+
+    def begin_worker(self, worker_name):
+        pass
+
+    def assignment(self, date_label, worker_name, assignment):
+        self.writer.writerow([date_label,
+                              worker_name,
+                              assignment["Time"],
+                              assignment["AssignmentType"],
+                              assignment["Room"],
+                              assignment["EventName"],
+                              "; ".join(e.replace("\n", " ") for e in assignment["Equipment"])])
+
+    def end_worker(self):
+        pass
+
+    def end_day(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class JsonSink:
+    """ Same layout as the old file_sorted.json: {worker: [assignment, ...]}. When combined, the days are nested
+    under their date: {date: {worker: [assignment, ...]}} """
+
+    def __init__(self, out, combined=False):
+        self.out = out
+        self.combined = combined
+        self.first_day = True
+        self.first_worker = True
+        self.first_assignment = True
+        if combined:
+            self.out.write("{")
+
+    def begin_day(self, date_label):
+        if self.combined:
+            self.out.write(("" if self.first_day else ", ") + json.dumps(date_label) + ": ")
+            self.first_day = False
+        self.out.write("{")
+        self.first_worker = True
+
+    def coverage(self, lines):
+        pass
+
+    def begin_worker(self, worker_name):
+        self.out.write(("" if self.first_worker else ", ") + json.dumps(worker_name) + ": [")
+        self.first_worker = False
+        self.first_assignment = True
+
+    def assignment(self, date_label, worker_name, assignment):
+        self.out.write(("" if self.first_assignment else ", ") + json.dumps(assignment, default=datetime_handler))
+        self.first_assignment = False
+
+    def end_worker(self):
+        self.out.write("]")
+
+    def end_day(self):
+        self.out.write("}")
+
+    def close(self):
+        if self.combined:
+            self.out.write("}")
+
+
+class HtmlSink:
+    """ Self-contained HTML page with one table per worker """
+
+    STYLE = ("body{font-family:sans-serif;margin:2em}"
+             "table{border-collapse:collapse;margin-bottom:1.5em;width:100%}"
+             "th,td{border:1px solid #ccc;padding:4px 8px;text-align:left;vertical-align:top}"
+             "th{background:#bb0000;color:#fff}"
+             "ul{margin:0;padding-left:1.2em}"
+             ".coverage{background:#fff4e5;border:1px solid #f0b429;padding:4px 8px}")
+
+    def __init__(self, out, title):
+        self.out = out
+        self.out.write('<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>{0}</title><style>{1}</style>'
+                       '</head><body>\n<h1>{0}</h1>\n'.format(html.escape(title), self.STYLE))
+
+    def begin_day(self, date_label):
+        self.out.write("<h2>{}</h2>\n".format(html.escape(date_label)))
+
+    def coverage(self, lines):
+        self.out.write('<div class="coverage"><h3>Coverage warnings</h3><ul>{}</ul></div>\n'.format(
+            "".join("<li>{}</li>".format(html.escape(line)) for line in lines)))
+
+    def begin_worker(self, worker_name):
+        self.out.write("<h3>{}</h3>\n<table><tr><th>Time</th><th>Assignment</th><th>Room</th><th>Event</th>"
+                       "<th>Equipment</th></tr>\n".format(html.escape(worker_name)))
+
+    def assignment(self, date_label, worker_name, assignment):
+        equipment = "".join("<li>{}</li>".format(html.escape(e).replace("\n", "<br>"))
+                            for e in assignment["Equipment"])
+        time = html.escape(assignment["Time"])
+        if "RouteStop" in assignment:
+            time += "<br>stop {}".format(assignment["RouteStop"])
+        self.out.write("<tr><td>{0}</td><td>{1}</td><td>{2}</td><td>{3}</td><td><ul>{4}</ul></td></tr>\n"
+                       .format(time,
+                               html.escape(assignment["AssignmentType"]),
+                               html.escape(assignment["Room"]),
+                               html.escape(assignment["EventName"]),
+                               equipment))
+
+    def end_worker(self):
+        self.out.write("</table>\n")
+
+    def end_day(self):
+        pass
+
+    def close(self):
+        self.out.write("</body></html>\n")
+
+
+def report_path(directory, label, report_format):
+    """ Returns the path of a report file, e.g. 'reports/AV Assignments 2017-9-5.txt' """
+    return os.path.join(directory, "AV Assignments {0}.{1}".format(label, report_format))
+
+
+class ReportSet:
+    """ The open files and sinks for every enabled format of one report (a single day, or a combined date range) """
+
+    def __init__(self, directory, label, formats, combined=False):
+        os.makedirs(directory, exist_ok=True)
+        self.files = []
+        self.sinks = []
+        try:
+            for report_format in formats:
+                if report_format not in REPORT_FORMATS:
+                    raise RuntimeError("Unknown report format '{}'".format(report_format))
+                out = AtomicFile(report_path(directory, label, report_format))
+                self.files.append(out)
+                if report_format == "txt":
+                    self.sinks.append(CombinedTextSink(out) if combined else TextSink(out))
+                elif report_format == "csv":
+                    self.sinks.append(CsvSink(out))
+                elif report_format == "json":
+                    self.sinks.append(JsonSink(out, combined))
+                else:
+                    self.sinks.append(HtmlSink(out, "AV Assignments " + label))
+        except Exception:
+            # don't leave the files already opened behind
+            self.discard()
+            raise
+
+    def commit(self):
+        for sink in self.sinks:
+            sink.close()
+        for out in self.files:
+            out.commit()
+
+    def discard(self):
+        for out in self.files:
+            out.discard()
+
+
+def write_day(date_label, workers, sinks, coverage=None):
+    """ Walks the workers once, sending each assignment to every sink
+
+    Args:
+        date_label (str): date of the report, e.g. '2017-9-5'
+        workers (dict): EMS.workers, {worker name: [assignment dict, ...]}
+        sinks (list): sinks to write to
+        coverage (list of str): coverage warnings for the top of the day, or None
+    """
+    for sink in sinks:
+        sink.begin_day(date_label)
+        if coverage:
+            sink.coverage(coverage)
+    for worker_name, assignments in workers.items():
+        for sink in sinks:
+            sink.begin_worker(worker_name)
+        for assignment in assignments:
+            for sink in sinks:
+                sink.assignment(date_label, worker_name, assignment)
+        for sink in sinks:
+            sink.end_worker()
+    for sink in sinks:
+        sink.end_day()
+
+
+def write_reports(date_label, workers, directory, formats, combined=None, coverage=None):
+    """ Writes the report for one day in every format, and appends the day to a combined report if given
+
+    Args:
+        date_label (str): date of the report, e.g. '2017-9-5'
+        workers (dict): EMS.workers, sorted
+        directory (str): directory to write the reports to
+        formats (list of str): formats to write. Any of REPORT_FORMATS
+        combined (CombinedReport): combined report for a date range, or None
+        coverage (list of str): coverage warnings for the top of the report, see shift_coverage.CoverageReport.lines()
+    """
+    day = ReportSet(directory, date_label, formats)
+    sinks = day.sinks + (combined.reports.sinks if combined is not None else [])
+    try:
+        write_day(date_label, workers, sinks, coverage)
+    except Exception:
+        day.discard()
+        raise
+    day.commit()
+
+
+class CombinedReport:
+    """ Report covering several days. Use as a context manager: the files are only renamed into place if the block
+    finishes without an exception """
+
+    def __init__(self, directory, first_label, last_label, formats):
+        self.reports = ReportSet(directory, "{0} to {1}".format(first_label, last_label), formats, combined=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.reports.commit()
+        else:
+            self.reports.discard()
+        return False
@@ -0,0 +1,182 @@
+"""
+Ohio Union EMS Autofill Tool - room routes
+
+sort_workers() orders each worker's assignments by time, so a worker with several assignments at about the same time
+can zig-zag across the building. With "room_distances_file" set, route_workers() cuts each worker's day into windows
+of "route_window_minutes" and reorders the rooms within each window to shorten the walk, starting from the last room
+of the previous window: the shorter of a nearest-neighbour route and the time order, each improved with 2-opt until
+no reversal helps. Assignments in the same room stay together and in time order. Each assignment in a window with
+more than one room gets a "RouteStop" number, shown in the text and HTML reports.
+
+The distance file is JSON, e.g. {"Senate Chamber": {"Suite E": 3, "Performance Hall": 1}}, in any unit. Distances
+work both ways, so each pair only needs to be listed once. A room is matched to the longest name in the file it
+contains; rooms not in the file, or pairs without a distance, count as the longest distance in the file.
+"""
+import datetime
+import json
+import re
+
+
+class RoomDistances:
+    """ Walking distance between two rooms """
+
+    def __init__(self, table):
+        """
+        Args:
+            table (dict): room -> {room -> distance (int or float)}
+
+        Raises:
+            RuntimeError: a distance isn't a number, or is negative
+        """
+        self.table = {}
+        for room, distances in table.items():
+            if not isinstance(distances, dict):
+                raise RuntimeError("Distances from '{}' should be an object of room: distance".format(room))
+            for other, distance in distances.items():
+                if isinstance(distance, bool) or not isinstance(distance, (int, float)) or distance < 0:
+                    raise RuntimeError("Distance from '{0}' to '{1}' should be a non-negative number, got {2}"
+                                       .format(room, other, json.dumps(distance)))
+                self.table.setdefault(room, {})[other] = distance
+                self.table.setdefault(other, {})[room] = distance
+        self.unknown = max((d for distances in self.table.values() for d in distances.values()), default=1)
+        # longest first, as for "skip_following_rooms"
+        names = sorted(self.table, key=len, reverse=True)
+        self.pattern = re.compile("|".join(re.escape(name) for name in names) if names else r"(?!)")
+        self.names = {}
+
+    def find_room(self, room_name):
+        """ Returns the room of the table the room name from the Event Details page refers to, or the name itself """
+        if room_name not in self.names:
+            if room_name in self.table:
+                self.names[room_name] = room_name
+            else:
+                match = self.pattern.search(room_name)
+                self.names[room_name] = match.group(0) if match is not None else room_name
+        return self.names[room_name]
+
+    def __call__(self, room_1, room_2):
+        if room_1 == room_2:
+            return 0
+        return self.table.get(room_1, {}).get(room_2, self.unknown)
+
+
+def load_distances(path):
+    """ Reads a room distance file
+
+    Args:
+        path (str): path of the JSON file
+
+    Returns:
+        RoomDistances: distances
+
+    Raises:
+        RuntimeError: the file can't be read or isn't valid
+    """
+    try:
+        with open(path) as f:
+            table = json.load(f)
+    except (OSError, ValueError) as e:
+        raise RuntimeError("Can't read the room distances from '{0}': {1}".format(path, e))
+    if not isinstance(table, dict):
+        raise RuntimeError("'{}' should contain a JSON object of room: {room: distance}".format(path))
+    return RoomDistances(table)
+
+
+def path_length(path, distance):
+    return sum(distance(path[i], path[i + 1]) for i in range(len(path) - 1))
+
+
+def plan_route(start, rooms, distance):
+    """ Orders the rooms to visit: the shorter of the nearest-neighbour route and the rooms in time order, each
+    improved with 2-opt. Ties keep the time order
+
+    Args:
+        start (str): room the worker is coming from, or None to start at rooms[0]
+        rooms (list of str): distinct rooms to visit, in time order
+        distance (callable): distance(room_1, room_2)
+
+    Returns:
+        list of str: rooms in visiting order
+    """
+    # path[0] is where the worker starts from: the previous room, which isn't visited again, or the first room
+    in_time_order = [start] + list(rooms) if start is not None else list(rooms)
+    remaining = in_time_order[1:]
+    nearest = in_time_order[:1]
+    while remaining:
+        closest = min(remaining, key=lambda room: distance(nearest[-1], room))
+        remaining.remove(closest)
+        nearest.append(closest)
+
+    path = min((two_opt(in_time_order, distance), two_opt(nearest, distance)),
+               key=lambda candidate: path_length(candidate, distance))
+    return path[1:] if start is not None else path
+
+
+def two_opt(path, distance):
+    """ Reverses parts of an open path while that shortens it. path[0] stays first """
+    path = list(path)
+    improved = True
+    while improved:
+        improved = False
+        for i in range(1, len(path) - 1):
+            for k in range(i + 1, len(path)):
+                before = distance(path[i - 1], path[i])
+                after = distance(path[i - 1], path[k])
+                if k + 1 < len(path):
+                    before += distance(path[k], path[k + 1])
+                    after += distance(path[i], path[k + 1])
+                if after < before:
+                    path[i:k + 1] = reversed(path[i:k + 1])
+                    improved = True
+    return path
+
+
+def route_assignments(assignments, distance, window_minutes):
+    """ Reorders one worker's assignments within each time window to shorten the walk
+
+    Args:
+        assignments (list of dict): assignments in time order, see EMS.sort_workers()
+        distance (RoomDistances): distances
+        window_minutes (int): assignments starting within this many minutes of the first of a window are in the window
+
+    Returns:
+        list of dict: the assignments in route order
+    """
+    window = datetime.timedelta(minutes=window_minutes)
+    routed = []
+    previous_room = None
+    i = 0
+    while i < len(assignments):
+        j = i + 1
+        while j < len(assignments) and assignments[j]["DateTime"] - assignments[i]["DateTime"] <= window:
+            j += 1
+        by_room = {}
+        for assignment in assignments[i:j]:
+            by_room.setdefault(distance.find_room(assignment["Room"]), []).append(assignment)
+
+        if len(by_room) == 1:
+            for assignment in assignments[i:j]:
+                # from an earlier report of the day in daemon mode
+                assignment.pop("RouteStop", None)
+                routed.append(assignment)
+        else:
+            order = plan_route(previous_room, list(by_room), distance)
+            for stop, room in enumerate(order, 1):
+                for assignment in by_room[room]:
+                    assignment["RouteStop"] = stop
+                    routed.append(assignment)
+        previous_room = distance.find_room(routed[-1]["Room"])
+        i = j
+    return routed
+
+
+def route_workers(workers, distance, window_minutes):
+    """ Reorders every worker's assignments in place, see route_assignments()
+
+    Args:
+        workers (dict): EMS.workers, sorted by time
+        distance (RoomDistances): distances
+        window_minutes (int): length of a window
+    """
+    for worker in workers:
+        workers[worker] = route_assignments(workers[worker], distance, window_minutes)
@@ -0,0 +1,161 @@
+"""
+Ohio Union EMS Autofill Tool - shift coverage
+
+Checks a day's assignments against the W2W shifts in one sweep over the shift starts and ends and the assignment
+times, sorted together. It finds:
+ - gaps: times between the first and last assignment when nobody is on shift
+ - fallbacks: assignments at a time nobody is on shift, given to the last worker of the night by
+   EMS.find_worker_at_time()
+ - unassigned: assignments at a time nobody is on shift, left "(Unassigned)"
+ - idle shifts: shifts with no assignments for their worker
+"""
+import bisect
+import collections
+
+import clock
+
+UNASSIGNED = "(Unassigned)"
+
+# position (str), worker (str, 'Last, First'), start and end (datetime.datetime, see clock.span_to_datetimes())
+Shift = collections.namedtuple("Shift", ["position", "worker", "start", "end"])
+
+# start and end (datetime.datetime), assignments (int): number of assignments planned in the gap
+Gap = collections.namedtuple("Gap", ["start", "end", "assignments"])
+
+# worker (str), assignment (dict): see EMS.return_assignment_dict()
+Uncovered = collections.namedtuple("Uncovered", ["worker", "assignment"])
+
+# the order points are handled in when at the same time: a shift ending at a time doesn't cover it, one starting does
+SHIFT_END, SHIFT_START, ASSIGNMENT = 0, 1, 2
+
+
+def shifts_from_schedule(schedule, positions):
+    """ Lists the shifts of the positions that are assigned work
+
+    Args:
+        schedule (dict): schedule, keyed by position
+        positions (tuple of str): positions, as in "order_to_assign_general_shift"
+
+    Returns:
+        list of Shift: shifts
+    """
+    shifts = []
+    for position in positions:
+        for worker in schedule.get(position, []):
+            start, end = clock.span_to_datetimes(worker["start_time"], worker["end_time"])
+            shifts.append(Shift(position, worker["last_name"] + ", " + worker["first_name"], start, end))
+    return shifts
+
+
+class CoverageReport:
+    """ What analyse() found """
+
+    def __init__(self, gaps, fallbacks, unassigned, idle_shifts):
+        self.gaps = gaps
+        self.fallbacks = fallbacks
+        self.unassigned = unassigned
+        self.idle_shifts = idle_shifts
+
+    def lines(self):
+        """ Returns a line for each problem found, for the top of the report and the log """
+        lines = []
+        for gap in self.gaps:
+            lines.append("Nobody is on shift from {0} to {1} ({2} assignment(s) then)".format(
+                format_time(gap.start), format_time(gap.end), gap.assignments))
+        for uncovered in self.fallbacks:
+            lines.append("{0} for '{1}' at {2} went to {3}, the last worker of the night: nobody is on shift".format(
+                uncovered.assignment["AssignmentType"], uncovered.assignment["EventName"],
+                uncovered.assignment["Time"], uncovered.worker))
+        for uncovered in self.unassigned:
+            lines.append("{0} for '{1}' at {2} is unassigned: nobody is on shift".format(
+                uncovered.assignment["AssignmentType"], uncovered.assignment["EventName"],
+                uncovered.assignment["Time"]))
+        for shift in self.idle_shifts:
+            lines.append("{0} shift of {1} from {2} to {3} has no assignments".format(
+                shift.position, shift.worker, format_time(shift.start), format_time(shift.end)))
+        return lines
+
+
+def is_night_before_setup(assignment, night_before_time):
+    """ Returns True for a setup at "setup_time_night_before", which goes to the previous night's worker rather than
+    someone on shift """
+    return night_before_time is not None and assignment["AssignmentType"] == "Setup" \
+        and assignment["Time"] == night_before_time
+
+
+def format_time(dt):
+    return clock.from_minutes(dt.hour * 60 + dt.minute)
+
+
+def analyse(shifts, workers, night_before_time=None):
+    """ Sweeps the shifts and assignments of a day
+
+    Args:
+        shifts (list of Shift): shifts, see shifts_from_schedule()
+        workers (dict): EMS.workers, {worker name: [assignment dict, ...]}
+        night_before_time (str): "setup_time_night_before". Setups at that time go to the previous night's worker
+            rather than someone on shift, so they aren't checked for coverage
+
+    Returns:
+        CoverageReport: gaps in start order, and the uncovered assignments in time order
+    """
+    points = []
+    for shift in shifts:
+        points.append((shift.start, SHIFT_START, len(points), shift))
+        points.append((shift.end, SHIFT_END, len(points), shift))
+    for worker, assignments in workers.items():
+        for assignment in assignments:
+            if is_night_before_setup(assignment, night_before_time):
+                continue
+            points.append((assignment["DateTime"], ASSIGNMENT, len(points), Uncovered(worker, assignment)))
+    points.sort()
+
+    gaps = []
+    fallbacks = []
+    unassigned = []
+    on_shift = 0
+    # start of the current gap, and the number of assignments in it. The gap before the first shift starts at the
+    # first assignment
+    gap_start = None
+    gap_assignments = 0
+    first_assignment = None
+    last_assignment = None
+
+    for time, kind, _, item in points:
+        if kind == SHIFT_START:
+            # a shift starting as another ends leaves no gap
+            if on_shift == 0 and first_assignment is not None and (gap_start or first_assignment) < time:
+                gaps.append(Gap(gap_start or first_assignment, time, gap_assignments))
+            on_shift += 1
+        elif kind == SHIFT_END:
+            on_shift -= 1
+            if on_shift == 0:
+                gap_start = time
+                gap_assignments = 0
+        else:
+            if first_assignment is None:
+                first_assignment = time
+            last_assignment = time
+            if on_shift == 0:
+                gap_assignments += 1
+                (unassigned if item.worker == UNASSIGNED else fallbacks).append(item)
+
+    if on_shift == 0 and gap_assignments > 0:
+        gaps.append(Gap(gap_start or first_assignment, last_assignment, gap_assignments))
+    # gaps after the last assignment don't matter
+    gaps = [gap for gap in gaps if gap.start <= last_assignment]
+
+    return CoverageReport(gaps, fallbacks, unassigned, find_idle_shifts(shifts, workers))
+
+
+def find_idle_shifts(shifts, workers):
+    """ Returns the shifts with no assignments for their worker during the shift """
+    times = {worker: sorted(assignment["DateTime"] for assignment in assignments)
+             for worker, assignments in workers.items()}
+    idle = []
+    for shift in shifts:
+        worker_times = times.get(shift.worker, [])
+        index = bisect.bisect_left(worker_times, shift.start)
+        if index == len(worker_times) or worker_times[index] >= shift.end:
+            idle.append(shift)
+    return idle
@@ -0,0 +1,125 @@
+"""
+Ohio Union EMS Autofill Tool - staff assignment diffing
+
+Compares the rows already present in the EMS "Staff Assignments" table of an
+Event Details page with the assignments the tool wants to enter, so that only
+missing or changed assignments are submitted.
+"""
+from collections import namedtuple
+
+import clock
+
+# One row of the staff assignments table, or one assignment to enter.
+#   assignment (str): 'Setup', 'Check-In' or 'Teardown'
+#   staff (str): name of staff, in format 'Last, First'
+#   time (str): time, in format '12:00 AM'
+StaffAssignment = namedtuple("StaffAssignment", ["assignment", "staff", "time"])
+
+ASSIGNMENT_TYPES = ("Setup", "Check-In", "Teardown")
+
+
+def normalize_assignment_type(text):
+    """ Maps the text of an assignment type cell to one of ASSIGNMENT_TYPES
+
+    Args:
+        text (str): text of the first cell of a staff assignments row
+
+    Returns:
+        str: matching assignment type. None if the row isn't a Setup, Check-In or Teardown
+    """
+    for assignment_type in ASSIGNMENT_TYPES:
+        if assignment_type.lower() in text.lower():
+            return assignment_type
+    return None
+
+
+def normalize_name(text):
+    """ Collapses whitespace in a staff name, so that 'Jones,  Ryan ' and 'Jones, Ryan' compare equal """
+    return " ".join(text.split())
+
+
+def truncate_name(staff):
+    """ Cuts the first name of 'Last, First' to three letters, 'Last, Fir', the name looked for when the full name
+    isn't in the list of staff """
+    last, separator, first = staff.partition(", ")
+    return last + separator + first[:3] if separator else staff
+
+
+def find_staff(options, staff):
+    """ Finds the option for a person in the list of staff of the Staff Assignment form: the first option containing
+    the name, or failing that the first containing the name with the first name truncated, see truncate_name()
+
+    Args:
+        options (list of str): text of the options
+        staff (str): name of person, in format 'Last, First'
+
+    Returns:
+        int: index of the option. None if no option matches
+    """
+    for name in (staff, truncate_name(staff)):
+        for index, option in enumerate(options):
+            if name in option:
+                return index
+    return None
+
+
+def names_staff(text, staff):
+    """ Checks if the text of a staff assignments cell could be the person, as entered through find_staff(): it
+    contains the name, or the name with the first name truncated
+
+    Args:
+        text (str): text of the staff cell
+        staff (str): name of person, in format 'Last, First'
+    """
+    text = normalize_name(text)
+    staff = normalize_name(staff)
+    return staff in text or truncate_name(staff) in text
+
+
+def matches(existing, planned):
+    """ Checks if an existing row of the staff assignments table satisfies a planned assignment: same type, the
+    planned staff (see names_staff()) and the same time of day, so '04:30 PM' matches '4:30 PM' but '12:00 PM'
+    doesn't match '2:00 PM'
+
+    Args:
+        existing (StaffAssignment): row read from the staff assignments table
+        planned (StaffAssignment): assignment to enter
+
+    Returns:
+        bool: True if the existing row already covers the planned assignment
+    """
+    planned_minutes = clock.to_minutes(planned.time)
+    return normalize_assignment_type(existing.assignment) == planned.assignment \
+        and names_staff(existing.staff, planned.staff) \
+        and planned_minutes is not None and clock.to_minutes(existing.time) == planned_minutes
+
+
+def diff_staff_assignments(existing_rows, planned):
+    """ Computes the minimal set of assignments to submit for an event.
+
+    A planned assignment is skipped if an existing row has the same type, staff and time. If an existing row has the
+    same type but a different staff or time, the planned assignment is submitted and the existing row is returned as
+    outdated so it can be reported. Planned assignments to "(Unassigned)" are never submitted.
+
+    Args:
+        existing_rows (list of StaffAssignment): rows read from the staff assignments table
+        planned (list of StaffAssignment): assignments the tool would enter
+
+    Returns:
+        to_submit (list of StaffAssignment): planned assignments that are missing or changed, in planned order
+        outdated (list of StaffAssignment): existing rows that were replaced by a changed assignment
+    """
+    to_submit = []
+    outdated = []
+    for plan in planned:
+        if plan.staff == "(Unassigned)":
+            continue
+
+        same_type = [row for row in existing_rows if normalize_assignment_type(row.assignment) == plan.assignment]
+        if any(matches(row, plan) for row in same_type):
+            continue
+
+        to_submit.append(plan)
+        outdated += [row for row in same_type if row not in outdated]
+
+    return to_submit, outdated
@@ -0,0 +1,223 @@
+"""
+Ohio Union EMS Autofill Tool - synthetic schedules and event days
+
+Generates WhenToWork schedules and EMS event days of any size, to measure how the scheduling code scales. Schedules
+have shifts across every position, including overnight shifts; event days include events that run past midnight and
+events starting around the previous day setup cutoffs. The same seed always gives the same data.
+
+Writes schedule.json, the W2W schedule cell text, and fixture pages for the Daily Setup Schedule and each Event
+Details page, with the markup the tool reads:
+    python3 synthetic.py --shifts 2000 --events 300 [--seed 1] [--output synthetic]
+"""
+import argparse
+import html
+import json
+import os
+import random
+
+import clock
+
+POSITIONS = ("AV Shift Lead", "AV Student Manager", "AV Technician")
+
+FIRST_NAMES = ("Alex", "Brutus", "Casey", "Dana", "Emery", "Frankie", "Hannah", "Jordan", "Kendall", "Logan",
+               "Morgan", "Parker", "Quinn", "Riley", "Sam", "Taylor")
+LAST_NAMES = ("Buckeye", "Hempel", "Kleman", "Nguyen", "Okafor", "Patel", "Ramirez", "Schmidt", "Smith", "Wong")
+
+ROOMS = ("Performance Hall", "Cartoon Room 1", "Cartoon Room 2", "Senate Chamber", "Rosa Ailabouni Traditions Room",
+         "US Bank Conference Theater", "Archie M. Griffin East Ballroom", "Interfaith Prayer and Reflection Room",
+         "Ohio Staters Inc. Founders Room", "Barbie Tootle Room", "Suite E", "Hebrew Room")
+
+EVENT_WORDS = ("Chess Club", "Career Fair", "Guest Lecture", "Dance Rehearsal", "Student Senate", "Film Screening",
+               "Orientation", "Banquet", "Hackathon", "Study Tables", "Open Mic", "Awards Ceremony")
+
+EQUIPMENT = ("Projector", "Screen", "Wireless Microphone", "Podium Microphone", "Laptop", "Speaker Phone",
+             "Mixer", "DVD Player", "Clicker")
+
+# times events start around, as in settings.json: previous_day_setup_cutoff, late_open_previous_day_setup_cutoff
+CUTOFF_TIMES = ("10:00 AM", "11:00 AM")
+
+LISTING_TITLE = "EMS - Daily Setup Schedule"
+DETAILS_TITLE = "EMS - Event Details Page"
+
+
+def name(rng):
+    return rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+
+
+def generate_schedule(shift_count, seed=0, positions=POSITIONS):
+    """ Generates a W2W schedule in schedule.json format. Shifts are 2 to 8 hours long, start on the quarter hour
+    between 6:00 AM and 11:45 PM, and about one in ten runs past midnight
+
+    Args:
+        shift_count (int): total number of shifts, spread across the positions
+        seed (int): random seed
+        positions (tuple of str): positions, as in "order_to_assign_general_shift"
+
+    Returns:
+        dict: position -> list of {"last_name", "first_name", "start_time", "end_time"}, sorted by start time
+    """
+    rng = random.Random(seed)
+    schedule = {position: [] for position in positions}
+    for i in range(shift_count):
+        position = positions[i % len(positions)]
+        if rng.random() < 0.1:
+            # overnight
+            start = rng.randrange(18 * 60, 24 * 60, 15)
+        else:
+            start = rng.randrange(6 * 60, 22 * 60, 15)
+        end = min(start + rng.randrange(2 * 60, 8 * 60 + 1, 15), 24 * 60 + 4 * 60)
+        first_name, last_name = name(rng)
+        schedule[position].append({"last_name": last_name,
+                                   "first_name": first_name,
+                                   "start_time": clock.from_minutes(start),
+                                   "end_time": clock.from_minutes(end),
+                                   "start_minutes": start})
+
+    for shifts in schedule.values():
+        shifts.sort(key=lambda shift: shift.pop("start_minutes"))
+    return schedule
+
+
+def generate_events(event_count, seed=0, edge_times=CUTOFF_TIMES):
+    """ Generates an EMS event day. Most events start on the quarter hour between 7:00 AM and 10:00 PM; about one in
+    ten runs past midnight, and about one in ten starts within 15 minutes of one of edge_times
+
+    Args:
+        event_count (int): number of events
+        seed (int): random seed
+        edge_times (tuple of str): times some events start around, e.g. the previous day setup cutoffs
+
+    Returns:
+        list of dict: "Reservation", "Room", "EventName", "StartTime", "EndTime", "RunTime" ('12:00 AM - 1:00 PM'),
+            "AVEquipment", "SetupNotes" (list of str), in start time order
+    """
+    rng = random.Random(seed)
+    edges = [clock.to_minutes(text) for text in edge_times]
+    events = []
+    for i in range(event_count):
+        kind = rng.random()
+        if kind < 0.1:
+            start = rng.randrange(21 * 60, 24 * 60, 15)
+            end = start + rng.randrange(2 * 60, 4 * 60 + 1, 15)
+        elif kind < 0.2 and edges:
+            start = rng.choice(edges) + rng.choice((-15, 0, 15))
+            end = start + rng.randrange(60, 3 * 60 + 1, 15)
+        else:
+            start = rng.randrange(7 * 60, 22 * 60, 15)
+            end = min(start + rng.randrange(30, 4 * 60 + 1, 15), 24 * 60)
+
+        if rng.random() < 0.15:
+            equipment = ["None Found"]
+        else:
+            equipment = rng.sample(EQUIPMENT, rng.randint(1, 4))
+        notes = ["None Found"] if rng.random() < 0.7 else ["Tables to be set in rounds of 8"]
+
+        events.append({"Reservation": str(100000 + i),
+                       "Room": rng.choice(ROOMS),
+                       "EventName": "{0} {1}".format(rng.choice(EVENT_WORDS), i),
+                       "StartTime": clock.from_minutes(start),
+                       "EndTime": clock.from_minutes(end),
+                       "RunTime": clock.from_minutes(start) + " - " + clock.from_minutes(end),
+                       "AVEquipment": equipment,
+                       "SetupNotes": notes,
+                       "start_minutes": start})
+
+    events.sort(key=lambda event: event.pop("start_minutes"))
+    return events
+
+
+def w2w_time(text):
+    """ Formats a time the way the W2W schedule shows it: '6pm', '6:30pm' """
+    minutes = clock.to_minutes(text)
+    hour, minute = divmod(minutes, 60)
+    ampm = "am" if hour < 12 else "pm"
+    hour = hour % 12 or 12
+    return "{0}{1}".format(hour, ampm) if minute == 0 else "{0}:{1:02}{2}".format(hour, minute, ampm)
+
+
+def w2w_cell_text(shifts):
+    """ Returns the text of a position's cell in the W2W schedule, as W2W.get_list_of_schedule() reads it
+
+    Args:
+        shifts (list of dict): shifts of one position, from generate_schedule()
+
+    Returns:
+        str: cell text
+    """
+    lines = ["{0} - {1}".format(w2w_time(shift["start_time"]), w2w_time(shift["end_time"])) for shift in shifts]
+    names = ["  {0} {1}".format(shift["first_name"], shift["last_name"]) for shift in shifts]
+    return "\n".join(line for pair in zip(lines, names) for line in pair)
+
+
+def listing_page(events):
+    """ Returns a Daily Setup Schedule page listing the events, none of them scheduled """
+    rows = ["<tr><th>Start</th><th>End</th><th>Building</th><th>Room</th><th>Event</th><th>Reservation</th>"
+            "<th>Setup</th><th>Check-In</th><th>Teardown</th></tr>"]
+    for event in events:
+        link = "javascript:openEvent('{}')".format(event["Reservation"])
+        rows.append("<tr><td>{0}</td><td>{1}</td><td>Ohio Union</td><td>{2}</td><td><a href=\"{3}\">{4}</a></td>"
+                    "<td>{5}</td><td>&nbsp;</td><td>&nbsp;</td><td>&nbsp;</td></tr>"
+                    .format(event["StartTime"], event["EndTime"], html.escape(event["Room"]), html.escape(link),
+                            html.escape(event["EventName"]), event["Reservation"]))
+        rows.append("<tr><td></td><td></td><td></td><td>Unconfirmed</td><td>Unconfirmed</td><td>Unconfirmed</td>"
+                    "<td></td><td></td><td></td></tr>")
+    return ("<!DOCTYPE html>\n<html><head><title>{0}</title></head><body>\n"
+            "<div class=\"table-responsive\"><table><tbody>\n{1}\n</tbody></table></div>\n"
+            "</body></html>\n").format(LISTING_TITLE, "\n".join(rows))
+
+
+def details_page(event):
+    """ Returns the Event Details page of the event, with an empty staff assignments table """
+    sections = []
+    for header, key in (("Setup Notes", "SetupNotes"), ("A/V Equipment", "AVEquipment")):
+        items = "".join("<li>{}</li>".format(html.escape(item)) for item in event[key])
+        sections.append("<h5>{0}</h5><ul>{1}</ul>".format(header, items))
+    return ("<!DOCTYPE html>\n<html><head><title>{0}</title></head><body>\n"
+            "<div class=\"container-fluid\"><h3>{1}</h3>\n"
+            "<span id=\"spRoom\">{2}</span> <span id=\"spRunTime\">{3}</span>\n"
+            "<table id=\"ctl00_ContentPlaceHolder1_dg_staff_assignments\"><tr><th>Assignment</th><th>Staff</th>"
+            "<th>Time</th></tr></table>\n"
+            "<div class=\"div_right_column\">{4}</div></div>\n"
+            "</body></html>\n").format(DETAILS_TITLE, html.escape(event["EventName"]), html.escape(event["Room"]),
+                                       event["RunTime"], "".join(sections))
+
+
+def write_fixtures(directory, schedule, events):
+    """ Writes schedule.json, events.json, w2w/{position}.txt, listing.html and details/{reservation}.html
+
+    Args:
+        directory (str): directory to write to
+        schedule (dict): from generate_schedule()
+        events (list of dict): from generate_events()
+    """
+    for subdirectory in ("w2w", "details"):
+        os.makedirs(os.path.join(directory, subdirectory), exist_ok=True)
+
+    with open(os.path.join(directory, "schedule.json"), "w") as f:
+        json.dump(schedule, f, indent=4)
+    with open(os.path.join(directory, "events.json"), "w") as f:
+        json.dump(events, f, indent=4)
+    for position, shifts in schedule.items():
+        with open(os.path.join(directory, "w2w", position + ".txt"), "w") as f:
+            f.write(w2w_cell_text(shifts))
+    with open(os.path.join(directory, "listing.html"), "w") as f:
+        f.write(listing_page(events))
+    for event in events:
+        with open(os.path.join(directory, "details", event["Reservation"] + ".html"), "w") as f:
+            f.write(details_page(event))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic schedules and event days.")
+    parser.add_argument("--shifts", type=int, default=1000, help="number of W2W shifts")
+    parser.add_argument("--events", type=int, default=200, help="number of EMS events")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="synthetic", help="directory to write to")
+    args = parser.parse_args()
+
+    write_fixtures(args.output, generate_schedule(args.shifts, args.seed), generate_events(args.events, args.seed))
+    print("Wrote {0} shifts and {1} events to '{2}'".format(args.shifts, args.events, args.output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+Ohio Union EMS Autofill Tool - EMS request throttle
+
+Keeps the tool from hammering the university's EMS server. Every navigation or postback (opening the event listing
+or an Event Details page, adding a staff assignment) first takes a token from a token bucket, which refills at
+"ems_requests_per_minute" and holds up to "ems_request_burst" tokens. The date range worker processes each get an
+equal share of the rate.
+
+On top of the bucket, an AIMD controller decides how many requests may be in flight at once, i.e. how many Event
+Details pages are prefetched in other tabs. Each response faster than "ems_slow_response_seconds" raises the limit by
+1/limit, so by one per round of responses; a slow response or an error halves it. After a decrease, the responses to
+requests that were already in flight can't decrease it again.
+"""
+import contextlib
+import threading
+import time
+
+
+class TokenBucket:
+    """ Token bucket rate limiter, safe to share between threads """
+
+    def __init__(self, rate, burst, clock=time.monotonic, sleep=time.sleep):
+        """
+        Args:
+            rate (float): tokens added per second. 0 for no limit
+            burst (int): tokens the bucket holds, i.e. requests that can be made at once after a pause
+            clock (callable): returns the current time in seconds
+            sleep (callable): sleeps for a number of seconds
+        """
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = float(burst)
+        self.updated = clock()
+        self.lock = threading.Lock()
+        # seconds spent waiting for a token
+        self.waited = 0.0
+
+    def refill(self):
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self):
+        """ Takes a token if there's one. Returns True if taken """
+        if self.rate <= 0:
+            return True
+        with self.lock:
+            self.refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+    def acquire(self):
+        """ Takes a token, waiting for one if the bucket is empty. Returns the seconds waited """
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self.lock:
+                self.refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    self.waited += waited
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            self.sleep(delay)
+            waited += delay
+
+
+class AIMDController:
+    """ Additive increase, multiplicative decrease limit on the number of requests in flight, safe to share between
+    threads """
+
+    def __init__(self, minimum, maximum, slow_seconds, decrease=0.5):
+        """
+        Args:
+            minimum (int): lowest limit, at least 1. The limit starts here
+            maximum (int): highest limit
+            slow_seconds (float): responses taking longer than this are slow. 0 to never count a response as slow
+            decrease (float): the limit is multiplied by this on a slow response or an error
+        """
+        self.minimum = minimum
+        self.maximum = max(minimum, maximum)
+        self.slow_seconds = slow_seconds
+        self.decrease = decrease
+        self.limit = float(minimum)
+        self.in_flight = 0
+        # responses to ignore for decreases, as their requests were sent before the last decrease
+        self.hold = 0
+        self.decreases = 0
+        self.condition = threading.Condition()
+
+    @property
+    def concurrency(self):
+        """ Requests that may be in flight at once """
+        return int(self.limit)
+
+    def acquire(self):
+        """ Waits until fewer requests than the limit are in flight, and counts one more """
+        with self.condition:
+            while self.in_flight >= int(self.limit):
+                self.condition.wait()
+            self.in_flight += 1
+
+    def release(self):
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    def observe(self, seconds, ok=True):
+        """ Adjusts the limit for a response
+
+        Args:
+            seconds (float): how long the response took
+            ok (bool): False if the request failed
+        """
+        with self.condition:
+            held = self.hold > 0
+            if held:
+                self.hold -= 1
+            if ok and (self.slow_seconds <= 0 or seconds <= self.slow_seconds):
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            elif not held:
+                self.limit = max(self.minimum, self.limit * self.decrease)
+                # the other requests in flight were sent at the old limit
+                self.hold = max(0, self.in_flight - 1)
+                self.decreases += 1
+            self.condition.notify_all()
+
+
+class Throttle:
+    """ Token bucket and AIMD controller, used around every request to EMS """
+
+    def __init__(self, bucket, controller, clock=time.monotonic):
+        """
+        Args:
+            bucket (TokenBucket): rate limiter
+            controller (AIMDController): concurrency limit
+            clock (callable): returns the current time in seconds
+        """
+        self.bucket = bucket
+        self.controller = controller
+        self.clock = clock
+        self.requests = 0
+
+    @contextlib.contextmanager
+    def request(self):
+        """ Context manager around a request: waits for a free slot and a token, then times the request. An exception
+        inside counts as an error """
+        self.controller.acquire()
+        try:
+            self.bucket.acquire()
+            with self.controller.condition:
+                self.requests += 1
+            start = self.clock()
+            try:
+                yield
+            except Exception:
+                self.controller.observe(self.clock() - start, ok=False)
+                raise
+            self.controller.observe(self.clock() - start)
+        finally:
+            self.controller.release()
+
+    def summary(self):
+        """ Returns the counters as a line for the run summary """
+        return "EMS requests: {0}, {1:.1f} s waiting for the rate limit, concurrency {2} after {3} backoffs" \
+            .format(self.requests, self.bucket.waited, self.controller.concurrency, self.controller.decreases)
+
+
+def from_settings(settings, processes=1):
+    """ Builds the throttle described by settings.json
+
+    Args:
+        settings (config.Settings): settings
+        processes (int): number of processes sharing the rate
+
+    Returns:
+        Throttle: throttle. Its concurrency goes up to one request for the current page plus "prefetch_depth"
+    """
+    bucket = TokenBucket(settings.ems_requests_per_minute / 60 / processes, settings.ems_request_burst)
+    controller = AIMDController(1, 1 + settings.prefetch_depth, settings.ems_slow_response_seconds)
+    return Throttle(bucket, controller)
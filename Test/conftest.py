@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+
+# The tool's modules live next to autofill_tool.py rather than in a package
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "EMS Paperwork Tool"))
+
+
+class FakeClock:
+    """ Clock that only moves when the test moves it, or when something sleeps on it """
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def fake_clock():
+    return FakeClock()
@@ -0,0 +1,45 @@
+import datetime
+
+import assignee
+
+SCHEDULE = {
+    "AV Shift Lead": [
+        {"last_name": "Kleman", "first_name": "Hannah", "start_time": "8:00 AM", "end_time": "6:00 PM"},
+        {"last_name": "Smith", "first_name": "Sam", "start_time": "4:00 PM", "end_time": "10:00 PM"},
+        {"last_name": "Wong", "first_name": "Riley", "start_time": "5:00 PM", "end_time": "11:00 PM"},
+    ],
+    "AV Student Manager": [
+        {"last_name": "Hempel", "first_name": "Alex", "start_time": "4:00 PM", "end_time": "2:00 AM"},
+    ],
+}
+POSITIONS = ("AV Shift Lead", "AV Student Manager")
+
+
+def at(hour, minute=0, day=1):
+    return datetime.datetime(2016, 1, day, hour, minute)
+
+
+def last_names(balancer, times):
+    return [balancer.pick(time)["last_name"] for time in times]
+
+
+def test_spreads_work_across_leads_on_shift():
+    balancer = assignee.LoadBalancer(SCHEDULE, POSITIONS)
+    assert last_names(balancer, [at(17, 30)] * 6) == ["Kleman", "Smith", "Wong", "Kleman", "Smith", "Wong"]
+    # only Smith and Wong are on at 7 PM, and Kleman's load doesn't matter
+    assert last_names(balancer, [at(19)] * 3) == ["Smith", "Wong", "Smith"]
+    assert balancer.loads["Smith, Sam"] == 4
+
+
+def test_position_priority_and_nobody_on_shift():
+    balancer = assignee.LoadBalancer(SCHEDULE, POSITIONS)
+    assert last_names(balancer, [at(23, 30), at(1, day=2)]) == ["Hempel", "Hempel"]
+    # the manager is only picked once no lead is on shift
+    assert last_names(balancer, [at(16, 30)] * 3) == ["Kleman", "Smith", "Kleman"]
+    assert balancer.pick(at(3, day=2)) is None
+    assert balancer.pick(at(5)) is None
+
+
+def test_existing_loads():
+    balancer = assignee.LoadBalancer(SCHEDULE, POSITIONS, loads={"Kleman, Hannah": 2})
+    assert last_names(balancer, [at(16, 30)] * 4) == ["Smith", "Smith", "Kleman", "Smith"]
@@ -0,0 +1,84 @@
+import json
+import os
+
+import browser
+import config
+
+
+SETTINGS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "EMS Paperwork Tool",
+                             "settings.json")
+
+
+def make_settings(**overrides):
+    with open(SETTINGS_PATH) as f:
+        values = json.load(f)
+    values.update(overrides)
+    return config.Settings(config.validate_settings(values))
+
+
+def test_everything_off():
+    settings = make_settings(browser_headless=False, browser_block_images=False, browser_block_fonts=False,
+                             browser_block_stylesheets=False, browser_page_load_strategy="normal",
+                             browser_disable_extras=False)
+    assert browser.profile_from_settings(settings) == browser.DEFAULT_PROFILE
+
+
+def test_everything_on():
+    settings = make_settings(browser_headless=True, browser_block_images=True, browser_block_fonts=True,
+                             browser_block_stylesheets=True, browser_page_load_strategy="eager",
+                             browser_disable_extras=True)
+    profile = browser.profile_from_settings(settings)
+    assert "--headless" in profile.arguments
+    assert "--disable-extensions" in profile.arguments
+    assert profile.prefs == {"profile.managed_default_content_settings.images": 2}
+    assert profile.blocked_urls == browser.BLOCKED_FONT_URLS + browser.BLOCKED_STYLESHEET_URLS
+    assert profile.page_load_strategy == "eager"
+
+
+class FakeDriver:
+    def __init__(self, number):
+        self.number = number
+        self.quit_called = False
+        self.title = "Browser {}".format(number)
+
+    def quit(self):
+        self.quit_called = True
+
+
+def make_recycling_driver(**kwargs):
+    launched = []
+
+    def launcher():
+        launched.append(FakeDriver(len(launched)))
+        return launched[-1]
+
+    return browser.RecyclingDriver(launcher, **kwargs), launched
+
+
+def test_recycle_after_events():
+    driver, launched = make_recycling_driver(recycle_events=2)
+    assert [driver.start_event() for _ in range(2)] == [None, None]
+    reason = driver.start_event()
+    assert reason == "after 2 events"
+
+    driver.recycle(reason)
+    assert launched[0].quit_called
+    # the new browser's attributes, and this event counts towards it
+    assert driver.title == "Browser 1"
+    assert driver.start_event() is None
+    assert driver.start_event() is not None
+
+
+def test_recycle_above_memory(monkeypatch):
+    driver, _ = make_recycling_driver(recycle_memory_mb=100)
+    monkeypatch.setattr(driver, "browser_rss_bytes", lambda: 99 * 1024 * 1024)
+    assert driver.start_event() is None
+    monkeypatch.setattr(driver, "browser_rss_bytes", lambda: 150 * 1024 * 1024)
+    assert driver.start_event() == "browser uses 150 MiB"
+
+
+def test_no_limits():
+    driver, _ = make_recycling_driver()
+    assert all(driver.start_event() is None for _ in range(1000))
+    # a driver without a chromedriver process has unknown memory
+    assert driver.browser_rss_bytes() is None
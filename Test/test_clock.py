@@ -0,0 +1,58 @@
+import datetime
+
+import pytest
+
+import clock
+
+
+@pytest.mark.parametrize("text, minutes", [
+    ("6pm", 18 * 60),
+    ("6:30pm", 18 * 60 + 30),
+    ("06:30 PM", 18 * 60 + 30),
+    ("6:30 pm", 18 * 60 + 30),
+    ("12am", 0),
+    ("12:00 AM", 0),
+    ("12:15 PM", 12 * 60 + 15),
+    ("11:59 PM", 24 * 60 - 1),
+])
+def test_to_minutes(text, minutes):
+    assert clock.to_minutes(text) == minutes
+
+
+@pytest.mark.parametrize("text", ["", " ", "6", "13:00 PM", "0:30 AM", "6:3 PM", "6:60 PM", "six pm", "6:30 XM"])
+def test_to_minutes_rejects(text):
+    assert clock.to_minutes(text) is None
+
+
+def test_matches_strptime():
+    for minutes in range(0, 24 * 60, 5):
+        text = clock.from_minutes(minutes)
+        assert clock.to_minutes(text) == minutes
+        assert clock.normalize(text.replace(" ", "").lower(), zero_pad=True) == clock.strptime_normalize(text)
+
+
+def test_from_minutes():
+    assert clock.from_minutes(18 * 60 + 5) == "6:05 PM"
+    assert clock.from_minutes(18 * 60 + 5, zero_pad=True) == "06:05 PM"
+    assert clock.from_minutes(0) == "12:00 AM"
+    assert clock.from_minutes(24 * 60 + 30) == "12:30 AM"
+
+
+def test_normalize_rejects():
+    with pytest.raises(RuntimeError):
+        clock.normalize("noon")
+
+
+@pytest.mark.parametrize("start, end, end_day", [
+    ("8:30 AM", "9:30 AM", 1),
+    ("8:30 AM", "12:30 AM", 2),
+    ("8:00 PM", "1:00 AM", 2),
+    ("8:00 PM", "12:00 AM", 2),
+    ("8:00 AM", "12:00 PM", 1),
+    ("6:00 PM", "11:00 PM", 1),
+])
+def test_span_to_datetimes(start, end, end_day):
+    start_dt, end_dt = clock.span_to_datetimes(start, end)
+    assert start_dt.date() == datetime.date(2016, 1, 1)
+    assert end_dt.date() == datetime.date(2016, 1, end_day)
+    assert clock.from_minutes(end_dt.hour * 60 + end_dt.minute) == end
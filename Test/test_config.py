@@ -0,0 +1,112 @@
+import json
+import os
+
+import pytest
+
+import config
+
+
+SETTINGS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "EMS Paperwork Tool",
+                             "settings.json")
+
+
+def shipped_settings():
+    with open(SETTINGS_PATH) as f:
+        return json.load(f)
+
+
+def test_shipped_settings_load():
+    settings = config.load_settings(SETTINGS_PATH)
+    assert settings.previous_day_setup_cutoff_minutes == 10 * 60
+    assert settings.late_open_previous_day_setup_cutoff_minutes == 11 * 60
+    assert settings.setup_time_night_before_minutes == 0
+    assert settings.order_to_assign_general_shift[0] == "AV Shift Lead"
+
+
+def test_read_only():
+    settings = config.Settings(config.validate_settings(shipped_settings()))
+    with pytest.raises(AttributeError):
+        settings.skip_rooms = False
+    with pytest.raises(AttributeError):
+        settings.new_setting = True
+
+
+def test_skipped_rooms():
+    settings = config.Settings(config.validate_settings(shipped_settings()))
+    assert settings.is_skipped_room("Performance Hall")
+    assert not settings.is_skipped_room("Performance Hall (Main)")
+    assert settings.find_skipped_room("Ohio Union - Performance Hall and Potter Plaza") == \
+        "Performance Hall and Potter Plaza"
+    assert settings.find_skipped_room("Ohio Union - Dressing Room 1") == "Dressing Room 1"
+    assert settings.find_skipped_room("Ohio Union - Senate Chamber") is None
+
+
+def test_no_skipped_rooms():
+    values = shipped_settings()
+    values["skip_following_rooms"] = []
+    settings = config.Settings(config.validate_settings(values))
+    assert settings.find_skipped_room("Performance Hall") is None
+
+
+def test_times_in_ems_format():
+    values = shipped_settings()
+    values["setup_time_night_before"] = "12am"
+    values["previous_day_setup_cutoff"] = "09:30 AM"
+    settings = config.Settings(config.validate_settings(values))
+    assert settings.setup_time_night_before == "12:00 AM"
+    assert settings.previous_day_setup_cutoff == "9:30 AM"
+    assert settings.previous_day_setup_cutoff_minutes == 9 * 60 + 30
+
+
+def test_defaults_for_newer_settings():
+    values = shipped_settings()
+    del values["detail_cache_size"]
+    assert config.validate_settings(values)["detail_cache_size"] == config.DEFAULTS["detail_cache_size"]
+
+
+def test_all_errors_reported():
+    values = shipped_settings()
+    del values["ems_username"]
+    values["skip_rooms"] = "yes"
+    values["minutes_to_advance_setup"] = True
+    values["previous_day_setup_cutoff"] = "10 o'clock"
+    values["skip_followng_rooms"] = []
+    with pytest.raises(RuntimeError) as e:
+        config.validate_settings(values)
+    message = str(e.value)
+    for name in ("ems_username", "skip_rooms", "minutes_to_advance_setup", "previous_day_setup_cutoff",
+                 "skip_followng_rooms"):
+        assert name in message
+
+
+def test_file_watcher(tmp_path):
+    path = tmp_path / "schedule.json"
+    watcher = config.FileWatcher(str(path))
+    assert not watcher.changed()
+
+    path.write_text("{}")
+    assert watcher.changed()
+    assert not watcher.changed()
+
+    stat = os.stat(str(path))
+    os.utime(str(path), ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+    assert watcher.changed()
+
+
+def test_page_load_strategy():
+    values = shipped_settings()
+    values["browser_page_load_strategy"] = "fast"
+    with pytest.raises(RuntimeError) as e:
+        config.validate_settings(values)
+    assert "browser_page_load_strategy" in str(e.value)
+
+
+def test_planning_values():
+    values = shipped_settings()
+    planning = config.Settings(config.validate_settings(values)).planning_values()
+    assert set(planning) == set(config.PLANNING_SETTINGS) <= set(config.SCHEMA)
+    values["report_formats"] = ["json"]
+    values["metrics_textfile"] = "autofill.prom"
+    assert config.Settings(config.validate_settings(values)).planning_values() == planning
+    values["minutes_to_advance_setup"] += 15
+    assert config.Settings(config.validate_settings(values)).planning_values() != planning
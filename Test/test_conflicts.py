@@ -0,0 +1,60 @@
+import datetime
+
+import conflicts
+
+DURATIONS = {"setup": 15, "check-in": 5, "teardown": 15}
+
+
+def assignment(assign_type, hour, minute, room, event="Chess Club"):
+    return {"AssignmentType": assign_type, "Time": "", "DateTime": datetime.datetime(2016, 1, 1, hour, minute),
+            "Room": room, "EventName": event, "Equipment": []}
+
+
+def test_overlapping_rooms():
+    workers = {"Kleman, Hannah": [assignment("Setup", 17, 30, "Senate Chamber"),
+                                  assignment("Setup", 17, 30, "Suite E"),
+                                  assignment("Setup", 17, 30, "Performance Hall"),
+                                  assignment("Setup", 19, 0, "Suite E")],
+               "Smith, Sam": []}
+    found = conflicts.find_conflicts(workers, DURATIONS)
+    assert len(found) == 1
+    conflict = found[0]
+    assert conflict.kind == conflicts.OVERLAP
+    assert len(conflict.assignments) == 3
+    assert conflict.end == datetime.datetime(2016, 1, 1, 17, 45)
+    assert conflicts.conflict_line(conflict) == ("Kleman, Hannah has 3 overlapping assignments in 3 rooms from "
+                                                 "5:30 PM to 5:45 PM: Senate Chamber, Suite E, Performance Hall")
+
+
+def test_same_room_is_one_trip():
+    workers = {"Kleman, Hannah": [assignment("Check-in", 16, 45, "Suite E"),
+                                  assignment("Setup", 16, 30, "Suite E"),
+                                  assignment("Setup", 16, 35, "Suite E", event="Open Mic")]}
+    assert conflicts.find_conflicts(workers, DURATIONS) == []
+
+
+def test_back_to_back():
+    workers = {"Kleman, Hannah": [assignment("Setup", 16, 30, "Suite E"),
+                                  assignment("Teardown", 16, 50, "Senate Chamber")]}
+    assert conflicts.find_conflicts(workers, DURATIONS) == []
+    found = conflicts.find_conflicts(workers, DURATIONS, back_to_back_minutes=5)
+    assert [conflict.kind for conflict in found] == [conflicts.BACK_TO_BACK]
+
+    # a long setup in another room covers the later assignments
+    workers["Kleman, Hannah"].append(assignment("Setup", 16, 0, "Performance Hall"))
+    found = conflicts.find_conflicts(workers, {"setup": 60})
+    assert [(conflict.kind, len(conflict.assignments)) for conflict in found] == [(conflicts.OVERLAP, 3)]
+
+
+def test_unassigned_is_skipped():
+    workers = {"(Unassigned)": [assignment("Setup", 17, 30, "Suite E"), assignment("Setup", 17, 30, "Hebrew Room")]}
+    assert conflicts.find_conflicts(workers, DURATIONS) == []
+
+
+def test_night_before_setups_ignored():
+    night_before = [assignment("Setup", 0, 0, room) for room in ("Senate Chamber", "Suite E", "Performance Hall")]
+    for setup in night_before:
+        setup["Time"] = "12:00 AM"
+    workers = {"Buckeye, Brutus": night_before + [assignment("Teardown", 0, 5, "Suite E")]}
+    assert len(conflicts.find_conflicts(workers, DURATIONS)) == 1
+    assert conflicts.find_conflicts(workers, DURATIONS, night_before_time="12:00 AM") == []
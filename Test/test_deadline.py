@@ -0,0 +1,32 @@
+import deadline
+
+
+def test_time_budget(fake_clock):
+    budget = deadline.TimeBudget(2, fake_clock)
+    assert not budget.expired()
+    fake_clock.now += 119
+    assert not budget.expired()
+    fake_clock.now += 1
+    assert budget.expired()
+
+    unlimited = deadline.TimeBudget(0, fake_clock)
+    fake_clock.now += 10 ** 6
+    assert not unlimited.expired()
+
+
+def test_queue_hands_out_earliest_first():
+    read = []
+
+    def rows():
+        for row in [("Dinner", 17), ("Breakfast", 7), ("Late Show", 22), ("Lunch", 11), ("Brunch", 7)]:
+            read.append(row[0])
+            yield row
+
+    queue = deadline.DeadlineQueue(rows(), lambda row: row[1])
+    assert queue.pending() == []
+    assert next(queue)[0] == "Breakfast"
+    # every row is read before the first is handed out
+    assert len(read) == 5
+    assert [row[0] for row in queue.pending()] == ["Brunch", "Lunch", "Dinner", "Late Show"]
+    assert [row[0] for row in queue] == ["Brunch", "Lunch", "Dinner", "Late Show"]
+    assert queue.pending() == []
@@ -0,0 +1,59 @@
+import datetime
+
+from detail_cache import DetailCache, make_key
+from history import HistoryStore
+
+
+DETAILS = {"EventName": "Chess Club", "Room": "Cartoon Room 1", "RunTime": "7:00 PM - 9:00 PM",
+           "SetupNotes": [], "AVEquipment": ["None Found"], "Staff": []}
+
+
+def test_key_changes_with_row_and_date():
+    date = datetime.date(2017, 9, 5)
+    assert make_key(date, "123", "row") == make_key(date, "123", "row")
+    assert make_key(date, "123", "row") != make_key(date, "123", "changed row")
+    # a recurring reservation with the same rows on another date
+    assert make_key(date, "123", "row") != make_key(datetime.date(2017, 9, 12), "123", "row")
+    assert make_key(date, "123", "row").startswith("123:2017-09-05:")
+
+
+def test_hits_and_misses():
+    cache = DetailCache(10)
+    assert cache.get("a") is None
+    cache.put("a", DETAILS)
+    assert cache.get("a") == DETAILS
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_lru_eviction():
+    cache = DetailCache(2)
+    cache.put("a", DETAILS)
+    cache.put("b", DETAILS)
+    cache.get("a")
+    cache.put("c", DETAILS)
+    assert cache.get("b") is None
+    assert cache.get("a") == DETAILS
+    assert cache.evictions == 1
+
+
+def test_disabled():
+    cache = DetailCache(0)
+    cache.put("a", DETAILS)
+    assert cache.get("a") is None
+
+
+def test_persisted_across_runs(tmp_path):
+    path = str(tmp_path / "history.sqlite3")
+    store = HistoryStore(path)
+    cache = DetailCache(2, store)
+    cache.put("a", DETAILS)
+    cache.put("b", DETAILS)
+    cache.get("a")
+    cache.put("c", DETAILS)
+    store.close()
+
+    store = HistoryStore(path)
+    cache = DetailCache(2, store)
+    assert list(cache.entries) == ["a", "c"]
+    assert cache.get("a") == DETAILS
+    store.close()
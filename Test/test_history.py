@@ -0,0 +1,115 @@
+import datetime
+
+import pytest
+
+from history import HistoryStore, make_fingerprint, period_to_dates
+
+
+DAY = datetime.date(2017, 9, 5)
+
+
+def make_store():
+    store = HistoryStore(":memory:")
+    store.start_run(DAY)
+    return store
+
+
+def test_assignments_by_worker_and_type():
+    store = make_store()
+    store.record_assignment(DAY, "123", "Senate Chamber", "Teardown", "Hempel, Alex", "9:30 PM", "USG")
+    store.record_assignment(DAY, "124", "Cartoon Room 1", "Teardown", "Hempel, Alex", "12:00 AM", "Chess Club")
+    store.record_assignment(DAY, "124", "Cartoon Room 1", "Setup", "Hempel, Alex", "11:00 PM", "Chess Club")
+    store.record_assignment(DAY, "125", "Cartoon Room 2", "Teardown", "Jones, Ryan", "8:00 PM", "Go Club")
+
+    rows = store.query_assignments(DAY, DAY, worker="hempel", assignment_type="Teardown")
+    assert [row["reservation"] for row in rows] == ["124", "123"]
+
+
+def test_assignment_replaced():
+    store = make_store()
+    store.record_assignment(DAY, "123", "Senate Chamber", "Setup", "Hempel, Alex", "4:30 PM", "USG")
+    store.record_assignment(DAY, "123", "Senate Chamber", "Setup", "Jones, Ryan", "4:00 PM", "USG")
+    rows = store.query_assignments(DAY, DAY)
+    assert [(row["worker"], row["time"]) for row in rows] == [("Jones, Ryan", "4:00 PM")]
+
+
+def test_events_listing_then_details():
+    store = make_store()
+    store.record_listing_event(DAY, "123", "Performance Hall", "Concert")
+    store.record_event_details(DAY, "123", "Performance Hall", "Performance Hall (Union)", "7:00 PM", "9:00 PM",
+                               ["Microphone"])
+    store.record_listing_event(DAY, "123", "Performance Hall", "Concert")
+
+    rows = store.query_events(DAY - datetime.timedelta(days=1), DAY, room="Performance Hall")
+    assert len(rows) == 1
+    assert rows[0]["name"] == "Concert"
+    assert rows[0]["start_time"] == "7:00 PM"
+    assert store.query_events(DAY, DAY, room="Potter Plaza") == []
+
+
+def test_batch_commits_once_at_the_end(tmp_path):
+    path = str(tmp_path / "history.sqlite3")
+    store = HistoryStore(path)
+    store.start_run(DAY)
+    other = HistoryStore(path)
+    with pytest.raises(RuntimeError):
+        with store.batch():
+            store.record_event_details(DAY, "123", "Senate Chamber", "Senate Chamber", "4:00 PM", "6:00 PM", [])
+            store.record_assignment(DAY, "123", "Senate Chamber", "Setup", "Hempel, Alex", "3:30 PM", "USG")
+            # held back, so other runs can still write
+            other.record_listing_event(DAY, "124", "Suite E", "Chess Club")
+            assert other.query_assignments(DAY, DAY) == []
+            raise RuntimeError("the browser crashed")
+    # what was recorded before the error is still committed
+    assert [row["worker"] for row in other.query_assignments(DAY, DAY)] == ["Hempel, Alex"]
+    assert len(other.query_events(DAY, DAY)) == 2
+    store.close()
+    other.close()
+
+
+def test_shifts_replaced_per_date():
+    store = make_store()
+    schedule = {"AV Shift Lead": [{"last_name": "Jones", "first_name": "Ryan",
+                                   "start_time": "4:30 PM", "end_time": "10:00 PM"}]}
+    store.record_shifts(DAY, schedule)
+    store.record_shifts(DAY, schedule)
+    assert len(store.query_shifts(DAY, DAY, worker="Jones")) == 1
+
+
+def test_periods():
+    today = datetime.date(2017, 9, 6)  # Wednesday
+    assert period_to_dates("this-week", today) == (datetime.date(2017, 9, 4), datetime.date(2017, 9, 10))
+    assert period_to_dates("last-week", today) == (datetime.date(2017, 8, 28), datetime.date(2017, 9, 3))
+    assert period_to_dates("this-month", today) == (datetime.date(2017, 9, 1), datetime.date(2017, 9, 30))
+    assert period_to_dates("last-month", today) == (datetime.date(2017, 8, 1), datetime.date(2017, 8, 31))
+
+
+def test_last_fingerprint():
+    store = make_store()
+    assert store.last_fingerprint(DAY) is None
+    store.finish_run(make_fingerprint("listing", {"AV Shift Lead": []}))
+
+    store.start_run(DAY)  # unfinished run is ignored
+    assert store.last_fingerprint(DAY) == make_fingerprint("listing", {"AV Shift Lead": []})
+    assert store.last_fingerprint(DAY + datetime.timedelta(days=1)) is None
+
+
+def test_fingerprint_changes():
+    assert make_fingerprint("listing", {"a": 1, "b": 2}) == make_fingerprint("listing", {"b": 2, "a": 1})
+    assert make_fingerprint("listing", {"a": 1}) != make_fingerprint("listing 2", {"a": 1})
+
+
+def test_upgrade_adds_fingerprint(tmp_path):
+    import sqlite3
+    path = str(tmp_path / "old.sqlite3")
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE runs (id INTEGER PRIMARY KEY, date TEXT NOT NULL, started TEXT NOT NULL, "
+                       "finished TEXT)")
+    connection.commit()
+    connection.close()
+
+    store = HistoryStore(path)
+    store.start_run(DAY)
+    store.finish_run("abc")
+    assert store.last_fingerprint(DAY) == "abc"
+    store.close()
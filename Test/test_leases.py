@@ -0,0 +1,68 @@
+import datetime
+import multiprocessing
+import socket
+import subprocess
+import sys
+
+import leases
+
+DATE = datetime.date(2018, 4, 20)
+
+
+def test_other_runs_skip_a_leased_event(tmp_path, fake_clock):
+    path = str(tmp_path / "history.sqlite3")
+    first = leases.LeaseStore(path, leases.make_owner("first"), 60, fake_clock)
+    second = leases.LeaseStore(path, leases.make_owner("second"), 60, fake_clock)
+    key = leases.make_key(DATE, "123456", "Senate Chamber")
+
+    assert first.acquire(key) is None
+    assert second.acquire(key) == (first.owner, 1060.0)
+    # the same run renews its lease
+    fake_clock.now += 30
+    assert first.acquire(key) is None
+    assert second.acquire(leases.make_key(DATE, "123456", "Suite E")) is None
+
+    fake_clock.now += 59
+    assert second.acquire(key) is not None
+    fake_clock.now += 1
+    assert second.acquire(key) is None
+    assert first.acquire(key)[0] == second.owner
+
+    second.release(key)
+    assert first.acquire(key) is None
+    first.close()
+    second.close()
+
+
+def test_lease_of_a_crashed_run_is_taken_over(tmp_path):
+    path = str(tmp_path / "history.sqlite3")
+    crashed = subprocess.Popen([sys.executable, "-c", "pass"])
+    crashed.wait()
+    owner = "crashed@{0}:{1}".format(socket.gethostname(), crashed.pid)
+    key = leases.make_key(DATE, "123456", "Senate Chamber")
+
+    assert leases.LeaseStore(path, owner, 600).acquire(key) is None
+    other = leases.LeaseStore(path, leases.make_owner("other"), 600)
+    assert other.acquire(key) is None
+    assert other.acquire(key) is None
+    other.close()
+
+
+def take_leases(path, keys, results):
+    store = leases.LeaseStore(path, leases.make_owner(), 600)
+    results.put([key for key in keys if store.acquire(key) is None])
+    store.close()
+
+
+def test_concurrent_runs_split_the_events(tmp_path):
+    path = str(tmp_path / "history.sqlite3")
+    keys = [leases.make_key(DATE, str(resnum), "Room") for resnum in range(50)]
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=take_leases, args=(path, keys, results)) for _ in range(4)]
+    for process in processes:
+        process.start()
+    taken = [results.get(timeout=30) for _ in processes]
+    for process in processes:
+        process.join()
+
+    assert sorted(key for run in taken for key in run) == sorted(keys)
@@ -0,0 +1,84 @@
+import pytest
+
+import metrics
+
+
+@pytest.fixture
+def registry():
+    return metrics.Registry()
+
+
+def test_counters_by_label(registry):
+    registry.inc("autofill_events_skipped_total", reason="room")
+    registry.inc("autofill_events_skipped_total", reason="room")
+    registry.inc("autofill_events_skipped_total", reason="no_av")
+    assert registry.get("autofill_events_skipped_total", reason="room") == 2
+    assert registry.get("autofill_events_skipped_total", reason="no_av") == 1
+    assert registry.get("autofill_events_scheduled_total") == 0
+
+
+def test_unknown_metric(registry):
+    with pytest.raises(KeyError):
+        registry.inc("autofill_typo_total")
+
+
+def test_render(registry):
+    registry.inc("autofill_events_seen_total", 3)
+    registry.set("autofill_last_run_success", 1)
+    registry.observe("autofill_phase_duration_seconds", 0.3, phase="listing")
+    registry.observe("autofill_phase_duration_seconds", 45, phase="listing")
+    text = registry.render()
+
+    assert "# TYPE autofill_events_seen_total counter\nautofill_events_seen_total 3\n" in text
+    assert "autofill_last_run_success 1\n" in text
+    assert 'autofill_phase_duration_seconds_bucket{phase="listing",le="0.25"} 0\n' in text
+    assert 'autofill_phase_duration_seconds_bucket{phase="listing",le="0.5"} 1\n' in text
+    assert 'autofill_phase_duration_seconds_bucket{phase="listing",le="60.0"} 2\n' in text
+    assert 'autofill_phase_duration_seconds_bucket{phase="listing",le="+Inf"} 2\n' in text
+    assert 'autofill_phase_duration_seconds_count{phase="listing"} 2\n' in text
+    # metrics that were never recorded are left out
+    assert "autofill_timeouts_total" not in text
+
+
+def test_label_escaping():
+    assert metrics.format_labels((("command", 'say "hi"\n'),)) == '{command="say \\"hi\\"\\n"}'
+
+
+def test_instrument_driver(monkeypatch, registry):
+    monkeypatch.setattr(metrics, "REGISTRY", registry)
+
+    class FakeDriver:
+        def execute(self, driver_command, params=None):
+            return {"value": driver_command}
+
+    driver = metrics.instrument_driver(FakeDriver())
+    assert driver.execute("get", {"url": "about:blank"}) == {"value": "get"}
+    driver.execute("findElement")
+    driver.execute("findElement")
+    assert registry.get("autofill_webdriver_commands_total", command="findElement") == 2
+
+
+def test_write_textfile(tmp_path, registry):
+    registry.inc("autofill_timeouts_total")
+    path = str(tmp_path / "collector" / "ems_autofill.prom")
+    metrics.write_textfile(path, registry)
+    with open(path) as f:
+        assert "autofill_timeouts_total 1" in f.read()
+    assert not (tmp_path / "collector" / "ems_autofill.prom.tmp").exists()
+
+
+def test_merge_drained_values(registry):
+    worker = metrics.Registry()
+    worker.inc("autofill_events_scheduled_total", 2)
+    worker.set("autofill_last_run_success", 1)
+    worker.observe("autofill_event_duration_seconds", 3)
+    registry.inc("autofill_events_scheduled_total")
+    registry.observe("autofill_event_duration_seconds", 0.2)
+
+    registry.merge(worker.drain())
+    assert worker.get("autofill_events_scheduled_total") == 0
+    assert registry.get("autofill_events_scheduled_total") == 3
+    assert registry.get("autofill_last_run_success") == 1
+    histogram = registry.values["autofill_event_duration_seconds"][()]
+    assert (histogram.count, histogram.sum) == (2, 3.2)
+    assert sum(histogram.counts) == 2
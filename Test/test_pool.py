@@ -0,0 +1,56 @@
+import os
+import time
+
+import pytest
+
+import memory
+import pool
+
+
+def slow_square(item):
+    # later items finish first
+    time.sleep(0.05 * (5 - item))
+    return item * item, os.getpid()
+
+
+def fail_on_three(item):
+    if item == 3:
+        raise ValueError("bad date")
+    return item
+
+
+def fail_to_start():
+    raise OSError("no browser")
+
+
+def test_results_in_order_from_several_processes():
+    results = list(pool.ProcessPool(3, slow_square).imap(range(6)))
+    assert [(item, result[0]) for item, result in results] == [(i, i * i) for i in range(6)]
+    assert len({result[1] for _, result in results}) > 1
+    assert os.getpid() not in {result[1] for _, result in results}
+
+
+def test_handler_exception_stops_the_pool():
+    with pytest.raises(RuntimeError, match="bad date"):
+        list(pool.ProcessPool(2, fail_on_three).imap(range(20)))
+
+
+def test_initializer_exception_stops_the_pool():
+    with pytest.raises(RuntimeError, match="failed to start"):
+        list(pool.ProcessPool(2, fail_on_three, initializer=fail_to_start).imap(range(4)))
+
+
+@pytest.mark.skipif(memory.list_processes() is None, reason="needs 'ps'")
+def test_workers_over_the_memory_limit_are_replaced():
+    results = list(pool.ProcessPool(2, slow_square, memory_limit_bytes=1).imap(range(4)))
+    assert [result[0] for _, result in results] == [0, 1, 4, 9]
+    # every worker retires after one item
+    assert len({result[1] for _, result in results}) == 4
+
+
+def test_tree_rss():
+    processes = {1: (0, 100), 10: (1, 1000), 11: (10, 20), 12: (10, 30), 20: (1, 5)}
+    assert memory.tree_rss_bytes(10, processes) == 1050
+    assert memory.tree_rss_bytes(99, processes) is None
+    if memory.list_processes() is not None:
+        assert memory.tree_rss_bytes(os.getpid()) > 0
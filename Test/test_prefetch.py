@@ -0,0 +1,74 @@
+import prefetch
+
+LISTING_URL = "https://ohiounion.osu.edu/ems/"
+
+
+class FakeDriver:
+    """ Tabs whose pages load as soon as they are navigated to """
+
+    def __init__(self):
+        self.urls = {"main": LISTING_URL}
+        self.current_window_handle = "main"
+        self.switch_to = self
+        self.opened = 0
+
+    @property
+    def window_handles(self):
+        return list(self.urls)
+
+    def window(self, handle):
+        assert handle in self.urls
+        self.current_window_handle = handle
+
+    def close(self):
+        del self.urls[self.current_window_handle]
+
+    def execute_script(self, script, *args):
+        if script == prefetch.OPEN_TAB_SCRIPT:
+            self.opened += 1
+            self.urls["tab{}".format(self.opened)] = args[0]
+        elif script == prefetch.NAVIGATE_SCRIPT:
+            self.urls[self.current_window_handle] = args[0]
+        elif script == prefetch.READY_SCRIPT:
+            return self.urls[self.current_window_handle] == args[0]
+        else:
+            # an event's javascript command
+            self.urls[self.current_window_handle] = "details:" + script
+
+
+def test_lookahead():
+    assert list(prefetch.lookahead("abc", 1)) == [("a", ("b",)), ("b", ("c",)), ("c", ())]
+    assert list(prefetch.lookahead("ab", 0)) == [("a", ()), ("b", ())]
+
+
+def test_prefetch_and_take():
+    driver = FakeDriver()
+    prefetcher = prefetch.TabPrefetcher(driver, 2, LISTING_URL)
+
+    prefetcher.prefetch(["event(1)", "event(2)", "event(3)"])
+    assert driver.current_window_handle == "main"
+    assert sorted(driver.urls.values()) == ["details:event(1)", "details:event(2)", LISTING_URL]
+
+    assert prefetcher.take("event(1)")
+    assert driver.urls[driver.current_window_handle] == "details:event(1)"
+    # the tab left goes back to the listing to prefetch the next event in
+    assert driver.urls["main"] == LISTING_URL
+    assert not prefetcher.take("event(4)")
+
+    prefetcher.prefetch(["event(2)", "event(3)"])
+    assert sorted(driver.urls.values()) == ["details:event(1)", "details:event(2)", "details:event(3)"]
+    assert driver.opened == 2
+
+    current = driver.current_window_handle
+    prefetcher.close()
+    assert driver.window_handles == [current]
+    assert (prefetcher.hits, prefetcher.misses) == (1, 1)
+
+
+def test_events_no_longer_coming_up_free_their_tab():
+    driver = FakeDriver()
+    prefetcher = prefetch.TabPrefetcher(driver, 1, LISTING_URL)
+    prefetcher.prefetch(["event(1)"])
+    prefetcher.prefetch(["event(2)"])
+    assert list(prefetcher.loading) == ["event(2)"]
+    assert driver.opened == 1
@@ -0,0 +1,46 @@
+import os
+import pstats
+
+import metrics
+from profiler import Profiler
+
+
+def allocate():
+    return [str(i) * 10 for i in range(20000)]
+
+
+def test_phases_are_profiled_separately(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "PHASE_LISTENERS", [])
+    profiler = Profiler(str(tmp_path))
+    metrics.add_phase_listener(profiler.phase)
+
+    profiler.start()
+    kept = []
+    with metrics.phase("schedule_events"):
+        for _ in range(2):
+            with metrics.phase("schedule_event"):
+                kept.append(allocate())
+    profiler.stop()
+    paths = profiler.write()
+
+    assert list(profiler.phases) == ["run", "schedule_events", "schedule_event"]
+    assert profiler.phases["schedule_event"].calls == 2
+    assert all(os.path.isfile(path) for path in paths)
+
+    # allocate() is charged to the innermost phase only
+    def called(phase):
+        stats = pstats.Stats(str(tmp_path / (phase + ".prof")))
+        return {function for _, _, function in stats.stats}
+    assert "allocate" in called("schedule_event")
+    assert "allocate" not in called("schedule_events")
+
+    with open(str(tmp_path / "schedule_event.allocations.txt")) as f:
+        assert f.read().startswith("Phase 'schedule_event', run 2 time(s)")
+
+    # allocations are charged to each event, and not again to the phases around it
+    def allocated(phase):
+        return sum(size for line, (size, _) in profiler.phases[phase].allocations.items()
+                   if "test_profiler.py" in line)
+    assert allocated("schedule_event") > 2 * 20000 * 10
+    assert abs(allocated("schedule_events")) < 1024
+    assert abs(allocated("run")) < 1024
@@ -0,0 +1,92 @@
+import csv
+import datetime
+import json
+import os
+
+import report
+
+
+WORKERS = {
+    "Jones, Ryan": [
+        {"AssignmentType": "Setup", "Time": "4:30 PM", "DateTime": datetime.datetime(2016, 1, 1, 16, 30),
+         "Room": "Senate Chamber", "EventName": "Undergraduate Student Government",
+         "Equipment": ["Projector\nScreen", "Microphone"]},
+    ],
+    "Hempel, Alex": [
+        {"AssignmentType": "Teardown", "Time": "9:30 PM", "DateTime": datetime.datetime(2016, 1, 1, 21, 30),
+         "Room": "Cartoon Room 1", "EventName": "Chess Club", "Equipment": []},
+    ],
+}
+
+
+def old_text_report(workers):
+    """ Output of the text report before the report module, kept to check the format is unchanged """
+    lines = ""
+    for worker_name, assignments in workers.items():
+        lines += worker_name + '\n    '
+        for assignment in assignments:
+            for key, width in report.TEXT_HEADERS:
+                lines += assignment[key].ljust(width)[:width] + ' | '
+            for equipment in assignment["Equipment"]:
+                for i, split in enumerate(equipment.split('\n')):
+                    lines += '\n' + ''.ljust(11 if i == 0 else 15) + split
+            lines += "\n\n    "
+        lines += "\n"
+    return lines
+
+
+def read(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def test_all_formats(tmp_path):
+    report.write_reports("2017-9-5", WORKERS, str(tmp_path), report.REPORT_FORMATS)
+
+    assert sorted(os.listdir(str(tmp_path))) == ["AV Assignments 2017-9-5." + f for f in sorted(report.REPORT_FORMATS)]
+    assert read(report.report_path(str(tmp_path), "2017-9-5", "txt")) == old_text_report(WORKERS)
+
+    data = json.loads(read(report.report_path(str(tmp_path), "2017-9-5", "json")))
+    assert list(data) == ["Jones, Ryan", "Hempel, Alex"]
+    assert data["Jones, Ryan"][0]["DateTime"] == "2016-01-01T16:30:00"
+
+    with open(report.report_path(str(tmp_path), "2017-9-5", "csv"), newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == report.CSV_HEADERS
+    assert rows[1][:4] == ["2017-9-5", "Jones, Ryan", "4:30 PM", "Setup"]
+    assert rows[1][6] == "Projector Screen; Microphone"
+
+    page = read(report.report_path(str(tmp_path), "2017-9-5", "html"))
+    assert "<td>Chess Club</td>" in page
+    assert page.endswith("</html>\n")
+
+
+def test_combined(tmp_path):
+    with report.CombinedReport(str(tmp_path), "2017-9-5", "2017-9-6", ["txt", "json"]) as combined:
+        report.write_reports("2017-9-5", WORKERS, str(tmp_path), ["txt", "json"], combined)
+        report.write_reports("2017-9-6", {}, str(tmp_path), ["txt", "json"], combined)
+
+    data = json.loads(read(report.report_path(str(tmp_path), "2017-9-5 to 2017-9-6", "json")))
+    assert list(data) == ["2017-9-5", "2017-9-6"]
+    assert data["2017-9-6"] == {}
+    assert read(report.report_path(str(tmp_path), "2017-9-5 to 2017-9-6", "txt")).startswith("==== 2017-9-5 ====\n")
+
+
+def test_combined_discarded_on_error(tmp_path):
+    try:
+        with report.CombinedReport(str(tmp_path), "2017-9-5", "2017-9-6", ["txt"]):
+            raise RuntimeError("run failed")
+    except RuntimeError:
+        pass
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_files_discarded_when_one_cant_be_opened(tmp_path):
+    # the HTML report's temporary file can't be opened over a directory
+    blocked = report.report_path(str(tmp_path), "2017-9-5", "html") + ".tmp"
+    os.mkdir(blocked)
+    try:
+        report.write_reports("2017-9-5", WORKERS, str(tmp_path), ["txt", "json", "html"])
+    except OSError:
+        pass
+    assert os.listdir(str(tmp_path)) == [os.path.basename(blocked)]
@@ -0,0 +1,68 @@
+import datetime
+import itertools
+import random
+
+import pytest
+
+import report
+import routing
+
+# rooms along a corridor: distance is the difference in position
+POSITIONS = {"Ballroom": 0, "Senate Chamber": 4, "Suite E": 5, "Hebrew Room": 9, "Performance Hall": 10}
+TABLE = {a: {b: abs(POSITIONS[a] - POSITIONS[b]) for b in POSITIONS if b > a} for a in POSITIONS}
+
+
+def assignment(hour, minute, room, assign_type="Setup"):
+    return {"AssignmentType": assign_type, "Time": "", "DateTime": datetime.datetime(2016, 1, 1, hour, minute),
+            "Room": room, "EventName": "Chess Club", "Equipment": []}
+
+
+def test_distances():
+    distance = routing.RoomDistances({"Suite E": {"Senate Chamber": 1, "Ballroom": 6}})
+    assert distance("Senate Chamber", "Suite E") == 1
+    assert distance("Senate Chamber", "Ballroom") == 6
+    assert distance("Ohio Union - Suite E (2nd floor)", "Ohio Union - Suite E (2nd floor)") == 0
+    assert distance.find_room("Ohio Union - Suite E (2nd floor)") == "Suite E"
+    with pytest.raises(RuntimeError):
+        routing.RoomDistances({"Suite E": {"Ballroom": -1}})
+
+
+def test_route_is_no_longer_than_time_order():
+    distance = routing.RoomDistances(TABLE)
+    rng = random.Random(0)
+    for _ in range(20):
+        rooms = rng.sample(sorted(POSITIONS), 5)
+        route = routing.plan_route(None, rooms, distance)
+        assert sorted(route) == sorted(rooms) and route[0] == rooms[0]
+        assert routing.path_length(route, distance) <= routing.path_length(rooms, distance)
+        # no single reversal shortens it
+        for i, k in itertools.combinations(range(1, len(route)), 2):
+            reversed_route = route[:i] + route[i:k + 1][::-1] + route[k + 1:]
+            assert routing.path_length(reversed_route, distance) >= routing.path_length(route, distance)
+
+
+def test_route_assignments():
+    distance = routing.RoomDistances(TABLE)
+    assignments = [assignment(17, 0, "Suite E"),
+                   assignment(17, 0, "Performance Hall"),
+                   assignment(17, 0, "Senate Chamber"),
+                   assignment(17, 15, "Hebrew Room"),
+                   assignment(17, 20, "Suite E", "Check-in"),
+                   assignment(19, 0, "Ballroom"),
+                   assignment(19, 0, "Performance Hall")]
+    routed = routing.route_assignments(assignments, distance, 30)
+    assert [(a["Room"], a["AssignmentType"]) for a in routed[:5]] == [
+        ("Suite E", "Setup"), ("Suite E", "Check-in"), ("Senate Chamber", "Setup"), ("Hebrew Room", "Setup"),
+        ("Performance Hall", "Setup")]
+    assert [a["RouteStop"] for a in routed[:5]] == [1, 1, 2, 3, 4]
+    # the next window starts from Performance Hall
+    assert [a["Room"] for a in routed[5:]] == ["Performance Hall", "Ballroom"]
+
+
+def test_report_shows_stops(tmp_path):
+    workers = {"Kleman, Hannah": [dict(assignment(17, 0, "Suite E"), RouteStop=2)]}
+    report.write_reports("2017-9-5", workers, str(tmp_path), ("txt", "html"))
+    with open(report.report_path(str(tmp_path), "2017-9-5", "txt")) as f:
+        assert "Stop 2 | " in f.read()
+    with open(report.report_path(str(tmp_path), "2017-9-5", "html")) as f:
+        assert "<br>stop 2" in f.read()
@@ -0,0 +1,121 @@
+import contextlib
+import json
+import os
+
+import pytest
+
+pytest.importorskip("selenium")
+
+import autofill_tool
+import config
+import deadline
+
+SETTINGS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "EMS Paperwork Tool",
+                             "settings.json")
+
+
+def use_settings(monkeypatch, **overrides):
+    with open(SETTINGS_PATH) as f:
+        values = json.load(f)
+    values.update(overrides)
+    monkeypatch.setattr(autofill_tool, "settings", config.Settings(config.validate_settings(values)))
+
+
+def make_row(reservation, start_time="7:00 PM"):
+    return autofill_tool.ListingRow(reservation, "Senate Chamber", "Event " + reservation, "open" + reservation,
+                                    "key" + reservation, start_time)
+
+
+class FakeEMS:
+    """ Stands in for autofill_tool.EMS on a listing. Scheduling each row in 'failing' raises once, as after a
+    timeout """
+
+    def __init__(self, rows, failing=()):
+        self.rows = rows
+        self.failing = set(failing)
+        self.scheduled = []
+        self.released = []
+        self.prefetcher = None
+        self.upcoming = ()
+        self.leased = []
+        self.unscheduled = []
+
+    def iter_events(self):
+        return iter(self.rows)
+
+    def iter_events_to_schedule(self, rows, seen):
+        for row in rows:
+            if row.key not in seen:
+                seen.add(row.key)
+                yield row
+
+    def get_setup_deadline(self, row):
+        return row.start_time
+
+    def recycle_browser(self):
+        return False
+
+    @contextlib.contextmanager
+    def recording(self):
+        yield
+
+    def schedule_event(self, js_command, row):
+        if row.reservation in self.failing:
+            self.failing.discard(row.reservation)
+            raise RuntimeError("Timed out waiting for the Event Details page")
+        self.scheduled.append(row.reservation)
+
+    def release_lease(self, row):
+        self.released.append(row.reservation)
+
+
+def test_failed_event_retried_at_the_next_poll(monkeypatch):
+    use_settings(monkeypatch, prefetch_depth=0, schedule_order="listing")
+    ems = FakeEMS([make_row("1"), make_row("2"), make_row("3")], failing=["2"])
+    seen = set()
+    with pytest.raises(RuntimeError):
+        autofill_tool.schedule_listing(ems, seen)
+    assert ems.scheduled == ["1"]
+    assert ems.released == ["2"]
+
+    assert autofill_tool.schedule_listing(ems, seen) == 2
+    assert ems.scheduled == ["1", "2", "3"]
+    # nothing left for the poll after
+    assert autofill_tool.schedule_listing(ems, seen) == 0
+
+
+def test_rows_read_ahead_retried_after_a_failure(monkeypatch):
+    use_settings(monkeypatch, prefetch_depth=2, schedule_order="listing")
+    monkeypatch.setattr(autofill_tool, "make_prefetcher", lambda driver: None)
+    ems = FakeEMS([make_row(str(resnum)) for resnum in range(1, 6)], failing=["2"])
+    ems.driver = None
+    seen = set()
+    with pytest.raises(RuntimeError):
+        autofill_tool.schedule_listing(ems, seen)
+
+    assert autofill_tool.schedule_listing(ems, seen) == 4
+    assert ems.scheduled == ["1", "2", "3", "4", "5"]
+
+
+def test_rows_in_the_deadline_queue_retried_after_a_failure(monkeypatch):
+    use_settings(monkeypatch, prefetch_depth=0, schedule_order="deadline")
+    ems = FakeEMS([make_row("1", "9:00 PM"), make_row("2", "8:00 PM"), make_row("3", "7:00 PM")], failing=["2"])
+    seen = set()
+    with pytest.raises(RuntimeError):
+        autofill_tool.schedule_listing(ems, seen)
+    assert ems.scheduled == ["3"]
+
+    assert autofill_tool.schedule_listing(ems, seen) == 2
+    assert ems.scheduled == ["3", "2", "1"]
+
+
+def test_rows_left_by_the_budget_retried(monkeypatch, fake_clock):
+    use_settings(monkeypatch, prefetch_depth=0, schedule_order="deadline")
+    ems = FakeEMS([make_row("1", "9:00 PM"), make_row("2", "8:00 PM"), make_row("3", "7:00 PM")])
+    budget = deadline.TimeBudget(1, fake_clock)
+    seen = set()
+    fake_clock.now += 60
+    assert autofill_tool.schedule_listing(ems, seen, budget) == 0
+    assert len(ems.unscheduled) == 3
+
+    assert autofill_tool.schedule_listing(ems, seen) == 3
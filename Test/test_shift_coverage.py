@@ -0,0 +1,97 @@
+import datetime
+
+import assignee
+import report
+import shift_coverage
+from shift_coverage import Shift
+
+SCHEDULE = {
+    "AV Shift Lead": [
+        {"last_name": "Kleman", "first_name": "Hannah", "start_time": "6:30 AM", "end_time": "12:00 PM"},
+        {"last_name": "Smith", "first_name": "Sam", "start_time": "1:00 PM", "end_time": "6:00 PM"},
+    ],
+    "AV Student Manager": [
+        {"last_name": "Hempel", "first_name": "Alex", "start_time": "6:00 PM", "end_time": "12:00 AM"},
+    ],
+}
+POSITIONS = ("AV Shift Lead", "AV Student Manager")
+
+
+def assignment(assign_type, hour, minute=0, day=1, event="Chess Club"):
+    dt = datetime.datetime(2016, 1, day, hour, minute)
+    return {"AssignmentType": assign_type, "Time": shift_coverage.format_time(dt), "DateTime": dt,
+            "Room": "Cartoon Room 1", "EventName": event, "Equipment": []}
+
+
+def unassigned(assign_type, hour, minute=0, day=1, event="Chess Club"):
+    """ Unassigned work, as EMS.find_setup_info() and the like hand it to the report """
+    dt = datetime.datetime(2016, 1, day, hour, minute)
+    worker, time, dt = assignee.assignment_info(assignee.UNASSIGNED_PERSON, shift_coverage.format_time(dt), dt)
+    return worker, {"AssignmentType": assign_type, "Time": time, "DateTime": dt, "Room": "Cartoon Room 1",
+                    "EventName": event, "Equipment": []}
+
+
+def test_shifts_from_schedule():
+    shifts = shift_coverage.shifts_from_schedule(SCHEDULE, POSITIONS)
+    assert [shift.worker for shift in shifts] == ["Kleman, Hannah", "Smith, Sam", "Hempel, Alex"]
+    assert shifts[-1].end == datetime.datetime(2016, 1, 2, 0, 0)
+
+
+def test_gaps_fallbacks_and_idle_shifts():
+    shifts = shift_coverage.shifts_from_schedule(SCHEDULE, POSITIONS)
+    workers = {
+        "Kleman, Hannah": [assignment("Setup", 8)],
+        # 12:30 PM: nobody on shift, went to the last worker to finish
+        "Smith, Sam": [assignment("Check-In", 12, 30, event="Lunch Talk")],
+        "(Unassigned)": [unassigned("Teardown", 0, 30, day=2, event="Late Show")[1]],
+        # the night before setup isn't checked
+        "Buckeye, Brutus": [assignment("Setup", 0)],
+    }
+    coverage = shift_coverage.analyse(shifts, workers, night_before_time="12:00 AM")
+
+    assert [(gap.start.hour, gap.end.hour, gap.assignments) for gap in coverage.gaps] == [(12, 13, 1), (0, 0, 1)]
+    assert coverage.gaps[-1].start == datetime.datetime(2016, 1, 2, 0, 0)
+    assert [uncovered.assignment["EventName"] for uncovered in coverage.fallbacks] == ["Lunch Talk"]
+    assert [uncovered.assignment["EventName"] for uncovered in coverage.unassigned] == ["Late Show"]
+    assert [shift.worker for shift in coverage.idle_shifts] == ["Smith, Sam", "Hempel, Alex"]
+    assert len(coverage.lines()) == 6
+
+
+def test_gap_between_assignments_without_work():
+    shifts = [Shift("Lead", "A", datetime.datetime(2016, 1, 1, 8), datetime.datetime(2016, 1, 1, 10)),
+              Shift("Lead", "B", datetime.datetime(2016, 1, 1, 11), datetime.datetime(2016, 1, 1, 12)),
+              Shift("Lead", "B", datetime.datetime(2016, 1, 1, 14), datetime.datetime(2016, 1, 1, 15))]
+    workers = {"A": [assignment("Setup", 9)], "B": [assignment("Setup", 11, 30)]}
+    coverage = shift_coverage.analyse(shifts, workers)
+    # 12 PM - 2 PM is after the last assignment
+    assert [(gap.start.hour, gap.end.hour, gap.assignments) for gap in coverage.gaps] == [(10, 11, 0)]
+    assert coverage.fallbacks == [] and coverage.unassigned == []
+
+
+def test_unassigned_work_is_checked_at_its_time():
+    shifts = shift_coverage.shifts_from_schedule(SCHEDULE, POSITIONS)
+    worker, setup = unassigned("Setup", 12, 30, event="Lunch Talk")
+    workers = {"Kleman, Hannah": [assignment("Setup", 8)], "Smith, Sam": [assignment("Setup", 14)],
+               "Hempel, Alex": [assignment("Teardown", 20)], worker: [setup]}
+    coverage = shift_coverage.analyse(shifts, workers, night_before_time="12:00 AM")
+
+    assert [(gap.start.hour, gap.end.hour, gap.assignments) for gap in coverage.gaps] == [(12, 13, 1)]
+    assert coverage.lines()[1] == "Setup for 'Lunch Talk' at 12:30 PM is unassigned: nobody is on shift"
+
+
+def test_no_shifts():
+    coverage = shift_coverage.analyse([], {"(Unassigned)": [unassigned("Setup", 9)[1], unassigned("Teardown", 11)[1]]})
+    assert [(gap.start.hour, gap.end.hour, gap.assignments) for gap in coverage.gaps] == [(9, 11, 2)]
+    assert len(coverage.unassigned) == 2
+
+
+def test_report_lists_coverage_first(tmp_path):
+    workers = {"Kleman, Hannah": [assignment("Setup", 8)]}
+    report.write_reports("2017-9-5", workers, str(tmp_path), ("txt", "html", "json"),
+                         coverage=["Nobody is on shift from 12:00 PM to 1:00 PM (1 assignment(s) then)"])
+    with open(report.report_path(str(tmp_path), "2017-9-5", "txt")) as f:
+        text = f.read()
+    assert text.startswith("Coverage warnings:\n  - Nobody is on shift from 12:00 PM to 1:00 PM")
+    assert text.index("Coverage warnings") < text.index("Kleman, Hannah")
+    with open(report.report_path(str(tmp_path), "2017-9-5", "json")) as f:
+        assert "Coverage" not in f.read()
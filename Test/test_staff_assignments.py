@@ -0,0 +1,74 @@
+from staff_assignments import StaffAssignment, diff_staff_assignments, find_staff
+
+
+PLANNED = [StaffAssignment("Setup", "Jones, Ryan", "4:30 PM"),
+           StaffAssignment("Check-In", "Jones, Ryan", "4:45 PM"),
+           StaffAssignment("Teardown", "Hempel, Alex", "9:30 PM")]
+
+
+def test_nothing_existing():
+    to_submit, outdated = diff_staff_assignments([], PLANNED)
+    assert to_submit == PLANNED
+    assert outdated == []
+
+
+def test_all_existing():
+    existing = [StaffAssignment("Setup", "Jones, Ryan", "04:30 PM"),
+                StaffAssignment("Check-In", "Jones, Ryan", "04:45 PM"),
+                StaffAssignment("Teardown", "Hempel, Alex", "09:30 PM")]
+    assert diff_staff_assignments(existing, PLANNED) == ([], [])
+
+
+def test_missing_only():
+    existing = [StaffAssignment("Setup", "Jones, Ryan", "4:30 PM")]
+    to_submit, outdated = diff_staff_assignments(existing, PLANNED)
+    assert to_submit == PLANNED[1:]
+    assert outdated == []
+
+
+def test_changed():
+    existing = [StaffAssignment("Setup", "Jones, Ryan", "4:30 PM"),
+                StaffAssignment("Check-in", "Jones, Ryan", "4:45 PM"),
+                StaffAssignment("Teardown", "Jones, Ryan", "9:30 PM")]
+    to_submit, outdated = diff_staff_assignments(existing, PLANNED)
+    assert to_submit == [PLANNED[2]]
+    assert outdated == [existing[2]]
+
+
+def test_unassigned_not_submitted():
+    planned = [StaffAssignment("Setup", "(Unassigned)", "12:00 AM")]
+    assert diff_staff_assignments([], planned) == ([], [])
+
+
+def test_other_rows_ignored():
+    existing = [StaffAssignment("Production", "Jones, Ryan", "4:30 PM")]
+    to_submit, outdated = diff_staff_assignments(existing, PLANNED)
+    assert to_submit == PLANNED
+    assert outdated == []
+
+
+def test_hour_that_ends_another_hour_is_changed():
+    planned = [StaffAssignment("Setup", "Jones, Ryan", "2:00 PM"),
+               StaffAssignment("Teardown", "Jones, Ryan", "1:30 PM")]
+    existing = [StaffAssignment("Setup", "Jones, Ryan", "12:00 PM"),
+                StaffAssignment("Teardown", "Jones, Ryan", "11:30 PM")]
+    assert diff_staff_assignments(existing, planned) == (planned, existing)
+
+
+def test_staff_matched_as_entered():
+    planned = [StaffAssignment("Setup", "Buckeye, Brutus", "4:30 PM"),
+               StaffAssignment("Check-In", "Lee, Ann", "5:00 PM"),
+               StaffAssignment("Teardown", "Lee, Ann", "9:00 PM")]
+    # entered through the option containing the name, or the one with the first name truncated
+    existing = [StaffAssignment("Setup", "Buckeye, Bru", "4:30 PM"),
+                StaffAssignment("Check-In", "Lee, Anna (Student)", "5:00 PM"),
+                StaffAssignment("Teardown", "Lee, Bob", "9:00 PM")]
+    assert diff_staff_assignments(existing, planned) == (planned[2:], existing[2:])
+
+
+def test_find_staff():
+    options = ["Select staff", "Buckeye, Bru", "Lee, Anna", "Lee, Ann"]
+    assert find_staff(options, "Lee, Ann") == 2
+    assert find_staff(options, "Buckeye, Brutus") == 1
+    assert find_staff(options, "Jones, Ryan") is None
+    assert find_staff(options, "Buckeye") == 1
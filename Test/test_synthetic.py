@@ -0,0 +1,53 @@
+import json
+
+import clock
+import synthetic
+
+
+def test_schedule_size_and_format():
+    schedule = synthetic.generate_schedule(300, seed=1)
+    assert sorted(schedule) == sorted(synthetic.POSITIONS)
+    shifts = [shift for position in schedule.values() for shift in position]
+    assert len(shifts) == 300
+    assert set(shifts[0]) == {"last_name", "first_name", "start_time", "end_time"}
+
+    spans = [clock.span_to_datetimes(shift["start_time"], shift["end_time"]) for shift in shifts]
+    assert all(start < end for start, end in spans)
+    assert any(end.day == 2 for _, end in spans)
+
+
+def test_same_seed_same_data():
+    assert synthetic.generate_events(50, seed=3) == synthetic.generate_events(50, seed=3)
+    assert synthetic.generate_events(50, seed=3) != synthetic.generate_events(50, seed=4)
+
+
+def test_events_cover_edge_cases():
+    events = synthetic.generate_events(500, seed=2)
+    spans = [clock.span_to_datetimes(*event["RunTime"].split(" - ")) for event in events]
+    assert any(end.day == 2 for _, end in spans)
+    assert any(event["StartTime"] in ("9:45 AM", "10:00 AM", "10:15 AM") for event in events)
+    starts = [start for start, _ in spans]
+    assert starts == sorted(starts)
+
+
+def test_w2w_cell_text_parses():
+    shifts = synthetic.generate_schedule(20, seed=5)["AV Shift Lead"]
+    lines = synthetic.w2w_cell_text(shifts).split("\n")
+    assert len(lines) == 2 * len(shifts)
+    start, end = lines[0].split(" - ")
+    assert clock.normalize(start) == shifts[0]["start_time"]
+    assert lines[1].split(" ")[2:] == [shifts[0]["first_name"], shifts[0]["last_name"]]
+
+
+def test_write_fixtures(tmp_path):
+    schedule = synthetic.generate_schedule(10)
+    events = synthetic.generate_events(5)
+    synthetic.write_fixtures(str(tmp_path), schedule, events)
+
+    with open(str(tmp_path / "schedule.json")) as f:
+        assert json.load(f) == schedule
+    listing = (tmp_path / "listing.html").read_text()
+    assert listing.count("<tr>") == 1 + 2 * len(events)
+    details = (tmp_path / "details" / (events[0]["Reservation"] + ".html")).read_text()
+    assert synthetic.DETAILS_TITLE in details
+    assert events[0]["RunTime"] in details
@@ -0,0 +1,147 @@
+import http.server
+import socketserver
+import threading
+import time
+import urllib.request
+
+import pytest
+
+import throttle
+
+
+class StandInServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+
+class StandInHandler(http.server.BaseHTTPRequestHandler):
+    """ Answers every GET after the server's injected latency, counting the requests in progress """
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.in_progress += 1
+            server.most_in_progress = max(server.most_in_progress, server.in_progress)
+        time.sleep(server.latency)
+        with server.lock:
+            server.in_progress -= 1
+        self.send_response(500 if server.failing else 200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    stand_in = StandInServer(("127.0.0.1", 0), StandInHandler)
+    stand_in.lock = threading.Lock()
+    stand_in.in_progress = stand_in.most_in_progress = 0
+    stand_in.latency = 0.0
+    stand_in.failing = False
+    thread = threading.Thread(target=stand_in.serve_forever, daemon=True)
+    thread.start()
+    yield stand_in
+    stand_in.shutdown()
+    stand_in.server_close()
+
+
+def run_clients(ems_throttle, server, requests, clients=4):
+    """ Sends the requests from several threads, each through the throttle. Returns the number that failed """
+    url = "http://127.0.0.1:{}/".format(server.server_address[1])
+    remaining = [requests]
+    failed = []
+    lock = threading.Lock()
+
+    def client():
+        while True:
+            with lock:
+                if remaining[0] == 0:
+                    return
+                remaining[0] -= 1
+            try:
+                with ems_throttle.request():
+                    urllib.request.urlopen(url, timeout=5).read()
+            except OSError:
+                with lock:
+                    failed.append(1)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(failed)
+
+
+def test_token_bucket(fake_clock):
+    bucket = throttle.TokenBucket(2, 3, fake_clock, fake_clock.sleep)
+    assert [bucket.acquire() for _ in range(3)] == [0, 0, 0]
+    assert not bucket.try_acquire()
+    assert bucket.acquire() == pytest.approx(0.5)
+    fake_clock.now += 10
+    # the bucket never holds more than the burst
+    assert [bucket.try_acquire() for _ in range(4)] == [True, True, True, False]
+
+    unlimited = throttle.TokenBucket(0, 1, fake_clock, fake_clock.sleep)
+    assert all(unlimited.try_acquire() for _ in range(100))
+
+
+def test_aimd_controller():
+    controller = throttle.AIMDController(1, 4, 2)
+    for _ in range(6):
+        controller.observe(0.5)
+    # +1 per round of responses: 1 -> 2 after one response, -> 3 after three more
+    assert controller.concurrency == 3
+    for _ in range(20):
+        controller.observe(0.5)
+    assert controller.concurrency == 4
+
+    controller.observe(3)
+    assert controller.concurrency == 2
+    controller.observe(0.1, ok=False)
+    assert controller.concurrency == 1
+    controller.observe(3)
+    assert controller.concurrency == 1
+    assert controller.decreases == 3
+
+
+def test_requests_in_flight_when_backing_off_only_decrease_once():
+    controller = throttle.AIMDController(1, 8, 2)
+    controller.limit = 8.0
+    for _ in range(4):
+        controller.acquire()
+    for _ in range(4):
+        controller.observe(5)
+        controller.release()
+    assert controller.concurrency == 4
+    assert controller.decreases == 1
+
+
+def test_concurrency_follows_the_server_latency(server):
+    ems_throttle = throttle.Throttle(throttle.TokenBucket(0, 1), throttle.AIMDController(1, 4, 0.1))
+    assert run_clients(ems_throttle, server, 30) == 0
+    assert ems_throttle.controller.concurrency == 4
+    assert server.most_in_progress <= 4
+
+    server.latency = 0.2
+    assert run_clients(ems_throttle, server, 6) == 0
+    assert ems_throttle.controller.concurrency == 1
+    assert ems_throttle.controller.decreases >= 2
+
+    server.latency = 0.0
+    server.failing = True
+    ems_throttle.controller.limit = 4.0
+    assert run_clients(ems_throttle, server, 4) == 4
+    assert ems_throttle.controller.concurrency < 4
+
+
+def test_rate_limit_against_the_server(server):
+    ems_throttle = throttle.Throttle(throttle.TokenBucket(20, 2), throttle.AIMDController(1, 4, 0))
+    start = time.monotonic()
+    assert run_clients(ems_throttle, server, 12) == 0
+    # 2 at once, then 10 more at 20 per second
+    assert time.monotonic() - start >= 0.45
+    assert ems_throttle.requests == 12
+    assert ems_throttle.bucket.waited > 0